@@ -0,0 +1,198 @@
+"""Benchmarks for the client side costs of LCP requests.
+
+Times hashing bodies of different sizes for the MAC `ext`, logging requests
+and responses with an :class:`pylcp.api.APILogger` with DEBUG logging on and
+off, masking billing information in deeply nested payloads, building credit
+payloads with and without schema validation, and from columns when NumPy is
+installed, and complete
+:meth:`pylcp.crud.base.LCPCrud.create` round trips, both over a
+:class:`pylcp.testing.MockRequestAdapter` and over HTTP to a local stub
+server. Signing itself is timed by :mod:`benchmarks.bench_mac`.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_client
+
+"""
+from __future__ import print_function
+
+try:
+    from http import server
+except ImportError:
+    import BaseHTTPServer as server
+import logging
+import threading
+import timeit
+
+import requests
+
+from pylcp import api, codec, mac
+from pylcp.crud import base as crud
+from pylcp.crud import bulk, postings
+from pylcp.testing import MockRequestAdapter
+
+MAC_KEY = '3b11b03d1a9f4a0ca04fdede4ae30a1c'
+KEY_ID = 'a85751701d4d4127a17edb34a15317a0'
+URL = 'https://lcp.points.com/v1/lps/123/mvs/456/credits'
+BODY_SIZES = [('1KiB', 1024), ('64KiB', 64 * 1024), ('1MiB', 1024 * 1024)]
+COLUMN_ROWS = 1000
+
+
+def deep_order(depth=10, width=10):
+    """Returns an order payload nested `depth` levels deep, with `width` items and billing information at each."""
+    order = {'billingInfo': {'cardNumber': '4111111111111111', 'securityCode': '123'}, 'amount': 1000}
+    for level in range(depth):
+        order = {
+            'level': level,
+            'order': order,
+            'items': [{'index': index, 'amount': 1000, 'description': 'Bonus points'} for index in range(width)],
+            'billingInfo': {'cardNumber': '4111111111111111', 'securityCode': '123', 'firstName': 'Jane'},
+        }
+    return order
+
+
+CREDIT = {
+    'amount': 1000,
+    'memberValidation': 'https://lcp.points.com/v1/lps/123/mvs/456',
+    'pic': 'bonus',
+    'billingInfo': {'cardNumber': '4111111111111111', 'securityCode': '123'},
+}
+
+
+class _DiscardingHandler(logging.Handler):
+    """Formats every record, as a real handler would, but writes it nowhere."""
+
+    def emit(self, record):
+        self.format(record)
+
+
+class _StubHandler(server.BaseHTTPRequestHandler):
+    """Answers every POST with its own body, as LCP echoes created resources."""
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, which Nagle's algorithm would delay until the client's delayed ACK
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.send_response(201)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _logger(name, debug):
+    logger = logging.getLogger('benchmarks.bench_client.{}.{}'.format('debug' if debug else 'info', name))
+    logger.propagate = False
+    logger.handlers = [_DiscardingHandler()]
+    logger.setLevel(logging.DEBUG if debug else logging.INFO)
+    return logger
+
+
+def _api_logger(debug):
+    return api.APILogger(_logger('request', debug), _logger('response', debug))
+
+
+def _mock_client():
+    client = api.Client('https://lcp.points.com/v1', KEY_ID, MAC_KEY, api_logger=_api_logger(debug=False))
+    client.mount('https://', MockRequestAdapter())
+    return client
+
+
+def _round_trip_benchmarks():
+    """Returns the round trip benchmarks, and a function stopping the stub server they use."""
+    stub = server.HTTPServer(('127.0.0.1', 0), _StubHandler)
+    thread = threading.Thread(target=stub.serve_forever)
+    thread.daemon = True
+    thread.start()
+    http_client = api.Client('http://127.0.0.1:{}/v1'.format(stub.server_address[1]), KEY_ID, MAC_KEY,
+                             api_logger=_api_logger(debug=False))
+    mock_credits = crud.LCPCrud(_mock_client())
+    http_credits = crud.LCPCrud(http_client)
+
+    def stop():
+        http_client.close()
+        stub.shutdown()
+        stub.server_close()
+
+    return [
+        ('LCPCrud.create over MockRequestAdapter', lambda: mock_credits.create('/lps/123/credits', CREDIT)['amount']),
+        ('LCPCrud.create over HTTP to a local stub', lambda: http_credits.create('/lps/123/credits', CREDIT)['amount']),
+    ], stop
+
+
+def _column_benchmarks():
+    """Returns benchmarks encoding the payloads of `COLUMN_ROWS` validated credits, from columns and from dicts."""
+    amounts = bulk.numpy.arange(1, COLUMN_ROWS + 1)
+    member_validations = bulk.numpy.array(['{}/{}'.format(CREDIT['memberValidation'], index)
+                                           for index in range(COLUMN_ROWS)])
+
+    def from_columns():
+        columns = bulk.PostingColumns(amounts, member_validations, pic='bonus')
+        for _ in columns.payloads():
+            pass
+
+    def from_dicts():
+        for amount, member_validation in zip(amounts.tolist(), member_validations.tolist()):
+            codec.encode_payload(postings._create_payload(
+                amount, member_validation, 'bonus', validate=postings.validate_credit_payload))
+
+    return [
+        ('{} Credit payloads, validated and encoded from columns'.format(COLUMN_ROWS), from_columns, 0.01),
+        ('{} Credit payloads, validated and encoded from dicts'.format(COLUMN_ROWS), from_dicts, 0.01),
+    ]
+
+
+def run(number=2000, repeat=5):
+    """Returns a list of (benchmark name, best time per call in microseconds)."""
+    client = _mock_client()
+    request = client.prepare_request(requests.Request('POST', URL, json=CREDIT))
+    response = client.post(URL, json=CREDIT).response
+    loggers = [('on', _api_logger(debug=True)), ('off', _api_logger(debug=False))]
+    order = deep_order()
+    order_json = api.json.dumps(order)
+
+    # (name, function, number of calls relative to `number`)
+    benchmarks = []
+    for size_name, size in BODY_SIZES:
+        body = b'x' * size
+        benchmarks.append(('generate_ext, {} body'.format(size_name),
+                           lambda body=body: mac.generate_ext('application/json', body), 1024.0 / size))
+    for state, api_logger in loggers:
+        benchmarks.append(('APILogger.log_request and log_response, DEBUG {}'.format(state),
+                           lambda api_logger=api_logger: (api_logger.log_request(request),
+                                                          api_logger.log_response(response)), 1))
+    benchmarks += [
+        ('mask_sensitive_billing_info_data, deep dict', lambda: api.mask_sensitive_billing_info_data(order), 0.1),
+        ('mask_sensitive_billing_info_data, deep JSON string',
+         lambda: api.mask_sensitive_billing_info_data(order_json), 0.1),
+        ('Credit payload', lambda: postings._create_payload(1000, CREDIT['memberValidation'], 'bonus'), 10),
+        ('Credit payload, validated', lambda: postings._create_payload(
+            1000, CREDIT['memberValidation'], 'bonus', validate=postings.validate_credit_payload), 10),
+    ]
+    if bulk.numpy is not None:
+        benchmarks += _column_benchmarks()
+    round_trips, stop = _round_trip_benchmarks()
+    benchmarks += [(name, function, 0.25) for name, function in round_trips]
+
+    results = []
+    try:
+        for name, function, scale in benchmarks:
+            calls = max(1, int(number * scale))
+            best = min(timeit.repeat(function, number=calls, repeat=repeat))
+            results.append((name, best / calls * 1e6))
+    finally:
+        stop()
+    return results
+
+
+def main():
+    for name, microseconds in run():
+        print('{:<60} {:>10.2f} us/call'.format(name, microseconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""Micro-benchmark for the JSON codecs.
+
+Times decoding a response body, encoding a payload and formatting a body
+for the log with every installed :class:`pylcp.codec.JSONCodec`, on
+documents shaped like LCP orders and offer sets.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_codec
+
+"""
+from __future__ import print_function
+
+import decimal
+import timeit
+
+from pylcp import codec
+
+LCP_URL = 'https://lcp.points.com/v1'
+
+
+def _links(path):
+    return {'self': {'href': LCP_URL + path}}
+
+
+def _offer(index):
+    return {
+        'type': 'BUY',
+        'links': _links('/offers/{}'.format(index)),
+        'pricing': [
+            {
+                'amount': 1000 * tier,
+                'cost': decimal.Decimal('{}.{:02d}'.format(25 * tier, tier)),
+                'currency': 'USD',
+                'taxes': [{'name': 'GST', 'amount': decimal.Decimal('1.25') * tier}],
+            }
+            for tier in range(1, 6)
+        ],
+        'description': u'Buy points for your account — offer {}'.format(index),
+        'eligibility': {'minAmount': 1000, 'maxAmount': 50000, 'increment': 1000},
+    }
+
+
+OFFER_SET = {
+    'links': _links('/offer-sets/f1e2d3'),
+    'session': {'channel': 'storefront', 'clientIpAddress': '10.0.0.1', 'clientUserAgent': 'Mozilla/5.0'},
+    'user': {
+        'firstName': 'Jane',
+        'lastName': 'Doe',
+        'email': 'jane.doe@example.com',
+        'memberId': '1234567890',
+        'balance': 125000,
+    },
+    'offerTypes': ['BUY', 'GIFT', 'TRANSFER'],
+    'offers': [_offer(index) for index in range(20)],
+}
+
+ORDER = {
+    'links': _links('/orders/a1b2c3'),
+    'orderType': 'BUY',
+    'status': 'complete',
+    'createdAt': '2016-01-01T12:00:00.000000Z',
+    'data': {
+        'language': 'en-US',
+        'loyaltyProgram': LCP_URL + '/lps/123',
+        'user': OFFER_SET['user'],
+        'billingInfo': {
+            'cardNumber': 'XXXXXXXXXXXX1111',
+            'cardType': 'VISA',
+            'expirationMonth': 12,
+            'expirationYear': 2020,
+            'firstName': 'Jane',
+            'lastName': 'Doe',
+            'street1': '171 John Street',
+            'city': 'Toronto',
+            'state': 'ON',
+            'zip': 'M5T 1X3',
+            'country': 'CA',
+        },
+        'orderItems': [
+            {
+                'amount': 5000,
+                'cost': decimal.Decimal('125.05'),
+                'fees': [{'name': 'processing', 'amount': decimal.Decimal('4.99')}],
+                'offer': _offer(index),
+            }
+            for index in range(3)
+        ],
+        'totalCost': decimal.Decimal('390.12'),
+    },
+}
+
+DOCUMENTS = [('order', ORDER), ('offer set', OFFER_SET)]
+
+
+def run(number=500, repeat=5):
+    """Returns a list of (benchmark name, best time per call in microseconds)."""
+    results = []
+    for json_codec in codec.available_codecs():
+        for document_name, document in DOCUMENTS:
+            encoded = json_codec.dumps(document)
+            benchmarks = [
+                ('loads', lambda: json_codec.loads(encoded)),
+                ('dumps', lambda: json_codec.dumps(document)),
+                ('pretty_dumps', lambda: json_codec.pretty_dumps(document)),
+            ]
+            for operation, function in benchmarks:
+                best = min(timeit.repeat(function, number=number, repeat=repeat))
+                name = '{} {} {} ({} bytes)'.format(json_codec.name, operation, document_name, len(encoded))
+                results.append((name, best / number * 1e6))
+    return results
+
+
+def main():
+    for name, microseconds in run():
+        print('{:<60} {:>8.2f} us/call'.format(name, microseconds))
+
+
+if __name__ == '__main__':
+    main()
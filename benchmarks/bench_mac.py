@@ -0,0 +1,69 @@
+"""Micro-benchmark for request signing.
+
+Compares signing with a key that is decoded on every call, as
+:func:`pylcp.mac.generate_authorization_header_value` does when given the
+shared secret, against signing with a reused :class:`pylcp.mac.MACSigner`,
+as :class:`pylcp.api.MACAuth` does, and against signing batches of
+requests. Also times verification of signed requests by a
+:class:`pylcp.mac.MACVerifier`.
+
+Run from the repository root::
+
+    python -m benchmarks.bench_mac
+
+"""
+from __future__ import print_function
+
+import timeit
+
+from pylcp import mac
+
+MAC_KEY = '3b11b03d1a9f4a0ca04fdede4ae30a1c'
+KEY_ID = 'a85751701d4d4127a17edb34a15317a0'
+URL = 'https://lcp.points.com/v1/lps/123/mvs/456/credits'
+BODY = '{"amount":1000,"memberValidation":"https://lcp.points.com/v1/lps/123/mvs/456"}'
+NORMALIZED_REQUEST_STRING = mac.build_normalized_request_string(
+    '1420070400', 'bm9uY2Vub25jZQ==', 'POST', 'lcp.points.com', '443', '/v1/lps/123/mvs/456/credits', '')
+BATCH_SIZE = 100
+
+
+def run(number=20000, repeat=5):
+    """Returns a list of (benchmark name, best time per request in microseconds)."""
+    signer = mac.MACSigner(MAC_KEY)
+    batch = [('POST', URL, 'application/json', BODY)] * BATCH_SIZE
+    # Every verified request needs a fresh nonce, or it is rejected as a replay
+    verifier = mac.MACVerifier({KEY_ID: MAC_KEY}, max_skew=3600, nonce_cache=mac.InMemoryNonceCache(10 ** 6))
+    authorizations = iter([
+        mac.generate_authorization_header_value('POST', URL, KEY_ID, signer, 'application/json', BODY)
+        for _ in range(number * repeat)
+    ])
+    # (name, function, number of requests handled per call)
+    benchmarks = [
+        ('generate_signature, key decoded per call',
+         lambda: mac.generate_signature(MAC_KEY, NORMALIZED_REQUEST_STRING), 1),
+        ('MACSigner.sign, key decoded once',
+         lambda: signer.sign(NORMALIZED_REQUEST_STRING), 1),
+        ('generate_authorization_header_value, key decoded per call',
+         lambda: mac.generate_authorization_header_value('POST', URL, KEY_ID, MAC_KEY, 'application/json', BODY), 1),
+        ('generate_authorization_header_value, reused MACSigner',
+         lambda: mac.generate_authorization_header_value('POST', URL, KEY_ID, signer, 'application/json', BODY), 1),
+        ('MACSigner.authorization_header_values, batches of {}'.format(BATCH_SIZE),
+         lambda: signer.authorization_header_values(batch, KEY_ID), BATCH_SIZE),
+        ('MACVerifier.verify',
+         lambda: verifier.verify('POST', URL, next(authorizations), 'application/json', BODY), 1),
+    ]
+    results = []
+    for name, function, requests_per_call in benchmarks:
+        calls = max(1, number // requests_per_call)
+        best = min(timeit.repeat(function, number=calls, repeat=repeat))
+        results.append((name, best / (calls * requests_per_call) * 1e6))
+    return results
+
+
+def main():
+    for name, microseconds in run():
+        print('{:<60} {:>8.2f} us/request'.format(name, microseconds))
+
+
+if __name__ == '__main__':
+    main()
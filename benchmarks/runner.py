@@ -0,0 +1,105 @@
+"""Runs the benchmarks, saves their results as JSON and compares them against a baseline.
+
+Save the results of a known good revision as a baseline, then compare later
+revisions against it on the same machine::
+
+    python -m benchmarks.runner --output baseline.json
+    python -m benchmarks.runner --baseline baseline.json --output results.json
+
+Results are the best time per call, or per request, in microseconds, keyed
+by benchmark module and name. Benchmarks more than `--threshold` slower than
+the baseline are reported as regressions, and make the runner exit with
+status 1.
+
+"""
+from __future__ import division, print_function
+
+import argparse
+import importlib
+import json
+import platform
+import sys
+
+BENCHMARKS = ['bench_mac', 'bench_codec', 'bench_client']
+DEFAULT_THRESHOLD = 0.1
+
+
+def run(modules=BENCHMARKS, repeat=5):
+    """Returns a dictionary of the results of the `run` function of each benchmark module, keyed by module."""
+    results = {}
+    for module_name in modules:
+        module = importlib.import_module('benchmarks.' + module_name)
+        results[module_name] = dict(module.run(repeat=repeat))
+    return results
+
+
+def environment():
+    """Returns a description of where the benchmarks ran, to be stored with their results."""
+    return {
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Returns a list of (module, name, baseline microseconds, microseconds, ratio) for the benchmarks in both,
+    and the list of those slower than the baseline by more than `threshold`, e.g. 0.1 for 10%.
+    """
+    comparisons = []
+    for module_name, module_results in sorted(results.items()):
+        module_baseline = baseline.get(module_name, {})
+        for name, microseconds in sorted(module_results.items()):
+            if name in module_baseline:
+                baseline_microseconds = module_baseline[name]
+                ratio = microseconds / baseline_microseconds if baseline_microseconds else float('inf')
+                comparisons.append((module_name, name, baseline_microseconds, microseconds, ratio))
+    regressions = [comparison for comparison in comparisons if comparison[4] > 1 + threshold]
+    return comparisons, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Runs the PyLCP benchmarks.')
+    parser.add_argument('modules', nargs='*', metavar='module',
+                        help='The benchmark modules to run, all by default: {}.'.format(', '.join(BENCHMARKS)))
+    parser.add_argument('--output', help='The file to save the results to, as JSON.')
+    parser.add_argument('--baseline', help='A file of results saved by --output to compare against.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='The slowdown, as a fraction of the baseline, reported as a regression.')
+    parser.add_argument('--repeat', type=int, default=5, help='The number of times each benchmark is timed.')
+    args = parser.parse_args(argv)
+    unknown = set(args.modules) - set(BENCHMARKS)
+    if unknown:
+        parser.error('unknown benchmark modules: {}'.format(', '.join(sorted(unknown))))
+
+    results = run(args.modules or BENCHMARKS, args.repeat)
+    for module_name, module_results in sorted(results.items()):
+        for name, microseconds in sorted(module_results.items()):
+            print('{:<14} {:<60} {:>10.2f} us'.format(module_name, name, microseconds))
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'environment': environment(), 'results': results}, output, indent=2, sort_keys=True)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as baseline_file:
+        baseline = json.load(baseline_file)
+    if baseline.get('environment') != environment():
+        print('\nThe baseline was saved in a different environment: {}'.format(baseline.get('environment')))
+    comparisons, regressions = compare(results, baseline['results'], args.threshold)
+    print('\n{:<14} {:<60} {:>10} {:>10} {:>7}'.format('module', 'benchmark', 'baseline', 'now', 'ratio'))
+    for module_name, name, baseline_microseconds, microseconds, ratio in comparisons:
+        flag = ' REGRESSION' if ratio > 1 + args.threshold else ''
+        print('{:<14} {:<60} {:>10.2f} {:>10.2f} {:>7.2f}{}'.format(
+            module_name, name, baseline_microseconds, microseconds, ratio, flag))
+    if regressions:
+        print('\n{} of {} benchmarks are more than {:.0%} slower than the baseline'.format(
+            len(regressions), len(comparisons), args.threshold))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
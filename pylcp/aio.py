@@ -0,0 +1,208 @@
+"""Asyncio support for signed requests to the Points Loyalty Commerce Platform.
+
+The :class:`AsyncClient` prepares, signs and logs requests exactly like
+:class:`pylcp.api.Client`, but sends them with `aiohttp
+<https://docs.aiohttp.org/>`_ so that a single event loop can keep many
+requests in flight. It requires Python 3.5+ and the `aio` extra::
+
+    pip install PyLCP[aio]
+
+"""
+import asyncio
+import os
+import ssl
+
+import aiohttp
+import requests
+from requests import hooks, structures, utils
+import yarl
+
+from pylcp import api, mac
+
+
+class AsyncClient(api.Client):
+    """
+    An asyncio counterpart of :class:`pylcp.api.Client`.
+
+    Requests are prepared with the same base URL joining, default content
+    types, :class:`MACAuth <pylcp.api.MACAuth>` signing and
+    :class:`APILogger <pylcp.api.APILogger>` logging as the blocking client.
+    The request methods (`request`, `get`, `post`, `put`, `patch`, `delete`,
+    `options` and `head`) are coroutines that return a
+    :class:`JsonResponseWrapper <pylcp.api.JsonResponseWrapper>` around a
+    fully read :class:`requests.Response`, so responses behave exactly like
+    those returned by the blocking client.
+
+    :param base_url: The HTTP scheme, netloc and version prefix for the LCP.
+    :param key_id: The MAC key identifier of the LCP credentials used for signing. Use `None` for anonymous requests.
+    :param shared_secret: The MAC key to use to sign requests.
+    :param loggable_content_types: The content types of request and response bodies to log. All are logged by default.
+    :param redaction_rules: The :class:`RedactionRules <pylcp.redaction.RedactionRules>` used to mask sensitive
+        fields of logged request and response bodies.
+    :param api_logger: The :class:`APILogger <pylcp.api.APILogger>` used to log requests and responses. A
+        :class:`BackgroundAPILogger <pylcp.api.BackgroundAPILogger>` keeps formatting off the event loop.
+    :param json_codec: The :class:`JSONCodec <pylcp.codec.JSONCodec>` used to parse responses, to encode crud
+        payloads and, unless an `api_logger` is given, to log bodies. Defaults to
+        :data:`pylcp.codec.DEFAULT_CODEC`.
+    :param connection_limit: The maximum number of simultaneous connections. Use `0` for no limit.
+    :param session: An optional :class:`aiohttp.ClientSession` to send requests with. A session is created on first
+        use when none is given, and is closed by :meth:`close`.
+    """
+
+    def __init__(self, base_url, key_id=None, shared_secret=None, loggable_content_types=None, redaction_rules=None,
+                 api_logger=None, json_codec=None, connection_limit=100, session=None):
+        super(AsyncClient, self).__init__(
+            base_url, key_id, shared_secret, loggable_content_types, redaction_rules, api_logger,
+            json_codec=json_codec)
+        self.connection_limit = connection_limit
+        self._aiohttp_session = session
+        self._owns_aiohttp_session = session is None
+
+    async def request(self, method, url, params=None, data=None, headers=None, cookies=None, files=None,
+                      auth=None, timeout=None, allow_redirects=True, proxies=None, hooks=None, stream=None,
+                      verify=None, cert=None, json=None):
+        """Prepares, signs and sends a request, returning the response once its body has been read.
+
+        The arguments are those of :meth:`requests.Session.request`, and
+        `verify`, `cert` and `proxies` are merged with the client's settings
+        and environment the same way.
+
+        :raises TypeError: If `stream` is true, as responses are always read whole.
+        """
+        request = requests.Request(
+            method=method.upper(),
+            url=url,
+            headers=headers,
+            files=files,
+            data=data or {},
+            json=json,
+            params=params or {},
+            auth=auth,
+            cookies=cookies,
+            hooks=hooks,
+        )
+        prepared_request = self.prepare_request(request)
+        settings = self.merge_environment_settings(prepared_request.url, proxies or {}, stream, verify, cert)
+        return await self.send(prepared_request, timeout=timeout, allow_redirects=allow_redirects, **settings)
+
+    async def send(self, request, timeout=None, allow_redirects=True, stream=False, verify=True, cert=None,
+                   proxies=None):
+        """Send a given :class:`requests.PreparedRequest`.
+
+        The request and response are logged.
+
+        :raises TypeError: If `stream` is true, as responses are always read whole.
+        """
+        if stream:
+            raise TypeError('AsyncClient does not support streamed responses')
+        # Unsigned streamed bodies are read here, so that they can be both logged and sent
+        request.body = mac.replayable_body(request.body)
+        self._log_request(request)
+        response = await self._send(request, timeout, allow_redirects, _ssl_option(verify, cert),
+                                    utils.select_proxy(request.url, proxies))
+        response = hooks.dispatch_hook('response', request.hooks, response)
+        self._log_response(response)
+        return response
+
+    async def close(self):
+        """Closes the underlying :class:`aiohttp.ClientSession` if it was created by this client."""
+        if self._aiohttp_session is not None and self._owns_aiohttp_session:
+            await self._aiohttp_session.close()
+            self._aiohttp_session = None
+        super(AsyncClient, self).close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    def _get_aiohttp_session(self):
+        if self._aiohttp_session is None:
+            self._aiohttp_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit),
+                # Cookies are merged into the prepared request by requests.
+                cookie_jar=aiohttp.DummyCookieJar(),
+            )
+        return self._aiohttp_session
+
+    async def _send(self, request, timeout, allow_redirects, ssl_option, proxy):
+        session = self._get_aiohttp_session()
+        options = {'ssl': ssl_option} if ssl_option is not None else {}
+        body, headers = request.body, request.headers
+        if isinstance(body, (list, tuple)):
+            # Streamed bodies are replaced by a list of their chunks, which aiohttp would send as a form. Sent whole,
+            # they have a length rather than the chunked encoding requests chose for them.
+            body = b''.join(mac._to_bytes(chunk) for chunk in body)
+            headers = structures.CaseInsensitiveDict(headers)
+            headers.pop('Transfer-Encoding', None)
+        try:
+            async with session.request(
+                    request.method,
+                    # The URL has already been encoded and signed, so it must be sent verbatim.
+                    yarl.URL(request.url, encoded=True),
+                    data=body,
+                    headers=headers,
+                    allow_redirects=allow_redirects,
+                    proxy=proxy,
+                    timeout=_client_timeout(timeout),
+                    **options) as aiohttp_response:
+                content = await aiohttp_response.read()
+        except asyncio.TimeoutError as e:
+            raise requests.Timeout(e, request=request)
+        except aiohttp.ClientConnectionError as e:
+            raise requests.ConnectionError(e, request=request)
+        except aiohttp.ClientError as e:
+            raise requests.RequestException(e, request=request)
+        return _build_response(request, aiohttp_response, content)
+
+
+def _ssl_option(verify, cert):
+    """Translates requests style `verify` and `cert` settings into the `ssl` option of aiohttp."""
+    if verify is True and not cert:
+        # aiohttp's default
+        return None
+    if verify is False:
+        context = ssl.create_default_context()
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    elif verify is True:
+        context = ssl.create_default_context()
+    elif os.path.isdir(verify):
+        context = ssl.create_default_context(capath=verify)
+    else:
+        context = ssl.create_default_context(cafile=verify)
+    if cert:
+        if isinstance(cert, tuple):
+            context.load_cert_chain(*cert)
+        else:
+            context.load_cert_chain(cert)
+    return context
+
+
+def _client_timeout(timeout):
+    """Translates a requests style timeout into an :class:`aiohttp.ClientTimeout`."""
+    if timeout is None:
+        return aiohttp.ClientTimeout()
+    if isinstance(timeout, tuple):
+        connect, read = timeout
+        return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+    return aiohttp.ClientTimeout(total=timeout)
+
+
+def _build_response(request, aiohttp_response, content):
+    """Returns a :class:`requests.Response` for a fully read aiohttp response."""
+    response = requests.Response()
+    response.request = request
+    response.url = str(aiohttp_response.url)
+    response.status_code = aiohttp_response.status
+    response.reason = aiohttp_response.reason
+    response.headers = structures.CaseInsensitiveDict()
+    for name, value in aiohttp_response.headers.items():
+        if name in response.headers:
+            value = response.headers[name] + ', ' + value
+        response.headers[name] = value
+    response.encoding = utils.get_encoding_from_headers(response.headers)
+    response._content = content
+    response._content_consumed = True
+    return response
@@ -1,12 +1,17 @@
 from builtins import str
 from builtins import object
-import copy
 import json
 import logging
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import threading
 
 import requests
 
-from pylcp.mac import generate_authorization_header_value
+from pylcp import cache, codec, mac, pool, redaction, singleflight
+from pylcp.mac import MACSigner, generate_authorization_header_value, replayable_body
 import pylcp.url
 
 
@@ -25,11 +30,54 @@ except NameError:
 
 
 class JsonResponseWrapper(object):
-    def __init__(self, response):
+    """
+    Wraps a :class:`requests.Response` whose JSON body is parsed, with
+    numbers parsed as :class:`decimal.Decimal`, at most once.
+
+    The parsed body is shared by every caller of :meth:`json`, including the
+    :class:`APILogger`, which may be formatting it on another thread, and so
+    is read-only. `json_parse_count` records the number of times the body has
+    been parsed; concurrent callers wait for the one parse.
+
+    :param response: The response to wrap.
+    :param json_codec: The :class:`JSONCodec <pylcp.codec.JSONCodec>` used to parse the body.
+    :param instrumentation: The :class:`Instrumentation <pylcp.instrumentation.Instrumentation>` recording the
+        time spent parsing the body, if any.
+    """
+    def __init__(self, response, json_codec=codec.DEFAULT_CODEC, instrumentation=None):
         self.response = response
+        self.json_codec = json_codec
+        self.instrumentation = instrumentation
+        self.json_parse_count = 0
+        self._json = None
+        self._json_error = None
+        self._json_lock = threading.Lock()
 
     def json(self):
-        return self.response.json(use_decimal=True)
+        """Returns the parsed body, which is shared and must not be modified; copy it to change it.
+
+        :raises ValueError: If the body is not JSON.
+        """
+        if self.json_parse_count == 0:
+            with self._json_lock:
+                if self.json_parse_count == 0:
+                    self._parse_json()
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
+
+    def _parse_json(self):
+        if self.instrumentation is not None:
+            start = self.instrumentation.clock()
+        try:
+            self._json = self.json_codec.loads(_json_body(self.response))
+        except ValueError as e:
+            self._json_error = e
+        if self.instrumentation is not None:
+            self.instrumentation.record(
+                'decode', self.instrumentation.clock() - start, self.response.request, self.response.status_code)
+        # Counted only once the result is set, as other threads return it as soon as the count is not 0
+        self.json_parse_count += 1
 
     def __getattr__(self, attr):
         return getattr(self.response, attr)
@@ -39,11 +87,16 @@ class JsonResponseWrapper(object):
         return self.response.ok
 
 
-def _requests_response_hook(response, *args, **kwargs):
-    return JsonResponseWrapper(response)
+def _json_body(response):
+    """Returns the body of `response` for decoding, without decoding it to text when it is UTF-8 encoded."""
+    encoding = response.encoding
+    if encoding is None or encoding.lower().replace('-', '') == 'utf8':
+        return response.content
+    return response.text
 
 
 LOG_SEPARATOR = u'------------------------------------------------------------\n'
+UNLOGGABLE_BODY = u'<unloggable body redacted>'
 
 
 class APILogger(object):
@@ -51,10 +104,13 @@ class APILogger(object):
     REQUEST_LOG_TEMPLATE = LOG_SEPARATOR + u'%(method)s %(url)s HTTP/1.1\n%(headers)s\n\n%(body)s'
     RESPONSE_LOG_TEMPLATE = LOG_SEPARATOR + u'HTTP/1.1 %(status_code)d %(reason)s\n%(headers)s\n\n%(body)s'
 
-    def __init__(self, request_logger, response_logger, loggable_content_types=None):
+    def __init__(self, request_logger, response_logger, loggable_content_types=None, redaction_rules=None,
+                 json_codec=codec.DEFAULT_CODEC):
         self.request_logger = request_logger
         self.response_logger = response_logger
         self.loggable_content_types = loggable_content_types or []
+        self.redaction_rules = redaction_rules or DEFAULT_REDACTION_RULES
+        self.json_codec = json_codec
 
     def log_request(self, request):
         if self.request_logger.isEnabledFor(logging.DEBUG):
@@ -84,7 +140,7 @@ class APILogger(object):
         return '\n'.join('{}: {}'.format(k, v) for k, v in list(headers.items()))
 
     def pretty_json_dumps(self, data):
-        return json.dumps(data, sort_keys=True, indent=2, separators=(',', ': '))
+        return self.json_codec.pretty_dumps(data)
 
     def _log_content(self, content_type):
         return not self.loggable_content_types or content_type in self.loggable_content_types
@@ -94,27 +150,42 @@ class APILogger(object):
             return "content not logged"
         else:
             try:
-                return self.pretty_json_dumps(json.loads(response.text))
-            except:
+                data = self._response_json(response)
+            except ValueError:
+                # Not JSON, so there are no fields to redact
                 return response.text
+            return self._masked_pretty_json(self.redaction_rules.redact, data)
+
+    def _masked_pretty_json(self, mask, data):
+        """Returns `data` masked by `mask` and formatted, or a placeholder if it cannot be masked, never `data`."""
+        try:
+            return self.pretty_json_dumps(mask(data))
+        except Exception as e:
+            logger.warning('Could not redact a logged body: %s', type(e).__name__)
+            return UNLOGGABLE_BODY
+
+    def _response_json(self, response):
+        """Returns the parsed response body, shared with the response itself when possible."""
+        if isinstance(response, JsonResponseWrapper):
+            return response.json()
+        return self.json_codec.loads(_json_body(response))
 
     def mask_sensitive_data(self, data):
+        """Returns `data` with the fields matched by the logger's redaction rules masked.
+
+        Only the objects containing masked fields are copied, everything else
+        is shared with `data`, which is itself returned if nothing needs masking.
+        """
         if not data:
             return
         if is_string(data):
             try:
-                data = json.loads(data)
+                data = self.json_codec.loads(data)
             except ValueError:
                 return data
-            return json.dumps(self.mask_sensitive_data(data))
+            return self.json_codec.dumps(self.redaction_rules.redact(data)).decode('utf-8')
 
-        copied_data = copy.deepcopy(data)
-        copied_data = mask_sensitive_billing_info_data(copied_data)
-
-        if 'password' in copied_data:
-            copied_data['password'] = 'XXX'
-
-        return copied_data
+        return self.redaction_rules.redact(data)
 
     def get_masked_and_formatted_request_body(self, request):
         """
@@ -125,16 +196,129 @@ class APILogger(object):
         if not self._log_content(content_type):
             return "content not logged"
         else:
-            if content_type == 'application/json' and request.body:
+            body = request.body
+            if isinstance(body, list):
+                # Streamed bodies are replaced by a list of their chunks when signed
+                body = b''.join(mac._to_bytes(chunk) for chunk in body)
+            if content_type == 'application/json' and body:
+                # Payloads are logged from their encoded bytes, which, unlike the data of a JsonPayload, are what was
+                # sent even once the caller has changed that data
                 try:
-                    data = json.loads(request.body)
+                    data = self.json_codec.loads(body)
                 except ValueError:
-                    return request.body
-                masked_data = self.mask_sensitive_data(data)
-                return self.pretty_json_dumps(masked_data)
+                    return body
+                return self._masked_pretty_json(self.mask_sensitive_data, data)
             if 'charset=utf-8' in request.headers.get('Content-Type', ''):
-                return request.body.decode('utf-8')
-            return request.body
+                return body.decode('utf-8')
+            return body
+
+
+class BackgroundAPILogger(APILogger):
+    """
+    An :class:`APILogger` that formats, masks and writes log messages on a background thread.
+
+    Logging a request or response only checks the logger's level and queues
+    the message, which keeps formatting and masking off the request's
+    critical path. When the queue is full, messages are handled according
+    to the drop policy: the new message is dropped (`DROP_NEWEST`), the
+    oldest queued message is dropped (`DROP_OLDEST`), or the caller waits
+    for room in the queue (`BLOCK`). The number of dropped messages is kept
+    in `dropped`. Streamed responses, whose body is not read yet, are
+    logged by the caller, as :class:`APILogger` does.
+
+    :param queue_size: The maximum number of messages waiting to be written.
+    :param drop_policy: One of `DROP_NEWEST`, `DROP_OLDEST` or `BLOCK`.
+    """
+
+    DROP_NEWEST = 'drop_newest'
+    DROP_OLDEST = 'drop_oldest'
+    BLOCK = 'block'
+
+    def __init__(self, request_logger, response_logger, loggable_content_types=None, redaction_rules=None,
+                 queue_size=1000, drop_policy=DROP_NEWEST, json_codec=codec.DEFAULT_CODEC):
+        super(BackgroundAPILogger, self).__init__(
+            request_logger, response_logger, loggable_content_types, redaction_rules, json_codec)
+        if drop_policy not in (self.DROP_NEWEST, self.DROP_OLDEST, self.BLOCK):
+            raise ValueError('Unknown drop policy: {}'.format(drop_policy))
+        self.queue = queue.Queue(queue_size)
+        self.drop_policy = drop_policy
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def log_request(self, request):
+        if self.request_logger.isEnabledFor(logging.DEBUG):
+            self._enqueue(super(BackgroundAPILogger, self).log_request, _LoggedRequest(request))
+
+    def log_response(self, response):
+        if self.response_logger.isEnabledFor(logging.DEBUG):
+            if getattr(response, '_content', None) is False:
+                # The body of a streamed response is still unread, and must not be read by the worker while the
+                # caller reads it
+                super(BackgroundAPILogger, self).log_response(response)
+            else:
+                self._enqueue(super(BackgroundAPILogger, self).log_response, response)
+
+    def flush(self):
+        """Blocks until every queued message has been written."""
+        self.queue.join()
+
+    def _enqueue(self, log, message):
+        self._start_worker()
+        item = (log, message)
+        if self.drop_policy == self.BLOCK:
+            self.queue.put(item)
+            return
+        try:
+            self.queue.put_nowait(item)
+            return
+        except queue.Full:
+            pass
+        # Every message that ends up not queued is counted, the new one included
+        dropped = 1
+        if self.drop_policy == self.DROP_OLDEST:
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+                dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+                dropped -= 1
+            except queue.Full:
+                pass
+        with self._lock:
+            self.dropped += dropped
+
+    def _start_worker(self):
+        # Also restarts the worker in a child process after a fork
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(target=self._write_messages, name='pylcp-api-logger')
+                    self._worker.daemon = True
+                    self._worker.start()
+
+    def _write_messages(self):
+        while True:
+            log, message = self.queue.get()
+            try:
+                log(message)
+            except Exception:
+                logger.exception('Unable to log LCP API message')
+            finally:
+                self.queue.task_done()
+
+
+class _LoggedRequest(object):
+    """A snapshot of the parts of a prepared request that are logged."""
+
+    def __init__(self, request):
+        self.method = request.method
+        self.url = request.url
+        self.headers = request.headers.copy()
+        self.body = request.body
 
 
 class Client(requests.Session):
@@ -144,19 +328,59 @@ class Client(requests.Session):
     :param base_url: The HTTP scheme, netloc and version prefix for the LCP.
     :param key_id: The MAC key identifier of the LCP credentials used for signing. Use `None` for anonymous requests.
     :param shared_secret: The MAC key to use to sign requests.
+    :param loggable_content_types: The content types of request and response bodies to log. All are logged by default.
+    :param redaction_rules: The :class:`RedactionRules <pylcp.redaction.RedactionRules>` used to mask sensitive
+        fields of logged request and response bodies. Defaults to :data:`DEFAULT_REDACTION_RULES`.
+    :param api_logger: The :class:`APILogger` used to log requests and responses, e.g. a
+        :class:`BackgroundAPILogger`. When given, `loggable_content_types` and `redaction_rules` are ignored.
+    :param pool_connections: The number of hosts for which connection pools are kept.
+    :param pool_maxsize: The maximum number of connections kept open to each host. Use at least the number of
+        threads sending requests with this client, or connections will be discarded and reopened.
+    :param pool_block: Whether requests should wait for a pooled connection when `pool_maxsize` connections to the
+        host are in use, rather than opening a connection which is discarded afterwards.
+    :param keep_alive: Whether connections are kept open between requests. When `False`, every request asks the
+        server to close its connection.
+    :param retry_policy: The :class:`RetryPolicy <pylcp.retry.RetryPolicy>` deciding which requests that fail
+        because of transient errors are sent again. Requests are not retried by default.
+    :param json_codec: The :class:`JSONCodec <pylcp.codec.JSONCodec>` used to parse responses, to encode crud
+        payloads and, unless an `api_logger` is given, to log bodies. Defaults to
+        :data:`pylcp.codec.DEFAULT_CODEC`.
+    :param response_cache: The :class:`ResponseCache <pylcp.cache.ResponseCache>` keeping responses to `GET`
+        requests. Responses are not cached by default.
+    :param coalesce_reads: Whether concurrent `GET` requests for the same URL, with the same credentials, headers
+        and settings such as `timeout`, share one request to the LCP. Each caller still receives its own response.
+    :param instrumentation: The :class:`Instrumentation <pylcp.instrumentation.Instrumentation>` recording the time
+        spent in each phase of every request sent. Nothing is measured by default.
     """
 
-    def __init__(self, base_url, key_id=None, shared_secret=None, loggable_content_types=None, *args, **kwargs):
+    def __init__(self, base_url, key_id=None, shared_secret=None, loggable_content_types=None, redaction_rules=None,
+                 api_logger=None, pool_connections=requests.adapters.DEFAULT_POOLSIZE,
+                 pool_maxsize=requests.adapters.DEFAULT_POOLSIZE, pool_block=requests.adapters.DEFAULT_POOLBLOCK,
+                 keep_alive=True, retry_policy=None, json_codec=None, response_cache=None,
+                 coalesce_reads=False, instrumentation=None, *args, **kwargs):
         super(Client, self).__init__(*args, **kwargs)
+        self.adapter = pool.PooledHTTPAdapter(
+            pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+        self.mount('https://', self.adapter)
+        self.mount('http://', self.adapter)
+        if not keep_alive:
+            self.headers['Connection'] = 'close'
+
         if key_id is not None:
             self.auth = MACAuth(key_id, shared_secret)
 
-        self.api_logger = APILogger(request_logger, response_logger, loggable_content_types)
+        self.json_codec = json_codec or codec.DEFAULT_CODEC
+        self.api_logger = api_logger or APILogger(
+            request_logger, response_logger, loggable_content_types, redaction_rules, self.json_codec)
 
+        self.retry_policy = retry_policy
+        self.response_cache = response_cache
+        self.single_flight = singleflight.SingleFlight() if coalesce_reads else None
+        self.instrumentation = instrumentation
         self.base_url = base_url
         self.key_id = key_id
         self.shared_secret = shared_secret
-        self.hooks = {'response': _requests_response_hook}
+        self.hooks = {'response': self._wrap_response}
 
     def prepare_request(self, request):
         if self.base_url and not request.url.startswith('http'):
@@ -167,19 +391,156 @@ class Client(requests.Session):
         else:
             request.headers.setdefault('Content-Type', '')
 
-        prepared_request = super(Client, self).prepare_request(request)
+        auth = request.auth or self.auth
+        if self.instrumentation is None or auth is None:
+            prepared_request = super(Client, self).prepare_request(request)
+        else:
+            timed_auth = _TimedAuth(auth, self.instrumentation.clock)
+            original_auth, request.auth = request.auth, timed_auth
+            try:
+                prepared_request = super(Client, self).prepare_request(request)
+            finally:
+                request.auth = original_auth
+            prepared_request._sign_seconds = timed_auth.seconds
+        # Kept to sign retries with the same credentials
+        prepared_request._auth = auth
         return prepared_request
 
     def send(self, request, **kwargs):
         """Send a given :class:`requests.PreparedRequest`.
 
-        The request and response are logged.
+        The request and response are logged. Requests which fail are retried
+        as decided by the `retry_policy`, and each attempt is signed again by
+        the `auth` which signed the request and logged. `GET` requests are answered from the
+        `response_cache`, if any, when possible, and with `coalesce_reads`,
+        share the request of a concurrent `GET` for the same URL, credentials,
+        headers and settings, such as `timeout`. Responses which were not received for this request are
+        not logged.
         """
-        self._log_request(request)
-        response = super(Client, self).send(request, **kwargs)
-        self._log_response(response)
+        if request.method != 'GET' or kwargs.get('stream'):
+            return self._send_with_retries(request, **kwargs)
+        key = self._read_key(request)
+        if key is None:
+            return self._send_with_retries(request, **kwargs)
+        if self.single_flight is None:
+            return self._send_read(key, request, **kwargs)
+
+        def send_and_snapshot():
+            response = self._send_read(key, request, **kwargs)
+            return response, cache.CacheEntry(response, expires_at=0)
+        # Only requests sent with the same settings, such as their timeout, share a response
+        settings = tuple(sorted((name, tuple(sorted(value.items())) if isinstance(value, dict) else value)
+                                for name, value in list(kwargs.items())))
+        (response, snapshot), shared = self.single_flight.do((key, settings), send_and_snapshot)
+        if shared:
+            response = self._wrap_response(snapshot.to_response(request))
         return response
 
+    def _read_key(self, request):
+        """Returns the key under which a `GET` is cached and coalesced, or `None` if it must be sent on its own.
+
+        Responses may vary with any request header, so all of them are part of
+        the key except `Authorization`, whose MAC changes on every request and
+        is replaced by the identity of the credentials signing it.
+        """
+        auth = getattr(request, '_auth', self.auth)
+        if auth is self.auth:
+            identity = self.key_id
+        elif isinstance(auth, MACAuth):
+            identity = auth.key_id
+        else:
+            # Other credentials have no identity to tell them apart
+            return None
+        headers = tuple(sorted((name.lower(), value) for name, value in list(request.headers.items())
+                               if name.lower() != 'authorization'))
+        return identity, request.url, headers
+
+    def _send_read(self, key, request, **kwargs):
+        if self.response_cache is None:
+            return self._send_with_retries(request, **kwargs)
+        response = self.response_cache.send(
+            key, request, lambda request: self._send_with_retries(request, **kwargs))
+        if not isinstance(response, JsonResponseWrapper):
+            response = self._wrap_response(response)
+        return response
+
+    def _send_with_retries(self, request, **kwargs):
+        policy = self.retry_policy
+        if policy is None or not policy.can_retry(request):
+            return self._send_once(request, **kwargs)
+
+        policy.budget.deposit()
+        attempt = 1
+        while True:
+            try:
+                response = self._send_once(request, **kwargs)
+            except requests.RequestException as e:
+                delay = policy.retry_delay(request, attempt, error=e)
+                if delay is None:
+                    raise
+            else:
+                delay = policy.retry_delay(request, attempt, response=response)
+                if delay is None:
+                    return response
+                response.close()
+
+            policy.sleep(delay)
+            attempt += 1
+            request = self._sign_again(request)
+
+    def _wrap_response(self, response, *args, **kwargs):
+        return JsonResponseWrapper(response, self.json_codec, self.instrumentation)
+
+    def _send_once(self, request, **kwargs):
+        if self.instrumentation is None:
+            self._log_request(request)
+            response = super(Client, self).send(request, **kwargs)
+            self._log_response(response)
+            return response
+
+        timer = self.instrumentation.timer(request)
+        if getattr(request, '_sign_seconds', None) is not None:
+            timer.add('sign', request._sign_seconds)
+        response = None
+        try:
+            with timer.measure('log'):
+                self._log_request(request)
+            with timer.active():
+                start = timer.clock()
+                response = super(Client, self).send(request, **kwargs)
+                sent = timer.clock() - start
+            # requests sets elapsed to the time until the headers were received, before reading the body
+            headers_received = response.elapsed.total_seconds()
+            timer.add('ttfb', max(0.0, headers_received - timer.seconds.get('connect', 0.0)))
+            if not kwargs.get('stream'):
+                timer.add('download', max(0.0, sent - headers_received))
+            with timer.measure('log'):
+                self._log_response(response)
+            return response
+        finally:
+            timer.finish(response.status_code if response is not None else None)
+
+    def _sign_again(self, request):
+        # Replaying a signed request would reuse its MAC timestamp and nonce
+        auth = getattr(request, '_auth', self.auth)
+        request = request.copy()
+        request._auth = auth
+        if auth is not None:
+            if self.instrumentation is None:
+                return auth(request)
+            timed_auth = _TimedAuth(auth, self.instrumentation.clock)
+            request = timed_auth(request)
+            request._sign_seconds = timed_auth.seconds
+        return request
+
+    def pool_stats(self):
+        """Returns the :class:`PoolStats <pylcp.pool.PoolStats>` of each host as a dictionary.
+
+        Only requests sent through the client's :class:`PooledHTTPAdapter <pylcp.pool.PooledHTTPAdapter>`
+        are counted, so requests through adapters mounted by the caller are not.
+        """
+        return self.adapter.stats()
+
     def _log_request(self, request):
         self.api_logger.log_request(request)
 
@@ -187,20 +548,49 @@ class Client(requests.Session):
         self.api_logger.log_response(response)
 
 
+class _TimedAuth(requests.auth.AuthBase):
+    """Calls `auth`, recording how many `seconds` it took."""
+    def __init__(self, auth, clock):
+        self.auth = auth
+        self.clock = clock
+        self.seconds = None
+
+    def __call__(self, request):
+        start = self.clock()
+        request = self.auth(request)
+        self.seconds = self.clock() - start
+        return request
+
+
 class MACAuth(requests.auth.AuthBase):
     """
     Attaches an authorization MAC header to the given request.
+
+    The shared secret is decoded once, into a :class:`MACSigner <pylcp.mac.MACSigner>`
+    that is reused for every request signed by this instance.
+
+    Streamed bodies are hashed a chunk at a time. Generators and other bodies
+    which can only be read once are replaced by the list of their chunks, so
+    that they can be sent after being hashed.
     """
     def __init__(self, key_id, shared_secret):
         self.key_id = key_id
         self.shared_secret = shared_secret
+        self._signer = None
+
+    @property
+    def signer(self):
+        if self._signer is None or self._signer.mac_key != self.shared_secret:
+            self._signer = MACSigner(self.shared_secret)
+        return self._signer
 
     def __call__(self, request):
+        request.body = replayable_body(request.body)
         request.headers['Authorization'] = generate_authorization_header_value(
             request.method,
             request.url,
             self.key_id,
-            self.shared_secret,
+            self.signer,
             request.headers['Content-Type'],
             request.body
         )
@@ -236,6 +626,9 @@ def mask_credit_card_number_with_bin(credit_card_number):
 def mask_sensitive_billing_info_data(data):
     """Returns `data` with the `cardNumber` and `securityCode` fields of
     the standard LCP `billingInfo` sub-dictionary masked.
+
+    Only the objects containing masked fields are copied, everything else is
+    shared with `data`, which is itself returned if nothing needs masking.
     """
     if not data:
         return
@@ -244,14 +637,16 @@ def mask_sensitive_billing_info_data(data):
             data = json.loads(data)
         except ValueError:
             return data
-        return json.dumps(mask_sensitive_billing_info_data(data))
+        return json.dumps(_BILLING_INFO_RULES.redact(data))
+
+    return _BILLING_INFO_RULES.redact(data)
+
 
-    copied_data = copy.deepcopy(data)
-    if 'billingInfo' in copied_data:
-        if 'cardNumber' in copied_data['billingInfo']:
-            card_number = copied_data['billingInfo']['cardNumber']
-            copied_data['billingInfo']['cardNumber'] = mask_credit_card_number(card_number)
+_BILLING_INFO_PATHS = {
+    'billingInfo.cardNumber': mask_credit_card_number,
+    'billingInfo.securityCode': redaction.mask_all,
+}
+_BILLING_INFO_RULES = redaction.RedactionRules(paths=_BILLING_INFO_PATHS)
 
-        if 'securityCode' in copied_data['billingInfo']:
-            copied_data['billingInfo']['securityCode'] = 'XXX'
-    return copied_data
+DEFAULT_REDACTION_RULES = redaction.RedactionRules(paths=dict(_BILLING_INFO_PATHS, password=redaction.mask_all))
+"""The rules used to mask request and response bodies when none are given to a :class:`Client`."""
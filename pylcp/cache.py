@@ -0,0 +1,245 @@
+"""Client side caching of LCP responses.
+
+A :class:`ResponseCache` given to a :class:`Client <pylcp.api.Client>` keeps
+successful responses to `GET` requests, such as those of
+:meth:`LoyaltyProgram.read <pylcp.crud.loyalty_program.LoyaltyProgram.read>`,
+and serves them again without a request for as long as they are fresh. Once
+stale, a response with an `ETag` or `Last-Modified` header is revalidated
+with a conditional request, and reused if the LCP answers
+`304 Not Modified`, so that only headers cross the network.
+
+Freshness follows the `Cache-Control` header of each response: `max-age`
+gives its lifetime, `no-cache` has it revalidated on every use and
+`no-store` keeps it out of the cache, as does `Vary: *`. Responses without
+a `max-age` are fresh for the cache's `default_ttl`.
+
+Entries are evicted least recently used first when the cache holds
+`max_entries` responses or `max_bytes` of response bodies and headers.
+
+"""
+from builtins import object
+import collections
+import copy
+import threading
+import time
+
+try:
+    from http.client import NOT_MODIFIED, OK
+except ImportError:
+    from httplib import NOT_MODIFIED, OK
+
+import requests
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_MAX_BYTES = 16 * 1024 * 1024
+
+# Headers of a 304 response which replace those of the cached response, see RFC 7234 section 4.3.4
+_REVALIDATION_HEADERS = ('Cache-Control', 'Date', 'ETag', 'Expires', 'Last-Modified')
+
+
+class CacheStats(object):
+    """Counters of the use of a :class:`ResponseCache`.
+
+    `hits` counts responses served from the cache without a request,
+    `revalidations` those served from the cache after the LCP answered a
+    conditional request with `304 Not Modified`, `misses` the requests
+    answered with a full response, and `evictions` the responses removed to
+    make room for others.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.revalidations = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def as_dict(self):
+        return {
+            'hits': self.hits,
+            'revalidations': self.revalidations,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __repr__(self):
+        return 'CacheStats({})'.format(', '.join('{}={}'.format(*item) for item in sorted(self.as_dict().items())))
+
+
+class CacheEntry(object):
+    """A snapshot of a response, and when it stops being fresh in a :class:`ResponseCache`."""
+
+    def __init__(self, response, expires_at):
+        self.status_code = response.status_code
+        self.reason = response.reason
+        self.url = response.url
+        self.encoding = response.encoding
+        self.headers = requests.structures.CaseInsensitiveDict(response.headers)
+        self.content = response.content
+        self.expires_at = expires_at
+        self.size = len(self.content) + sum(len(name) + len(value) for name, value in self.headers.items())
+
+    def is_fresh(self, now):
+        return now < self.expires_at
+
+    @property
+    def validators(self):
+        """The conditional request headers with which to revalidate the response."""
+        validators = {}
+        if 'ETag' in self.headers:
+            validators['If-None-Match'] = self.headers['ETag']
+        if 'Last-Modified' in self.headers:
+            validators['If-Modified-Since'] = self.headers['Last-Modified']
+        return validators
+
+    def to_response(self, request):
+        """Returns a new :class:`requests.Response` to `request` with the cached status, headers and body."""
+        response = requests.Response()
+        response.status_code = self.status_code
+        response.reason = self.reason
+        response.url = self.url
+        response.encoding = self.encoding
+        response.headers = copy.copy(self.headers)
+        response._content = self.content
+        response._content_consumed = True
+        response.request = request
+        return response
+
+
+class ResponseCache(object):
+    """A least recently used cache of responses to `GET` requests, see :mod:`pylcp.cache`.
+
+    A cache is safe to share between threads and between clients. A
+    :class:`Client <pylcp.api.Client>` caches responses by URL, MAC key ID
+    and request headers, so requests with other credentials or headers are
+    never answered with each other's responses.
+
+    :param max_entries: The maximum number of responses kept.
+    :param max_bytes: The maximum total size, in bytes, of the bodies and headers of the responses kept.
+    :param default_ttl: The seconds for which a response without a `Cache-Control: max-age` is fresh. With the
+        default of 0, such responses are only kept if they can be revalidated.
+    :param clock: The function returning the current time in seconds.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, max_bytes=DEFAULT_MAX_BYTES, default_ttl=0,
+                 clock=time.time):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.size = 0
+        self._stats = CacheStats()
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Returns the :meth:`CacheStats.as_dict` of the cache, with its current `entries` and `bytes`."""
+        with self._lock:
+            return dict(self._stats.as_dict(), entries=len(self._entries), bytes=self.size)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def get(self, key):
+        """Returns the :class:`CacheEntry` for `key`, fresh or stale, or `None`."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._move_to_end(key)
+            return entry
+
+    def send(self, key, request, send):
+        """Returns the response to `request`, from the cache if possible.
+
+        :param key: The key of the request's response in the cache.
+        :param request: The :class:`requests.PreparedRequest` to answer.
+        :param send: The function sending a request, and returning its response, when the cache can't answer.
+        """
+        entry = self.get(key)
+        if entry is not None and entry.is_fresh(self.clock()):
+            self._count('hits')
+            return entry.to_response(request)
+
+        validators = entry.validators if entry is not None else {}
+        if validators:
+            request = request.copy()
+            request.headers.update(validators)
+        response = send(request)
+
+        if entry is not None and response.status_code == NOT_MODIFIED:
+            response.close()
+            self._count('revalidations')
+            entry = self._revalidated(entry, response)
+            self.put(key, entry)
+            return entry.to_response(request)
+
+        self._count('misses')
+        self.store(key, response)
+        return response
+
+    def store(self, key, response):
+        """Caches `response` under `key` if it is a cacheable, successful response."""
+        if response.status_code != OK:
+            return
+        directives = _cache_control(response.headers)
+        # Requests are keyed by all their headers, but a response varying with something else can't be reused
+        if 'no-store' in directives or response.headers.get('Vary', '').strip() == '*':
+            return
+        ttl = self._ttl(directives)
+        if ttl <= 0 and 'ETag' not in response.headers and 'Last-Modified' not in response.headers:
+            return
+        self.put(key, CacheEntry(response, self.clock() + ttl))
+
+    def put(self, key, entry):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            if entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self.size += entry.size
+            while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+                self._stats.evictions += 1
+
+    def _ttl(self, directives):
+        if 'no-cache' in directives:
+            return 0
+        try:
+            return max(0, int(directives['max-age']))
+        except (KeyError, TypeError, ValueError):
+            return self.default_ttl
+
+    def _revalidated(self, entry, response):
+        """Returns a copy of `entry` refreshed by the headers of the 304 `response`."""
+        entry = copy.copy(entry)
+        entry.headers = copy.copy(entry.headers)
+        for name in _REVALIDATION_HEADERS:
+            if name in response.headers:
+                entry.headers[name] = response.headers[name]
+        entry.expires_at = self.clock() + self._ttl(_cache_control(entry.headers))
+        return entry
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self._stats, counter, getattr(self._stats, counter) + 1)
+
+    def _move_to_end(self, key):
+        # OrderedDict.move_to_end is missing on Python 2
+        self._entries[key] = self._entries.pop(key)
+
+
+def _cache_control(headers):
+    """Returns the directives of the `Cache-Control` header as a dictionary of their values, if any."""
+    directives = {}
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = value.strip('"') or None
+    return directives
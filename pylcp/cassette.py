@@ -0,0 +1,260 @@
+"""Recording of LCP traffic, and its deterministic replay.
+
+A :class:`CassetteRecorder` is a :mod:`requests` transport adapter which
+sends requests through another adapter, such as the one of a
+:class:`Client <pylcp.api.Client>`, and appends every interaction to a
+cassette file as it is received::
+
+    client = pylcp.api.Client('https://lcp.points.com/v1', key_id, shared_secret)
+    recorder = CassetteRecorder('lcp.cassette', client.adapter)
+    client.mount('https://', recorder)
+
+A :class:`CassetteReplayer` then answers the same requests from the
+cassette, without any network::
+
+    client.mount('https://', CassetteReplayer('lcp.cassette'))
+
+Interactions are matched by method, normalized path and query, and a hash
+of the request body. Headers are not matched, and the `Authorization`
+header, whose MAC `ts` and `nonce` vary on every request, is not recorded.
+Requests matching several interactions are answered with each in the order
+they were recorded, then with the last one again.
+
+Cassettes are UTF-8 text files of one interaction per line, after a
+version line. Each line starts with its tab separated method, path and
+body hash, followed by the request and response as JSON. Recording only
+ever appends, so a cassette can be recorded over several runs, and an
+interrupted recording keeps every complete interaction; the incomplete one
+is dropped when recording resumes. Replay maps the
+file into memory and indexes it by reading only the start of each line.
+The JSON of an interaction is decoded when it is first replayed.
+
+"""
+import base64
+import hashlib
+import io
+import mmap
+import threading
+
+try:
+    from http.client import responses
+except ImportError:
+    from httplib import responses
+try:
+    from urllib.parse import parse_qsl, urlencode, urlsplit
+except ImportError:
+    from urllib import urlencode
+    from urlparse import parse_qsl, urlsplit
+
+from requests import adapters, models, structures
+
+from pylcp import codec, mac
+
+VERSION_LINE = b'# pylcp cassette 1\n'
+UNRECORDED_HEADERS = frozenset(['authorization'])
+
+
+class CassetteError(Exception):
+    """Raised when a request cannot be replayed from a cassette, or a cassette cannot be read."""
+
+
+def normalize_path(url):
+    """Returns the path of `url` without repeated or trailing slashes, and its query with sorted parameters.
+
+    >>> normalize_path('https://lcp.points.com/v1//orders/?offset=10&limit=5')
+    '/v1/orders?limit=5&offset=10'
+    """
+    parts = urlsplit(url)
+    path = '/' + '/'.join(segment for segment in parts.path.split('/') if segment)
+    if not parts.query:
+        return path
+    return path + '?' + urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+
+
+def body_hash(body):
+    """Returns the hex SHA-1 of a request `body`, which is a byte string, a string, a list of chunks or `None`."""
+    return hashlib.sha1(_body_bytes(body)).hexdigest()
+
+
+def _body_bytes(body):
+    if body is None:
+        return b''
+    if isinstance(body, list):
+        # Streamed bodies are replaced by a list of their chunks when signed
+        return b''.join(mac._to_bytes(chunk) for chunk in body)
+    return mac._to_bytes(body)
+
+
+def _encode_body(content):
+    if not content:
+        return {'body': ''}
+    try:
+        return {'body': content.decode('utf-8')}
+    except UnicodeDecodeError:
+        return {'body_base64': base64.b64encode(content).decode('ascii')}
+
+
+def _decode_body(document):
+    if 'body_base64' in document:
+        return base64.b64decode(document['body_base64'])
+    return document['body'].encode('utf-8')
+
+
+class CassetteRecorder(adapters.BaseAdapter):
+    """Sends requests through `adapter`, and appends each interaction to the cassette at `path`.
+
+    Interactions are written and flushed as their responses are received,
+    so that a recording is complete however the run ends. The whole
+    response body is read before it is returned.
+
+    :param path: The path of the cassette, which is created if it does not exist.
+    :param adapter: The transport adapter actually sending the requests.
+    """
+
+    def __init__(self, path, adapter):
+        super(CassetteRecorder, self).__init__()
+        self.path = path
+        self.adapter = adapter
+        self._file = io.open(path, 'ab')
+        self._lock = threading.Lock()
+        # Drops the incomplete last line of an interrupted recording, which the next line would be appended to
+        length = _complete_lines_length(path)
+        self._file.truncate(length)
+        if length == 0:
+            self._file.write(VERSION_LINE)
+
+    def send(self, request, **kwargs):
+        response = self.adapter.send(request, **kwargs)
+        line = self._line(request, response)
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+        return response
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+        self.adapter.close()
+
+    def _line(self, request, response):
+        recorded_request = {
+            'url': request.url,
+            'headers': {name: value for name, value in list(request.headers.items())
+                        if name.lower() not in UNRECORDED_HEADERS},
+        }
+        recorded_request.update(_encode_body(_body_bytes(request.body)))
+        recorded_response = {
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+        }
+        recorded_response.update(_encode_body(response.content))
+        interaction = codec.dumps_compact({'request': recorded_request, 'response': recorded_response})
+        prefix = '\t'.join([request.method, normalize_path(request.url), body_hash(request.body)])
+        return prefix.encode('utf-8') + b'\t' + interaction + b'\n'
+
+
+def _complete_lines_length(path, chunk_size=4096):
+    """Returns the length of the file at `path` up to the end of its last complete line."""
+    with io.open(path, 'rb') as cassette_file:
+        position = cassette_file.seek(0, io.SEEK_END)
+        while position > 0:
+            start = max(0, position - chunk_size)
+            cassette_file.seek(start)
+            newline = cassette_file.read(position - start).rfind(b'\n')
+            if newline != -1:
+                return start + newline + 1
+            position = start
+    return 0
+
+
+class CassetteReplayer(adapters.BaseAdapter):
+    """Answers requests with the responses recorded in the cassette at `path`, from any number of threads.
+
+    :param path: The path of a cassette written by a :class:`CassetteRecorder`.
+    :param match_body: Whether requests must also have the body they were recorded with.
+    :raises CassetteError: If the file is not a cassette.
+    """
+
+    def __init__(self, path, match_body=True):
+        super(CassetteReplayer, self).__init__()
+        self.path = path
+        self.match_body = match_body
+        self._file = io.open(path, 'rb')
+        self._map = None
+        self._index = {}
+        self._played = {}
+        self._interactions = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def __len__(self):
+        """The number of interactions in the cassette."""
+        return sum(len(spans) for spans in list(self._index.values()))
+
+    def send(self, request, **kwargs):
+        key = self._key(request.method, normalize_path(request.url), body_hash(request.body))
+        spans = self._index.get(key)
+        if spans is None:
+            raise CassetteError('No interaction recorded for {} {} in {}'.format(request.method, key[1], self.path))
+        with self._lock:
+            played = self._played.get(key, 0)
+            self._played[key] = played + 1
+        return self._response(request, spans[min(played, len(spans) - 1)])
+
+    def rewind(self):
+        """Replays the interactions from the first recorded again."""
+        with self._lock:
+            self._played.clear()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def _key(self, method, path, hash):
+        return (method, path, hash if self.match_body else None)
+
+    def _load(self):
+        if self._file.read(len(VERSION_LINE)) != VERSION_LINE:
+            raise CassetteError('{} is not a pylcp cassette'.format(self.path))
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        position = len(VERSION_LINE)
+        size = len(self._map)
+        while position < size:
+            end = self._map.find(b'\n', position)
+            if end == -1:
+                # An interrupted recording, whose last interaction is incomplete
+                break
+            method_end = self._map.find(b'\t', position, end)
+            path_end = self._map.find(b'\t', method_end + 1, end)
+            hash_end = self._map.find(b'\t', path_end + 1, end)
+            if -1 in (method_end, path_end, hash_end):
+                raise CassetteError('{} has a malformed interaction at byte {}'.format(self.path, position))
+            method, path, hash = self._map[position:hash_end].decode('utf-8').split('\t')
+            self._index.setdefault(self._key(method, path, hash), []).append((hash_end + 1, end))
+            position = end + 1
+
+    def _interaction(self, span):
+        interaction = self._interactions.get(span)
+        if interaction is None:
+            start, end = span
+            document = codec.DEFAULT_CODEC.loads(self._map[start:end])['response']
+            interaction = self._interactions[span] = (
+                document['status'], document.get('reason') or responses.get(document['status']),
+                document['headers'], _decode_body(document),
+            )
+        return interaction
+
+    def _response(self, request, span):
+        status, reason, headers, content = self._interaction(span)
+        response = models.Response()
+        response.request = request
+        response.connection = self
+        response.url = request.url
+        response.status_code = status
+        response.reason = reason
+        response.headers = structures.CaseInsensitiveDict(headers)
+        response.encoding = 'utf-8'
+        response._content = content
+        return response
@@ -0,0 +1,166 @@
+"""JSON encoding and decoding for LCP clients.
+
+A :class:`JSONCodec` decodes response bodies, encodes request payloads and
+formats bodies for logging. Every codec decodes numbers with a fractional
+part as :class:`decimal.Decimal` and encodes them exactly, so that monetary
+amounts are never rounded through a float. :class:`SimpleJSONCodec` is the
+default; :class:`RapidJSONCodec` is several times faster and can be used
+when `python-rapidjson <https://pypi.org/project/python-rapidjson/>`_ is
+installed::
+
+    pip install PyLCP[rapidjson]
+
+Payloads are encoded once, into a :class:`JsonPayload`: compact UTF-8
+encoded JSON which is also a byte string. Byte strings pass through
+:mod:`requests` untouched, so the same object is hashed for the MAC `ext`,
+sent on the wire and logged.
+
+"""
+from builtins import object
+
+import simplejson
+
+try:
+    import rapidjson
+except ImportError:
+    rapidjson = None
+
+
+class JsonPayload(bytes):
+    """UTF-8 encoded JSON, which remembers the `data` it was encoded from.
+
+    `data` is the object given, not a copy, so it reflects any later change
+    to it. :class:`APILogger <pylcp.api.APILogger>` logs payloads from their
+    bytes instead.
+    """
+
+    def __new__(cls, encoded, data):
+        payload = super(JsonPayload, cls).__new__(cls, encoded)
+        payload.data = data
+        return payload
+
+    def __getnewargs__(self):
+        return bytes(self), self.data
+
+
+class _EncodedJsonPayload(JsonPayload):
+    """A :class:`JsonPayload` encoded without building its data, which is only decoded when it is used."""
+
+    def __new__(cls, encoded):
+        return bytes.__new__(cls, encoded)
+
+    @property
+    def data(self):
+        return DEFAULT_CODEC.loads(self)
+
+    def __getnewargs__(self):
+        return bytes(self),
+
+
+class JSONCodec(object):
+    """The interface of JSON codecs used by :class:`Client <pylcp.api.Client>`."""
+
+    name = None
+
+    def loads(self, s):
+        """Returns the decoded JSON document `s`, with fractional numbers as :class:`decimal.Decimal`.
+
+        :param s: A UTF-8 encoded byte string or a Unicode string.
+        :raises ValueError: If `s` is not a JSON document.
+        """
+        raise NotImplementedError
+
+    def dumps(self, data):
+        """Returns `data` as compact, UTF-8 encoded JSON with :class:`decimal.Decimal` numbers written exactly.
+
+        :param data: A JSON compatible object.
+        """
+        raise NotImplementedError
+
+    def pretty_dumps(self, data):
+        """Returns `data` as indented JSON text with sorted keys, for logging.
+
+        :param data: A JSON compatible object.
+        """
+        raise NotImplementedError
+
+
+class SimpleJSONCodec(JSONCodec):
+    """A :class:`JSONCodec` using `simplejson`."""
+
+    name = 'simplejson'
+
+    def loads(self, s):
+        return simplejson.loads(s, use_decimal=True)
+
+    def dumps(self, data):
+        return dumps_compact(data)
+
+    def pretty_dumps(self, data):
+        return simplejson.dumps(data, sort_keys=True, indent=2, separators=(',', ': '), use_decimal=True)
+
+
+class RapidJSONCodec(JSONCodec):
+    """A :class:`JSONCodec` using `python-rapidjson`, which must be installed.
+
+    Numbers too large for a double, which simplejson would decode, are
+    rejected by rapidjson.
+    """
+
+    name = 'rapidjson'
+
+    def __init__(self):
+        if rapidjson is None:
+            raise ImportError('RapidJSONCodec requires python-rapidjson')
+
+    def loads(self, s):
+        return rapidjson.loads(s, number_mode=rapidjson.NM_DECIMAL)
+
+    def dumps(self, data):
+        return rapidjson.dumps(data, number_mode=rapidjson.NM_DECIMAL, ensure_ascii=False).encode('utf-8')
+
+    def pretty_dumps(self, data):
+        return rapidjson.dumps(data, number_mode=rapidjson.NM_DECIMAL, sort_keys=True, indent=2)
+
+
+DEFAULT_CODEC = SimpleJSONCodec()
+
+
+def available_codecs():
+    """Returns a list of an instance of every :class:`JSONCodec` whose library is installed, fastest first."""
+    codecs = [DEFAULT_CODEC]
+    if rapidjson is not None:
+        codecs.insert(0, RapidJSONCodec())
+    return codecs
+
+
+def fastest_codec():
+    """Returns the fastest :class:`JSONCodec` whose library is installed."""
+    return available_codecs()[0]
+
+
+def dumps_compact(data):
+    """Returns `data` as compact, UTF-8 encoded JSON with :class:`decimal.Decimal` numbers written exactly.
+
+    :param data: A JSON compatible object.
+    """
+    encoded = simplejson.dumps(data, separators=(',', ':'), ensure_ascii=False, use_decimal=True)
+    # Python 2 returns a byte string when everything encoded was one
+    return encoded if isinstance(encoded, bytes) else encoded.encode('utf-8')
+
+
+def encode_payload(data, encoder=dumps_compact):
+    """Returns `data` encoded as a :class:`JsonPayload`.
+
+    :param data: A JSON compatible object.
+    :param encoder: A function returning the UTF-8 encoded JSON of an object, such as :meth:`JSONCodec.dumps`.
+    """
+    return JsonPayload(encoder(data), data)
+
+
+def encoded_payload(encoded):
+    """Returns UTF-8 encoded JSON as a :class:`JsonPayload` whose `data` is decoded only when used, e.g. when logged.
+
+    :param encoded: Compact, UTF-8 encoded JSON.
+    """
+    return _EncodedJsonPayload(encoded)
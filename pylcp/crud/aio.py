@@ -0,0 +1,173 @@
+"""Awaitable loyalty domain objects for LCP services
+
+The cruds in this module mirror those in the rest of :mod:`pylcp.crud` but
+must be used with a :class:`pylcp.aio.AsyncClient`. Their create, read,
+update, modify, delete and search methods return awaitables which resolve
+to the same :class:`LCPResource <pylcp.crud.base.LCPResource>` objects as
+their blocking counterparts, their batch methods such as `create_many`
+return asynchronous iterators of :class:`BatchResult <pylcp.crud.base.BatchResult>`
+and `search_iter` returns an asynchronous iterator of search result items.
+
+"""
+import asyncio
+import collections
+
+from pylcp.crud import base as crud
+from pylcp.crud import loyalty_program, offers, orders, payment, postings
+
+
+class AsyncLCPCrud(crud.LCPCrud):
+    """An :class:`LCPCrud <pylcp.crud.base.LCPCrud>` whose operations are awaitable.
+
+    :param http_client: Must be a :class:`pylcp.aio.AsyncClient`
+    """
+
+    async def _resource_from_http(self, method, path, payload=None, params=None):
+        response = await self._http_method(method)(path, data=self._encode_payload(payload), params=params)
+
+        return self._resource_from_response(response)
+
+    def search_iter(self, path, params=None, items_key=None, prefetch=False):
+        """See :meth:`LCPCrud.search_iter <pylcp.crud.base.LCPCrud.search_iter>`.
+
+        With `prefetch`, the next page is requested in a task rather than a thread.
+        """
+        return _SearchIterator(self, path, params, items_key, prefetch)
+
+    def _run_many(self, operation, items, concurrency):
+        return _BatchIterator(operation, items, concurrency)
+
+
+# The asynchronous iterators are classes rather than asynchronous generators, which require Python 3.6
+class _SearchIterator(object):
+    """The items of every page of a search, requesting each page once the items of the previous one are consumed."""
+
+    def __init__(self, lcp_crud, path, params, items_key, prefetch):
+        self._lcp_crud = lcp_crud
+        self._first_page = (path, params)
+        self._items_key = items_key
+        self._prefetch = prefetch
+        self._items = iter(())
+        self._next_url = None
+        self._next_page = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            while True:
+                for item in self._items:
+                    return crud._copy_json(item)
+                page = await self._page()
+                if page is None:
+                    raise StopAsyncIteration
+                self._next_url = crud._next_link(page._json)
+                if self._next_url and self._prefetch:
+                    self._next_page = asyncio.ensure_future(self._lcp_crud.search(self._next_url))
+                self._items = iter(crud._page_items(page._json, self._items_key))
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        """Stops the search, cancelling the request of a prefetched page."""
+        self._items = iter(())
+        self._next_url = None
+        if self._next_page:
+            self._next_page.cancel()
+            self._next_page = None
+
+    async def _page(self):
+        if self._first_page:
+            (path, params), self._first_page = self._first_page, None
+            return await self._lcp_crud.search(path, params)
+        next_page, self._next_page = self._next_page, None
+        if next_page:
+            return await next_page
+        next_url, self._next_url = self._next_url, None
+        if next_url:
+            return await self._lcp_crud.search(next_url)
+        return None
+
+
+class _BatchIterator(object):
+    """The :class:`BatchResult <pylcp.crud.base.BatchResult>` of every item, in order, calling `operation` for up to
+    `concurrency` items at a time.
+    """
+
+    def __init__(self, operation, items, concurrency):
+        self._operation = operation
+        self._items = enumerate(items)
+        self._concurrency = concurrency
+        self._max_pending = 2 * concurrency
+        self._pending = collections.deque()
+        # Created when first iterated, in the running event loop
+        self._semaphore = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        try:
+            for index, item in self._items:
+                self._pending.append((index, item, asyncio.ensure_future(self._call(item))))
+                if len(self._pending) >= self._max_pending:
+                    break
+            if not self._pending:
+                raise StopAsyncIteration
+            return await _batch_result(*self._pending.popleft())
+        except BaseException:
+            await self.aclose()
+            raise
+
+    async def aclose(self):
+        """Stops the batch, cancelling the operations already started."""
+        self._items = iter(())
+        while self._pending:
+            self._pending.popleft()[2].cancel()
+
+    async def _call(self, item):
+        async with self._semaphore:
+            return await crud._call_with_item(self._operation, item)
+
+
+async def _batch_result(index, item, task):
+    try:
+        return crud.BatchResult(index, item, await task, None)
+    except Exception as e:
+        return crud.BatchResult(index, item, None, e)
+
+
+class AsyncLoyaltyProgram(loyalty_program.LoyaltyProgram, AsyncLCPCrud):
+    pass
+
+
+class AsyncOffer(offers.Offer, AsyncLCPCrud):
+    pass
+
+
+class AsyncOfferSet(offers.OfferSet, AsyncLCPCrud):
+    pass
+
+
+class AsyncOrder(orders.Order, AsyncLCPCrud):
+    pass
+
+
+class AsyncPaymentAuth(payment.PaymentAuth, AsyncLCPCrud):
+    pass
+
+
+class AsyncPaymentCapture(payment.PaymentCapture, AsyncLCPCrud):
+    pass
+
+
+class AsyncCredit(postings.Credit, AsyncLCPCrud):
+    pass
+
+
+class AsyncDebit(postings.Debit, AsyncLCPCrud):
+    pass
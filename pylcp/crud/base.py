@@ -8,6 +8,12 @@ from future import standard_library
 standard_library.install_aliases()  # NOQA
 
 from builtins import object
+import collections
+from concurrent import futures
+
+from pylcp import codec
+
+DEFAULT_BATCH_CONCURRENCY = 8
 
 
 class LCPResource(object):
@@ -16,7 +22,15 @@ class LCPResource(object):
     When defining new domain objects, overrides of __init__ and create must call
     the superclass implementations to ensure that the common id and url properties
     are correctly initialized.
+
+    The response body is parsed once. `json` and item lookups return deep
+    copies of the parsed body, so callers may modify them freely without
+    affecting the resource. Copying the whole body for `json` costs about as
+    much as parsing it again; item lookups and `url` only copy what they return.
     """
+    _parsed_response = None
+    _parsed_json = None
+
     def __init__(self, response=None):
         self.response = response
 
@@ -26,17 +40,45 @@ class LCPResource(object):
             return self.response.headers['location']
 
         # Traverse the dictionary returning None if a key isn't found during traversal
-        d = self.json
+        d = self._json
         for k in ['links', 'self', 'href']:
             d = d.get(k, None) if isinstance(d, dict) else None
-        return d
+        return _copy_json(d)
 
     @property
     def json(self):
-        return self.response.json() if self.response else {}
+        return _copy_json(self._json)
 
     def __getitem__(self, key):
-        return self.json[key]
+        return _copy_json(self._json[key])
+
+    @property
+    def _json(self):
+        """The parsed response body, which must not be modified."""
+        if not self.response:
+            return {}
+        if self._parsed_response is not self.response:
+            self._parsed_json = self.response.json()
+            self._parsed_response = self.response
+        return self._parsed_json
+
+
+def _copy_json(value):
+    """Returns a deep copy of a parsed JSON value, copying only its objects and arrays."""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+class BatchResult(collections.namedtuple('BatchResult', ['index', 'item', 'resource', 'error'])):
+    """The outcome of one item of a batch operation such as :meth:`LCPCrud.create_many`.
+
+    `resource` is the resource returned for the item, or `None` if the
+    operation raised, in which case `error` is the exception.
+    """
+    __slots__ = ()
 
 
 class LCPCrud(object):
@@ -44,12 +86,23 @@ class LCPCrud(object):
     """Cruds are responsible for translating CRUD operations into http
     requests (method, url-path, querystring, payload) and interpreting http
     responses (success vs failure).
-    :param http_client: Must be of be a subclass of requests.Session
 
+    Dictionary and list payloads are encoded once, into a compact
+    :class:`JsonPayload <pylcp.codec.JsonPayload>` which is signed, sent and
+    logged without being encoded again. String payloads are sent as they are.
+
+    :param http_client: Must be of be a subclass of requests.Session
+    :param json_encoder: A function returning the UTF-8 encoded JSON of a payload. Defaults to the `dumps` method of
+        the client's :class:`JSONCodec <pylcp.codec.JSONCodec>`.
     """
 
-    def __init__(self, http_client):
+    def __init__(self, http_client, json_encoder=None):
         self.http_client = http_client
+        if json_encoder is None:
+            json_codec = getattr(http_client, 'json_codec', None)
+            # Clients such as mocks may have any attribute, so only actual codecs are used
+            json_encoder = (json_codec if isinstance(json_codec, codec.JSONCodec) else codec.DEFAULT_CODEC).dumps
+        self.json_encoder = json_encoder
 
     @property
     def resource_class(self):
@@ -73,13 +126,141 @@ class LCPCrud(object):
     def search(self, path, params=None):
         return self._resource_from_http('get', path, params=params)
 
+    def search_iter(self, path, params=None, items_key=None, prefetch=False):
+        """Searches `path` and returns an iterator of the items of every page of results.
+
+        Pages are requested lazily, by following the `links.next.href` of
+        each page once its items have been consumed, so only the current
+        page is held in memory however many pages there are. With
+        `prefetch`, the next page is requested in a background thread as soon
+        as the current one arrives, so that the network is kept busy while
+        items are processed, and at most two pages are held at once.
+
+        The items of a page are the array in its `embedded` object named by
+        `items_key`, or, by default, its only array. Items are copies which
+        the caller may modify.
+
+        :param path: The path or URL of the first page.
+        :param params: The query parameters of the first page. Next links carry their own.
+        :param items_key: The name of the array of items in a page's `embedded` object.
+        :param prefetch: Whether to request each next page while the current page is consumed.
+        """
+        executor = futures.ThreadPoolExecutor(max_workers=1) if prefetch else None
+        next_page = None
+        try:
+            page = self.search(path, params)
+            while True:
+                next_url = _next_link(page._json)
+                if next_url and executor:
+                    next_page = executor.submit(self.search, next_url)
+                for item in _page_items(page._json, items_key):
+                    yield _copy_json(item)
+                if not next_url:
+                    return
+                page = next_page.result() if next_page else self.search(next_url)
+                next_page = None
+        finally:
+            if next_page:
+                next_page.cancel()
+            if executor:
+                executor.shutdown(wait=True)
+
+    def create_many(self, items, concurrency=DEFAULT_BATCH_CONCURRENCY):
+        """Calls :meth:`create` for every item, running up to `concurrency` calls at a time.
+
+        Each item holds the arguments of one call: a tuple of positional
+        arguments, a dictionary of keyword arguments, or a single argument.
+        Returns an iterator of :class:`BatchResult` in the order of `items`.
+        Items are consumed, and results produced, as calls complete, so
+        only a few times `concurrency` items are held at once; work stops
+        if the iterator is closed before it is exhausted. Errors are
+        returned in their result rather than raised.
+
+        The client's connection pool should allow at least `concurrency`
+        connections per host.
+        """
+        return self._run_many(self.create, items, concurrency)
+
+    def read_many(self, items, concurrency=DEFAULT_BATCH_CONCURRENCY):
+        """Calls :meth:`read` for every item, see :meth:`create_many`."""
+        return self._run_many(self.read, items, concurrency)
+
+    def update_many(self, items, concurrency=DEFAULT_BATCH_CONCURRENCY):
+        """Calls :meth:`update` for every item, see :meth:`create_many`."""
+        return self._run_many(self.update, items, concurrency)
+
+    def modify_many(self, items, concurrency=DEFAULT_BATCH_CONCURRENCY):
+        """Calls :meth:`modify` for every item, see :meth:`create_many`."""
+        return self._run_many(self.modify, items, concurrency)
+
+    def delete_many(self, items, concurrency=DEFAULT_BATCH_CONCURRENCY):
+        """Calls :meth:`delete` for every item, see :meth:`create_many`."""
+        return self._run_many(self.delete, items, concurrency)
+
+    def _run_many(self, operation, items, concurrency):
+        # Twice as many calls as there are threads are kept in flight so the
+        # threads stay busy while waiting on a slow call at the head of the line
+        max_pending = 2 * concurrency
+        executor = futures.ThreadPoolExecutor(max_workers=concurrency)
+        pending = collections.deque()
+        try:
+            for index, item in enumerate(items):
+                pending.append((index, item, executor.submit(_call_with_item, operation, item)))
+                if len(pending) >= max_pending:
+                    yield _batch_result(*pending.popleft())
+            while pending:
+                yield _batch_result(*pending.popleft())
+        finally:
+            for _, _, future in pending:
+                future.cancel()
+            executor.shutdown(wait=True)
+
     def _resource_from_http(self, method, path, payload=None, params=None):
         response = None
 
-        response = self._http_method(method)(path, data=payload, params=params)
+        response = self._http_method(method)(path, data=self._encode_payload(payload), params=params)
+
+        return self._resource_from_response(response)
+
+    def _resource_from_response(self, response):
         response.raise_for_status()
 
         return self.resource_class(response)
 
+    def _encode_payload(self, payload):
+        if isinstance(payload, (dict, list)):
+            return codec.encode_payload(payload, self.json_encoder)
+        return payload
+
     def _http_method(self, method):
         return getattr(self.http_client, method.lower())
+
+
+def _next_link(body):
+    next_link = body.get('links', {}).get('next')
+    return next_link.get('href') if isinstance(next_link, dict) else None
+
+
+def _page_items(body, items_key):
+    embedded = body.get('embedded') or {}
+    if items_key is not None:
+        return embedded.get(items_key, [])
+    arrays = [value for value in embedded.values() if isinstance(value, list)]
+    if len(arrays) > 1:
+        raise ValueError('Page has several arrays of items, choose one with items_key: {}'.format(sorted(embedded)))
+    return arrays[0] if arrays else []
+
+
+def _call_with_item(operation, item):
+    if isinstance(item, tuple):
+        return operation(*item)
+    if isinstance(item, dict):
+        return operation(**item)
+    return operation(item)
+
+
+def _batch_result(index, item, future):
+    try:
+        return BatchResult(index, item, future.result(), None)
+    except Exception as e:
+        return BatchResult(index, item, None, e)
@@ -0,0 +1,152 @@
+"""Bulk creation of postings from columnar data.
+
+A :class:`PostingColumns` holds the amounts, member validations, PICs and
+credit types of many postings as columns: NumPy arrays, or anything NumPy
+can convert to one, such as lists or Arrow arrays. The columns are
+validated against the posting schemas of :mod:`pylcp.schema.postings` in
+one vectorized pass when they are created, so that a job with an invalid
+row fails before anything is sent. Their payloads are then encoded row by
+row, straight from the columns into compact JSON, without building a
+dictionary for each row, and streamed to
+:meth:`Credit.create_columns <pylcp.crud.postings.Credit.create_columns>` or
+:meth:`Debit.create_columns <pylcp.crud.postings.Debit.create_columns>`::
+
+    columns = PostingColumns(amounts, member_validation_urls, pic='bonus')
+    for result in pylcp.crud.postings.Credit(client).create_columns('/lps/my-lp-id/credits', columns):
+        ...
+
+NumPy must be installed::
+
+    pip install PyLCP[numpy]
+
+"""
+from builtins import object, range
+import re
+
+from simplejson import encoder
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from pylcp import codec
+from pylcp.schema import validation
+from pylcp.schema.postings import credit
+
+CHUNK_SIZE = 4096
+"""The number of rows converted from the columns at once while encoding payloads."""
+
+_ESCAPED_re = re.compile(u'["\\\\\x00-\x1f]')
+
+
+class PostingColumns(object):
+    """Columns of postings, each with a value for every row.
+
+    The payload of each row is the one :meth:`Credit.create
+    <pylcp.crud.postings.Credit.create>` would send for its values: the PIC
+    is only included when it is not `None`, and the credit type when it is
+    neither `None` nor empty. Instead of a column, `pic` and `credit_type` can be a
+    single value for every row.
+
+    :param amount: The integer amounts, all at least the minimum of the posting schemas.
+    :param member_validation: The member validation URLs.
+    :param pic: The PICs, or `None`.
+    :param credit_type: The credit types, or `None`.
+    :raises ValidationError: If a row is invalid.
+    """
+
+    def __init__(self, amount, member_validation, pic=None, credit_type=None):
+        if numpy is None:
+            raise ImportError('PostingColumns requires NumPy')
+        self.amount = _integer_column('amount', amount)
+        self.length = len(self.amount)
+        minimum = credit.POST_REQUEST_SCHEMA['properties']['amount']['minimum']
+        invalid = numpy.flatnonzero(self.amount < minimum)
+        if invalid.size:
+            row = invalid[0]
+            raise validation.ValidationError('{!r} is less than the minimum of {!r}'.format(
+                int(self.amount[row]), minimum), (int(row), 'amount'))
+
+        self.member_validation = self._string_column('memberValidation', member_validation, optional=False)
+        self.pic = self._string_column('pic', pic, optional=True)
+        self.credit_type = self._string_column('creditType', credit_type, optional=True)
+        self.has_credit_type = credit_type is not None
+
+    def __len__(self):
+        return self.length
+
+    def payloads(self):
+        """Yields the :class:`JsonPayload <pylcp.codec.JsonPayload>` of every row, in order."""
+        for start in range(0, self.length, CHUNK_SIZE):
+            end = min(start + CHUNK_SIZE, self.length)
+            amounts = self.amount[start:end].tolist()
+            member_validations = self.member_validation.encoded(start, end)
+            pics = self.pic.encoded(start, end)
+            credit_types = self.credit_type.encoded(start, end)
+            for amount, member_validation, pic, credit_type in zip(
+                    amounts, member_validations, pics, credit_types):
+                yield codec.encoded_payload(u'{{"amount":{},"memberValidation":{}{}{}}}'.format(
+                    amount,
+                    member_validation,
+                    u'' if pic is None else u',"pic":' + pic,
+                    u'' if credit_type is None or credit_type == u'""' else u',"creditType":' + credit_type,
+                ).encode('utf-8'))
+
+    def _string_column(self, name, values, optional):
+        if optional and values is None:
+            return _ConstantColumn(None)
+        if validation._is_string(values):
+            return _ConstantColumn(encoder.encode_basestring(values))
+        return _StringColumn(name, values, self.length, optional)
+
+
+def _integer_column(name, values):
+    column = numpy.asarray(values)
+    if column.ndim != 1:
+        raise ValueError('The {} column must have one dimension, not {}'.format(name, column.ndim))
+    if column.dtype.kind not in 'iu':
+        raise validation.ValidationError('The column of dtype {} is not of type integer'.format(column.dtype),
+                                         (name,))
+    return column
+
+
+class _ConstantColumn(object):
+    """The same JSON encoded string, or `None`, for every row."""
+
+    def __init__(self, encoded):
+        self.encoded_value = encoded
+
+    def encoded(self, start, end):
+        return [self.encoded_value] * (end - start)
+
+
+class _StringColumn(object):
+    """A column of strings, or of `None` for rows without a value when `optional`."""
+
+    def __init__(self, name, values, length, optional):
+        self.column = numpy.asarray(values)
+        if self.column.ndim != 1 or len(self.column) != length:
+            raise ValueError('The {} column must have one dimension and {} rows'.format(name, length))
+        if self.column.dtype.kind == 'O':
+            is_valid = _is_optional_string if optional else validation._is_string
+            valid = numpy.frompyfunc(is_valid, 1, 1)(self.column).astype(bool)
+            invalid = numpy.flatnonzero(~valid)
+            if invalid.size:
+                row = invalid[0]
+                raise validation.ValidationError('{!r} is not of type string'.format(self.column[row]),
+                                                 (int(row), name))
+        elif self.column.dtype.kind != 'U':
+            raise validation.ValidationError('The column of dtype {} is not of type string'.format(
+                self.column.dtype), (name,))
+
+    def encoded(self, start, end):
+        values = self.column[start:end].tolist()
+        # Strings without characters to escape, as most URLs and codes are, are quoted as they are
+        if _ESCAPED_re.search(u''.join(value for value in values if value is not None)):
+            return [None if value is None else encoder.encode_basestring(value) for value in values]
+        return [None if value is None else u'"' + value + u'"' for value in values]
+
+
+def _is_optional_string(value):
+    return value is None or validation._is_string(value)
@@ -1,23 +1,98 @@
 from pylcp.crud import base as crud
+from pylcp.schema import validation
+from pylcp.schema.postings import credit, debit
+
+
+def _payload_schema(schema, **optional_properties):
+    """Returns `schema` also allowing the optional properties the cruds add to payloads."""
+    return dict(schema, properties=dict(schema['properties'], **optional_properties))
+
+
+_STRING_SCHEMA = {'type': 'string'}
+
+validate_credit_payload = validation.compile_schema(
+    _payload_schema(credit.POST_REQUEST_SCHEMA, pic=_STRING_SCHEMA, creditType=_STRING_SCHEMA))
+validate_debit_payload = validation.compile_schema(_payload_schema(debit.POST_REQUEST_SCHEMA, pic=_STRING_SCHEMA))
+validate_debit_patch_payload = validation.compile_schema(debit.PATCH_REQUEST_SCHEMA)
 
 
 class Credit(crud.LCPCrud):
+    """Creates credits.
+
+    :param validate: Whether payloads are validated against
+        :data:`pylcp.schema.postings.credit.POST_REQUEST_SCHEMA` before they are
+        sent, raising a :class:`ValidationError <pylcp.schema.validation.ValidationError>`
+        if they are invalid.
+    """
+
+    def __init__(self, http_client, json_encoder=None, validate=False):
+        super(Credit, self).__init__(http_client, json_encoder)
+        self.validate_payload = validate_credit_payload if validate else None
+
     def create(self, path, amount, member_validation, pic=None, credit_type=None, **kwargs):
         """ Create a credit. Any kwargs will be added as top-level parameters in the request payload.
         """
         payload = _create_payload(amount, member_validation, pic, credit_type, **kwargs)
+        if self.validate_payload is not None:
+            self.validate_payload(payload)
 
         return super(Credit, self).create(path, payload)
 
+    def create_columns(self, path, columns, concurrency=crud.DEFAULT_BATCH_CONCURRENCY):
+        """Creates a credit at `path` for every row of a :class:`PostingColumns <pylcp.crud.bulk.PostingColumns>`.
+
+        Payloads are encoded as they are sent, see :meth:`create_many
+        <pylcp.crud.base.LCPCrud.create_many>` for how they are sent and
+        their results returned. The columns are validated when created,
+        whether or not this crud validates payloads.
+        """
+        return _create_columns(super(Credit, self).create, self._run_many, path, columns, concurrency)
+
 
 class Debit(crud.LCPCrud):
+    """Creates and completes debits.
+
+    :param validate: Whether payloads are validated against
+        :data:`pylcp.schema.postings.debit.POST_REQUEST_SCHEMA`, or
+        :data:`PATCH_REQUEST_SCHEMA <pylcp.schema.postings.debit.PATCH_REQUEST_SCHEMA>`
+        for :meth:`modify`, before they are sent, raising a
+        :class:`ValidationError <pylcp.schema.validation.ValidationError>` if they are invalid.
+    """
+
+    def __init__(self, http_client, json_encoder=None, validate=False):
+        super(Debit, self).__init__(http_client, json_encoder)
+        self.validate_payload = validate_debit_payload if validate else None
+        self.validate_patch_payload = validate_debit_patch_payload if validate else None
+
     def create(self, path, amount, member_validation, pic=None, **kwargs):
         """ Create a debit. Any kwargs will be added as top-level parameters in the request payload.
         """
         payload = _create_payload(amount, member_validation, pic, **kwargs)
+        if self.validate_payload is not None:
+            self.validate_payload(payload)
 
         return super(Debit, self).create(path, payload)
 
+    def create_columns(self, path, columns, concurrency=crud.DEFAULT_BATCH_CONCURRENCY):
+        """Creates a debit at `path` for every row of a :class:`PostingColumns <pylcp.crud.bulk.PostingColumns>`,
+        see :meth:`Credit.create_columns`.
+
+        :raises ValueError: If the columns have credit types.
+        """
+        if columns.has_credit_type:
+            raise ValueError('Debits do not have a credit type')
+        return _create_columns(super(Debit, self).create, self._run_many, path, columns, concurrency)
+
+    def modify(self, path, payload):
+        if self.validate_patch_payload is not None:
+            self.validate_patch_payload(payload)
+
+        return super(Debit, self).modify(path, payload)
+
+
+def _create_columns(create, run_many, path, columns, concurrency):
+    return run_many(create, ((path, payload) for payload in columns.payloads()), concurrency)
+
 
 def _create_payload(amount, member_validation, pic=None, credit_type=None, **kwargs):
         payload = {"amount": amount,
@@ -0,0 +1,264 @@
+"""Timing of the phases of LCP requests.
+
+A :class:`Client <pylcp.api.Client>` given an :class:`Instrumentation`
+measures, for every request it sends, the time spent in each of these
+phases:
+
+``sign``
+    Signing the request with its MAC `Authorization` header.
+``log``
+    Logging, and masking, the request and its response.
+``connect``
+    Taking a connection from the pool, including waiting for one when the
+    pool is blocking.
+``ttfb``
+    From sending the request until its response headers are received,
+    including opening a new connection when none was pooled.
+``download``
+    Reading the response body.
+``decode``
+    Parsing the JSON response body, recorded when it is parsed. A body which
+    is logged is parsed while logging, so its decode time is also part of
+    the ``log`` phase.
+
+Each :class:`Measurement` is tagged with the method, the path with
+identifiers collapsed by :func:`path_template`, and the response status, or
+`error` when no response was received, and passed to a sink: a
+:class:`HistogramSink`, :class:`StatsdSink` or :class:`CallbackSink`, or
+any object with a `record` method taking a :class:`Measurement`.
+
+Clients without an instrumentation measure nothing.
+
+"""
+from builtins import object
+import bisect
+import collections
+import re
+import socket
+import threading
+import timeit
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+PHASES = ('sign', 'log', 'connect', 'ttfb', 'download', 'decode')
+ERROR_STATUS = 'error'
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+"""The upper bounds, in seconds, of the buckets of a :class:`Histogram`."""
+
+_ID_SEGMENT_re = re.compile(r'^(?:\d+|[0-9a-fA-F-]{16,}|(?=[A-Za-z_-]*\d)[0-9A-Za-z_-]{16,})$')
+
+_active = threading.local()
+
+
+class Measurement(collections.namedtuple('Measurement', ['phase', 'seconds', 'method', 'path', 'status'])):
+    """The time spent in one phase of a request, and the tags of the request."""
+    __slots__ = ()
+
+
+def path_template(url):
+    """Returns the path of `url` with its numeric and UUID like segments replaced by `{id}`.
+
+    >>> path_template('https://lcp.points.com/v1/lps/6b1c9b4f-1d2c-4a5b-8e9f-0a1b2c3d4e5f/mvs?q=1')
+    '/v1/lps/{id}/mvs'
+    """
+    path = urlsplit(url).path
+    return '/'.join('{id}' if _ID_SEGMENT_re.match(segment) else segment for segment in path.split('/'))
+
+
+def active_timer():
+    """Returns the :class:`RequestTimer` of the request being sent by this thread, if it is instrumented."""
+    return getattr(_active, 'timer', None)
+
+
+class Instrumentation(object):
+    """Records the :class:`Measurement` of each phase of the requests of a :class:`Client <pylcp.api.Client>`.
+
+    :param sink: The object whose `record` method is called with every :class:`Measurement`.
+    :param path_template: The function returning the path tag of a request URL.
+    :param clock: The function returning the current time in seconds.
+    """
+
+    def __init__(self, sink, path_template=path_template, clock=timeit.default_timer):
+        self.sink = sink
+        self.path_template = path_template
+        self.clock = clock
+
+    def record(self, phase, seconds, request, status):
+        """Passes the :class:`Measurement` of `phase` of `request` to the sink."""
+        status = ERROR_STATUS if status is None else status
+        self.sink.record(Measurement(phase, seconds, request.method, self.path_template(request.url), status))
+
+    def timer(self, request):
+        """Returns a :class:`RequestTimer` for sending `request`."""
+        return RequestTimer(self, request)
+
+
+class RequestTimer(object):
+    """Adds up the time spent in each phase of sending a request, and records them once it has been answered.
+
+    While `active`, the timer is returned by :func:`active_timer` in the
+    sending thread, so that phases measured elsewhere, such as taking a
+    connection from the pool, can be added to it.
+    """
+
+    def __init__(self, instrumentation, request):
+        self.instrumentation = instrumentation
+        self.clock = instrumentation.clock
+        self.request = request
+        self.seconds = collections.defaultdict(float)
+
+    def add(self, phase, seconds):
+        self.seconds[phase] += seconds
+
+    def measure(self, phase):
+        """Returns a context manager adding the time spent in its block to `phase`."""
+        return _Measure(self, phase)
+
+    def active(self):
+        """Returns a context manager making this timer the :func:`active_timer` in its block."""
+        return _Activate(self)
+
+    def finish(self, status):
+        """Records the phases measured, tagged with the response `status`, or `None` if there was no response."""
+        for phase, seconds in list(self.seconds.items()):
+            self.instrumentation.record(phase, seconds, self.request, status)
+
+
+class _Measure(object):
+    def __init__(self, timer, phase):
+        self.timer = timer
+        self.phase = phase
+
+    def __enter__(self):
+        self.start = self.timer.clock()
+
+    def __exit__(self, *exc_info):
+        self.timer.add(self.phase, self.timer.clock() - self.start)
+
+
+class _Activate(object):
+    def __init__(self, timer):
+        self.timer = timer
+
+    def __enter__(self):
+        self.previous = active_timer()
+        _active.timer = self.timer
+
+    def __exit__(self, *exc_info):
+        _active.timer = self.previous
+
+
+class Histogram(object):
+    """Counts of measurements in buckets of increasing upper bounds, with their count, sum, minimum and maximum."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def record(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        self.min = seconds if self.min is None else min(self.min, seconds)
+        self.max = seconds if self.max is None else max(self.max, seconds)
+
+    def quantile(self, q):
+        """Returns an upper bound of the `q` quantile, e.g. 0.99, of the measurements, or `None` if there are none."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            if cumulative >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p99': self.quantile(0.99),
+        }
+
+
+class HistogramSink(object):
+    """Keeps a :class:`Histogram` of the measurements of each phase, method, path and status.
+
+    :param buckets: The upper bounds, in seconds, of the buckets of the histograms.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, measurement):
+        key = (measurement.phase, measurement.method, measurement.path, measurement.status)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.record(measurement.seconds)
+
+    def snapshot(self):
+        """Returns the :meth:`Histogram.as_dict` of every (phase, method, path, status) measured."""
+        with self._lock:
+            return {key: histogram.as_dict() for key, histogram in list(self.histograms.items())}
+
+    def clear(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+class StatsdSink(object):
+    """Sends every measurement as a statsd timer, in milliseconds, over UDP.
+
+    Tags are sent with the DogStatsD extension, e.g.
+    ``pylcp.request.ttfb:12.5|ms|#method:GET,path:/v1/lps/{id},status:200``.
+    Sending never blocks, and errors are ignored, so that an absent
+    listener does not slow requests down.
+
+    :param host: The host of the statsd listener.
+    :param port: The UDP port of the statsd listener.
+    :param prefix: The prefix of the names of the timers, which end with the phase.
+    """
+
+    def __init__(self, host='127.0.0.1', port=8125, prefix='pylcp.request'):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.socket.setblocking(False)
+
+    def record(self, measurement):
+        line = '{}.{}:{:.3f}|ms|#method:{},path:{},status:{}'.format(
+            self.prefix, measurement.phase, measurement.seconds * 1000,
+            measurement.method, measurement.path, measurement.status)
+        try:
+            self.socket.sendto(line.encode('utf-8'), self.address)
+        except (IOError, OSError):
+            pass
+
+    def close(self):
+        self.socket.close()
+
+
+class CallbackSink(object):
+    """Calls `callback` with every :class:`Measurement`."""
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record(self, measurement):
+        self.callback(measurement)
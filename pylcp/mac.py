@@ -1,9 +1,11 @@
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
+from builtins import bytes
 from builtins import str
 from builtins import object
 import base64
+import collections
 import hashlib
 import hmac
 try:
@@ -15,6 +17,7 @@ except ImportError:
 import logging
 import os
 import re
+import threading
 import time
 import urllib.parse
 
@@ -22,31 +25,90 @@ import urllib.parse
 logger = logging.getLogger(__name__)
 
 
+BODY_CHUNK_SIZE = 64 * 1024
+
+
 def generate_ext(content_type, body):
     """Returns an `ext` value as described in
     `<http://tools.ietf.org/html/draft-ietf-oauth-v2-http-mac-02#section-3.1>`_.
 
+    The content type and then the body are fed to the hash a chunk at a time,
+    so that large bodies need not be held in memory or copied. Iterators and
+    files which cannot be rewound are consumed; pass them through
+    :py:func:`replayable_body <pylcp.mac.replayable_body>` first if they must
+    also be sent. Seekable files are read from their current position, which
+    is restored afterwards.
+
     :param content_type: The content type of the request e.g. application/json.'
-    :param body: The request body as a byte or Unicode string.
+    :param body: The request body as a byte or Unicode string, a `bytearray` or `memoryview`, a file-like object
+        or an iterable of byte or Unicode strings.
     """
-    if (
-            content_type is not None and
-            body is not None and
-            len(content_type) > 0 and
-            len(body) > 0):
-        # Hashing requires a bytestring, so we need to encode back to utf-8
-        # in case the body/header have already been decoded to unicode (by the
-        # python json module for instance)
-        if isinstance(body, str):
-            body = body.encode('utf-8')
-        if isinstance(content_type, str):
-            content_type = content_type.encode('utf-8')
-        content_type_plus_body = content_type + body
-        content_type_plus_body_hash = hashlib.sha1(content_type_plus_body)
-        ext = content_type_plus_body_hash.hexdigest()
+    if not content_type or body is None:
+        return ""
+    # Hashing requires a bytestring, so we need to encode back to utf-8
+    # in case the body/header have already been decoded to unicode (by the
+    # python json module for instance)
+    content_type_plus_body_hash = hashlib.sha1(_to_bytes(content_type))
+    is_empty = True
+    for chunk in _body_chunks(body):
+        if len(chunk) > 0:
+            content_type_plus_body_hash.update(chunk)
+            is_empty = False
+    return "" if is_empty else content_type_plus_body_hash.hexdigest()
+
+
+def replayable_body(body):
+    """Returns `body`, or if reading it for :py:func:`generate_ext <pylcp.mac.generate_ext>` would consume it, a
+    list of its chunks which can be both hashed and sent.
+
+    Strings, byte buffers, seekable files and sequences are returned as they
+    are. Only iterators, such as generators, and files which cannot be
+    rewound are read into memory.
+
+    :param body: A request body as accepted by :py:func:`generate_ext <pylcp.mac.generate_ext>`.
+    """
+    if body is None or isinstance(body, (bytes, str, bytearray, memoryview)):
+        return body
+    if hasattr(body, 'read'):
+        if _is_seekable(body):
+            return body
+    elif iter(body) is not body:
+        return body
+    return list(_body_chunks(body))
+
+
+def _body_chunks(body):
+    if isinstance(body, (bytes, str, bytearray, memoryview)):
+        yield _to_bytes(body)
+    elif hasattr(body, 'read'):
+        position = body.tell() if _is_seekable(body) else None
+        try:
+            chunk = body.read(BODY_CHUNK_SIZE)
+            while chunk:
+                yield _to_bytes(chunk)
+                chunk = body.read(BODY_CHUNK_SIZE)
+        finally:
+            if position is not None:
+                body.seek(position)
     else:
-        ext = ""
-    return ext
+        for chunk in body:
+            yield _to_bytes(chunk)
+
+
+def _is_seekable(file_object):
+    if hasattr(file_object, 'seekable'):
+        return file_object.seekable()
+    try:
+        file_object.tell()
+    except (AttributeError, IOError, OSError):
+        return False
+    return hasattr(file_object, 'seek')
+
+
+def _to_bytes(value):
+    if isinstance(value, str):
+        return value.encode('utf-8')
+    return value
 
 
 def build_normalized_request_string(
@@ -74,11 +136,24 @@ def build_normalized_request_string(
     return normalized_request_string
 
 
+NONCE_SIZE = 8
+
+
 def generate_nonce():
     """Returns a random string intend for use as a nonce when computing an
     HMAC.
     """
-    return base64.b64encode(os.urandom(8))
+    return base64.b64encode(os.urandom(NONCE_SIZE))
+
+
+def generate_nonces(count):
+    """Returns `count` nonces like those of :py:func:`generate_nonce <pylcp.mac.generate_nonce>`, drawn from a
+    single read of random bytes.
+
+    :param count: The number of nonces to generate.
+    """
+    entropy = os.urandom(NONCE_SIZE * count)
+    return [base64.b64encode(entropy[i:i + NONCE_SIZE]) for i in range(0, NONCE_SIZE * count, NONCE_SIZE)]
 
 
 def generate_signature(mac_key, normalized_request_string):
@@ -90,13 +165,10 @@ def generate_signature(mac_key, normalized_request_string):
     The `normalized_request_string` should be generated using
     :py:func:`build_normalized_request_string <pylcp.mac.build_normalized_request_string>`.
 
-    :param mac_key: The MAC key to use to sign the request.
+    :param mac_key: The MAC key, or a :py:class:`MACSigner <pylcp.mac.MACSigner>` for it, to use to sign the request.
     :param normalized_request_string: Key elements of the request in a normalized form.
     """
-
-    key = base64.b64decode(mac_key.replace('-', '+').replace('_', '/') + '=')
-    signature = hmac.new(key, normalized_request_string, hashlib.sha1)
-    return base64.b64encode(signature.digest())
+    return _signer_for(mac_key).sign(normalized_request_string)
 
 
 def generate_authorization_header_value(
@@ -109,40 +181,174 @@ def generate_authorization_header_value(
     """Returns a suitable value for the HTTP `Authorization` header that
     contains a valid signature for the request.
 
+    Signing many requests with the same key is cheaper through
+    :py:meth:`MACSigner.authorization_header_value <pylcp.mac.MACSigner.authorization_header_value>`,
+    or by passing a :py:class:`MACSigner <pylcp.mac.MACSigner>` as the `mac_key`.
+
     :param http_method: The HTTP method of the request e.g. `POST`.
     :param url: The full URL of the request.
     :param mac_key_identifier: The ID of the MAC key to be used to sign the request
-    :param mac_key: The MAC key to be used to sign the request
+    :param mac_key: The MAC key, or a :py:class:`MACSigner <pylcp.mac.MACSigner>` for it, to be used to sign the
+        request
     :param content_type: The request content type.
     :param body: The request body as a byte or Unicde string.
     """
-    url_parts = urllib.parse.urlparse(url)
-    port = url_parts.port
-    if not port:
-        if url_parts.scheme == 'https':
-            port = str(HTTPS_PORT)
-        else:
-            port = str(HTTP_PORT)
-    ts = str(int(time.time()))
-    nonce = generate_nonce()
-    ext = generate_ext(content_type, body)
-    normalized_request_string = build_normalized_request_string(
-        ts,
-        nonce,
+    return _signer_for(mac_key).authorization_header_value(
         http_method,
-        url_parts.hostname,
-        port,
-        url_parts.path,
-        ext)
+        url,
+        mac_key_identifier,
+        content_type,
+        body)
 
-    signature = generate_signature(mac_key, normalized_request_string)
 
-    return 'MAC id="%s", ts="%s", nonce="%s", ext="%s", mac="%s"' % (
-        mac_key_identifier,
-        ts,
-        nonce,
-        ext,
-        signature)
+class MACSigner(object):
+    """Signs requests with a single MAC key.
+
+    The MAC key is decoded and keyed into an HMAC-SHA1 template once, the
+    first time the signer is used, and every signature is computed from a
+    copy of that template. Signers are safe to share between threads.
+
+    :param mac_key: The MAC key (shared secret) to sign requests with.
+    """
+
+    def __init__(self, mac_key):
+        self.mac_key = mac_key
+        self._hmac_template = None
+
+    @property
+    def hmac_template(self):
+        """The :py:class:`hmac.HMAC` keyed with the MAC key, which must only be copied."""
+        if self._hmac_template is None:
+            key = base64.b64decode(self.mac_key.replace('-', '+').replace('_', '/') + '=')
+            self._hmac_template = hmac.new(key, digestmod=hashlib.sha1)
+        return self._hmac_template
+
+    def sign(self, normalized_request_string):
+        """Returns the signature of a normalized request string.
+
+        :param normalized_request_string: Key elements of the request in a normalized form.
+        """
+        if isinstance(normalized_request_string, str):
+            normalized_request_string = normalized_request_string.encode('utf-8')
+        signature = self.hmac_template.copy()
+        signature.update(normalized_request_string)
+        return _to_text(base64.b64encode(signature.digest()))
+
+    def authorization_header_value(self, http_method, url, mac_key_identifier, content_type, body):
+        """Returns a suitable value for the HTTP `Authorization` header that
+        contains a valid signature for the request.
+
+        :param http_method: The HTTP method of the request e.g. `POST`.
+        :param url: The full URL of the request.
+        :param mac_key_identifier: The ID of the MAC key used to sign the request
+        :param content_type: The request content type.
+        :param body: The request body as a byte or Unicode string.
+        """
+        url_parts = urllib.parse.urlparse(url)
+        ts = str(int(time.time()))
+        nonce = _to_text(generate_nonce())
+        ext = generate_ext(content_type, body)
+        normalized_request_string = build_normalized_request_string(
+            ts,
+            nonce,
+            http_method,
+            url_parts.hostname,
+            _port(url_parts),
+            url_parts.path,
+            ext)
+
+        signature = generate_signature(self, normalized_request_string)
+
+        return 'MAC id="%s", ts="%s", nonce="%s", ext="%s", mac="%s"' % (
+            mac_key_identifier,
+            ts,
+            nonce,
+            ext,
+            signature)
+
+    def authorization_header_values(self, requests, mac_key_identifier):
+        """Returns a list of `Authorization` header values, one for each of `requests`, in the same order.
+
+        Signing a batch of requests is about 1.5 to 2 times faster than
+        signing each on its own, not several times: the timestamp is read
+        once, the nonces are drawn from a single read of random bytes and the
+        host and port of each distinct scheme and host are parsed once, but
+        the HMAC of each request still dominates the cost. As every request is signed with the
+        same timestamp, requests should be sent promptly after signing, or
+        servers will reject them as stale.
+
+        :param requests: An iterable of (HTTP method, full URL, content type, body) tuples.
+        :param mac_key_identifier: The ID of the MAC key used to sign the requests
+        """
+        requests = list(requests)
+        ts = str(int(time.time()))
+        header_format = 'MAC id="%s", ts="%s", nonce="%%s", ext="%%s", mac="%%s"' % (mac_key_identifier, ts)
+        nonces = _to_text(b''.join(generate_nonces(len(requests))))
+        nonce_length = len(nonces) // len(requests) if requests else 0
+        hosts = {}
+        header_values = []
+        for index, (http_method, url, content_type, body) in enumerate(requests):
+            nonce = nonces[index * nonce_length:(index + 1) * nonce_length]
+            host, port, request_path = _split_url(url, hosts)
+            ext = generate_ext(content_type, body)
+            signature = self.sign(
+                build_normalized_request_string(ts, nonce, http_method, host, port, request_path, ext))
+            header_values.append(header_format % (nonce, ext, signature))
+        return header_values
+
+
+def generate_authorization_header_values(requests, mac_key_identifier, mac_key):
+    """Returns a list of values for the HTTP `Authorization` header, one for each of a batch of requests.
+
+    See :py:meth:`MACSigner.authorization_header_values <pylcp.mac.MACSigner.authorization_header_values>`.
+
+    :param requests: An iterable of (HTTP method, full URL, content type, body) tuples.
+    :param mac_key_identifier: The ID of the MAC key to be used to sign the requests
+    :param mac_key: The MAC key, or a :py:class:`MACSigner <pylcp.mac.MACSigner>` for it, to be used to sign the
+        requests
+    """
+    return _signer_for(mac_key).authorization_header_values(requests, mac_key_identifier)
+
+
+_url_origin_and_path_re = re.compile(r'([a-zA-Z][a-zA-Z0-9+.-]*://[^/?#]*)(/[^?#;]*)(?:[?#]|$)')
+
+
+def _split_url(url, hosts):
+    """Returns the host, port and path of `url`, parsing the host and port of each scheme and netloc once."""
+    match = _url_origin_and_path_re.match(url)
+    if match is None:
+        # Without a path, or with parameters which are not part of the signed path, leave it to urlparse
+        url_parts = urllib.parse.urlparse(url)
+        return url_parts.hostname, _port(url_parts), url_parts.path
+
+    origin, request_path = match.groups()
+    try:
+        host, port = hosts[origin]
+    except KeyError:
+        url_parts = urllib.parse.urlparse(origin)
+        host, port = hosts[origin] = url_parts.hostname, _port(url_parts)
+    return host, port, request_path
+
+
+def _port(url_parts):
+    if url_parts.port:
+        return url_parts.port
+    if url_parts.scheme == 'https':
+        return str(HTTPS_PORT)
+    return str(HTTP_PORT)
+
+
+def _signer_for(mac_key):
+    if isinstance(mac_key, MACSigner):
+        return mac_key
+    return MACSigner(mac_key)
+
+
+def _to_text(value):
+    """Decodes base64 output, which is a byte string on Python 3."""
+    if isinstance(value, bytes):
+        return value.decode('ascii')
+    return value
 
 
 class AuthHeaderValue(object):
@@ -174,3 +380,139 @@ class AuthHeaderValue(object):
             'MAC id="{self.mac_key_identifier}", ts="{self.ts}", '
             'nonce="{self.nonce}", ext="{self.ext}", mac="{self.mac}"'
         ).format(self=self)
+
+    @classmethod
+    def parse(cls, value):
+        """Returns the :class:`AuthHeaderValue` of an HTTP `Authorization` header, or `None` if it is not a MAC
+        authorization.
+
+        :param value: The value of the `Authorization` header.
+        """
+        match = cls.auth_header_re.match(value or '')
+        if match is None:
+            return None
+        return cls(**match.groupdict())
+
+
+class MACVerificationError(Exception):
+    """Raised when the MAC authorization of a request is not valid."""
+
+
+class MACVerifier(object):
+    """Verifies the MAC `Authorization` headers of requests signed as by :class:`MACSigner`.
+
+    A request is valid if its header is signed by the MAC key of its key
+    identifier, its `ext` matches its content type and body, its timestamp is
+    within `max_skew` seconds of the current time, and its nonce has not been
+    seen with the same key identifier within the last `2 * max_skew` seconds,
+    the longest time for which its timestamp is valid. Nonces are only
+    recorded for requests which are otherwise valid, so forged requests cannot
+    fill the nonce cache. Verifiers are safe to share between threads.
+
+    :param mac_keys: A dictionary of MAC keys, or :class:`MACSigner` objects, keyed by MAC key identifier.
+    :param max_skew: The maximum difference in seconds between a request's timestamp and the current time.
+    :param nonce_cache: The cache used to detect replayed nonces, such as a
+        :class:`InMemoryNonceCache` or any object with the same `add` method. Defaults to a new
+        :class:`InMemoryNonceCache`.
+    """
+
+    def __init__(self, mac_keys, max_skew=30, nonce_cache=None):
+        self.signers = {key_id: _signer_for(mac_key) for key_id, mac_key in mac_keys.items()}
+        self.max_skew = max_skew
+        self.nonce_cache = InMemoryNonceCache() if nonce_cache is None else nonce_cache
+
+    def verify(self, http_method, url, authorization, content_type, body):
+        """Returns the :class:`AuthHeaderValue` of a request once its authorization has been verified.
+
+        :param http_method: The HTTP method of the request e.g. `POST`.
+        :param url: The full URL of the request.
+        :param authorization: The value of the request's `Authorization` header.
+        :param content_type: The request content type.
+        :param body: The request body as a byte or Unicode string.
+        :raises MACVerificationError: If the request's authorization is not valid.
+        """
+        header = AuthHeaderValue.parse(authorization)
+        if header is None:
+            raise MACVerificationError('Authorization header is not a MAC authorization')
+
+        signer = self.signers.get(header.mac_key_identifier)
+        if signer is None:
+            raise MACVerificationError('Unknown MAC key identifier {}'.format(header.mac_key_identifier))
+
+        try:
+            ts = int(header.ts)
+        except ValueError:
+            raise MACVerificationError('Timestamp is not an integer')
+        if abs(time.time() - ts) > self.max_skew:
+            raise MACVerificationError('Timestamp is outside of the allowed clock skew')
+
+        ext = generate_ext(content_type, body)
+        if not _constant_time_equal(ext, header.ext):
+            raise MACVerificationError('ext does not match the content type and body')
+
+        url_parts = urllib.parse.urlparse(url)
+        normalized_request_string = build_normalized_request_string(
+            header.ts,
+            header.nonce,
+            http_method,
+            url_parts.hostname,
+            _port(url_parts),
+            url_parts.path,
+            ext)
+        if not _constant_time_equal(signer.sign(normalized_request_string), header.mac):
+            raise MACVerificationError('MAC does not match the request')
+
+        if not self.nonce_cache.add((header.mac_key_identifier, header.nonce), 2 * self.max_skew):
+            raise MACVerificationError('Nonce has already been used')
+        return header
+
+
+class InMemoryNonceCache(object):
+    """A bounded, in-process record of recently used nonces.
+
+    Nonces expire after the time given when they are added. When the cache
+    is full, the oldest nonce is forgotten early, so `max_size` should exceed
+    the number of requests verified within the expiry time. Shared stores,
+    such as Redis, can be used instead by any object with an `add` method
+    like this one's, e.g. one issuing `SET key 1 NX EX ttl`.
+
+    :param max_size: The maximum number of nonces remembered.
+    """
+
+    def __init__(self, max_size=100000):
+        self.max_size = max_size
+        self._expiry_by_key = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._expiry_by_key)
+
+    def add(self, key, ttl):
+        """Records `key` for `ttl` seconds, returning `False` if it was already recorded and has not expired.
+
+        :param key: A hashable key identifying a nonce.
+        :param ttl: The number of seconds for which the key is remembered.
+        """
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            expiry = self._expiry_by_key.get(key)
+            if expiry is not None and expiry > now:
+                return False
+            self._expiry_by_key.pop(key, None)
+            self._expiry_by_key[key] = now + ttl
+            while len(self._expiry_by_key) > self.max_size:
+                self._expiry_by_key.popitem(last=False)
+            return True
+
+    def _evict_expired(self, now):
+        # Keys are held in the order they were added, which is the order they expire with a constant ttl
+        while self._expiry_by_key:
+            key, expiry = next(iter(self._expiry_by_key.items()))
+            if expiry > now:
+                break
+            del self._expiry_by_key[key]
+
+
+def _constant_time_equal(a, b):
+    return hmac.compare_digest(bytes(_to_bytes(a)), bytes(_to_bytes(b)))
@@ -0,0 +1,140 @@
+"""Connection pooling with statistics for LCP clients.
+
+A :class:`PooledHTTPAdapter` is a :class:`requests.adapters.HTTPAdapter`
+that counts, for each host, how often a pooled connection was reused, how
+often a new connection had to be opened and how often a connection was
+discarded because the pool was already full. These are the numbers needed
+to size `pool_maxsize` against real traffic: frequent discards mean the pool
+is too small for the number of threads sending requests, and each new
+connection to an LCP host costs a TLS handshake.
+
+"""
+from builtins import object
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+import threading
+
+from requests import adapters
+from urllib3 import connectionpool, poolmanager
+
+from pylcp import instrumentation
+
+
+class PoolStats(object):
+    """Counters for the connections of one host's pool.
+
+    `requests` counts the connections taken from the pool to send a request,
+    `new_connections` those requests which had to open a new connection, and
+    `discards` the connections closed because the pool was already full when
+    they were returned.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.new_connections = 0
+        self.discards = 0
+        self._lock = threading.Lock()
+
+    @property
+    def hits(self):
+        """The number of requests sent on a reused connection."""
+        return self.requests - self.new_connections
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'hits': self.requests - self.new_connections,
+                'new_connections': self.new_connections,
+                'discards': self.discards,
+            }
+
+    def __repr__(self):
+        return 'PoolStats({})'.format(', '.join('{}={}'.format(*item) for item in sorted(self.as_dict().items())))
+
+    def _record_request(self, new_connection):
+        with self._lock:
+            self.requests += 1
+            if new_connection:
+                self.new_connections += 1
+
+    def _record_discard(self):
+        with self._lock:
+            self.discards += 1
+
+
+class PooledHTTPAdapter(adapters.HTTPAdapter):
+    """An :class:`requests.adapters.HTTPAdapter` which keeps :class:`PoolStats` for every host.
+
+    Takes the same arguments as :class:`requests.adapters.HTTPAdapter`.
+    Requests sent through a proxy are not counted.
+    """
+
+    def init_poolmanager(self, connections, maxsize, block=adapters.DEFAULT_POOLBLOCK, **pool_kwargs):
+        if not hasattr(self, 'pool_stats'):
+            self.pool_stats = {}
+        self.poolmanager = _StatsPoolManager(
+            self.pool_stats, num_pools=connections, maxsize=maxsize, block=block, **pool_kwargs)
+
+    def stats(self):
+        """Returns a dictionary of :meth:`PoolStats.as_dict` results keyed by `scheme://host:port`."""
+        return {host: stats.as_dict() for host, stats in list(self.pool_stats.items())}
+
+
+class _StatsQueue(queue.LifoQueue):
+    stats = None
+
+    def put(self, item, block=True, timeout=None):
+        try:
+            queue.LifoQueue.put(self, item, block, timeout)
+        except queue.Full:
+            if self.stats is not None:
+                self.stats._record_discard()
+            raise
+
+
+class _StatsPoolMixin(object):
+    QueueCls = _StatsQueue
+    stats = None
+
+    def _get_conn(self, timeout=None):
+        timer = instrumentation.active_timer()
+        if timer is not None:
+            start = timer.clock()
+        conn = super(_StatsPoolMixin, self)._get_conn(timeout)
+        if timer is not None:
+            timer.add('connect', timer.clock() - start)
+        if self.stats is not None:
+            # Connections are opened lazily, so a connection without a socket is opened for this request
+            self.stats._record_request(new_connection=getattr(conn, 'sock', None) is None)
+        return conn
+
+
+class _StatsHTTPConnectionPool(_StatsPoolMixin, connectionpool.HTTPConnectionPool):
+    pass
+
+
+class _StatsHTTPSConnectionPool(_StatsPoolMixin, connectionpool.HTTPSConnectionPool):
+    pass
+
+
+class _StatsPoolManager(poolmanager.PoolManager):
+    def __init__(self, pool_stats, *args, **kwargs):
+        super(_StatsPoolManager, self).__init__(*args, **kwargs)
+        self.pool_stats = pool_stats
+        self._stats_lock = threading.Lock()
+        self.pool_classes_by_scheme = {
+            'http': _StatsHTTPConnectionPool,
+            'https': _StatsHTTPSConnectionPool,
+        }
+
+    def _new_pool(self, scheme, host, port, request_context=None):
+        pool = super(_StatsPoolManager, self)._new_pool(scheme, host, port, request_context)
+        # A host's pool may be evicted and recreated, but its statistics are kept
+        with self._stats_lock:
+            stats = self.pool_stats.setdefault('{}://{}:{}'.format(scheme, host, port), PoolStats())
+        pool.stats = stats
+        pool.pool.stats = stats
+        return pool
@@ -0,0 +1,144 @@
+"""Masking of sensitive fields in decoded JSON documents.
+
+A :class:`RedactionRules` instance compiles a declarative set of rules once,
+into a tree of JSON paths and a list of regular expressions for key names,
+and can then mask any number of documents. It is used by
+:class:`APILogger <pylcp.api.APILogger>` to mask request and response bodies.
+
+"""
+from builtins import object
+import re
+
+try:
+    isinstance("", basestring)
+
+    def _is_string(s):
+        return isinstance(s, basestring)  # NOQA
+except NameError:
+    def _is_string(s):
+        return isinstance(s, str)
+
+
+WILDCARD = '*'
+_MAX_CACHED_KEYS = 4096
+
+
+def mask_all(value):
+    """Masks any value completely."""
+    return 'XXX'
+
+
+class RedactionRules(object):
+    """A compiled set of rules for masking sensitive fields in decoded JSON.
+
+    Paths are dotted sequences of object keys, e.g. `billingInfo.cardNumber`,
+    in which `*` matches any key of an object or any item of an array, e.g.
+    `orders.*.billingInfo.cardNumber`. Key patterns are regular expressions
+    that must match the whole key of an object field at any depth, e.g.
+    `(?i).*password`. Each rule maps to a function which is given the
+    original value of a matched field and returns its masked value.
+
+    :param paths: A dictionary of masking functions keyed by path.
+    :param key_patterns: A dictionary of masking functions keyed by key pattern.
+    """
+
+    def __init__(self, paths=None, key_patterns=None):
+        self.paths = dict(paths or {})
+        self.key_patterns = dict(key_patterns or {})
+
+        self._root = _PathNode()
+        for path, masker in self.paths.items():
+            node = self._root
+            for key in path.split('.'):
+                node = node.child(key)
+            node.masker = masker
+
+        self._key_regexes = [
+            (re.compile(pattern) if _is_string(pattern) else pattern, masker)
+            for pattern, masker in self.key_patterns.items()
+        ]
+        # Documents repeat the same few keys, so each is matched against the patterns once
+        self._key_masker_cache = {}
+
+    def redact(self, data):
+        """Returns `data` with every field matched by these rules masked.
+
+        The document is walked once, following only the paths that can match
+        unless there are key patterns. Only the objects and arrays containing
+        masked fields are copied; everything else is shared with `data`, which
+        is itself returned if nothing needs masking.
+
+        :param data: A decoded JSON document.
+        """
+        return self._redact(data, (self._root,))
+
+    def _redact(self, data, nodes):
+        if isinstance(data, dict):
+            if self._key_regexes or any(node.wildcard for node in nodes):
+                keys = list(data)
+            else:
+                keys = set(key for node in nodes for key in node.children if key in data)
+        elif isinstance(data, list):
+            if self._key_regexes or any(node.wildcard for node in nodes):
+                keys = range(len(data))
+            else:
+                keys = ()
+        else:
+            return data
+
+        copied_data = None
+        for key in keys:
+            value = data[key]
+            masker = None
+            child_nodes = []
+            for node in nodes:
+                for child in (node.children.get(key), node.wildcard):
+                    if child is not None:
+                        masker = masker or child.masker
+                        child_nodes.append(child)
+            if masker is None and self._key_regexes and _is_string(key):
+                masker = self._key_masker(key)
+
+            masked_value = masker(value) if masker is not None else self._redact(value, child_nodes)
+            if masked_value is not value:
+                if copied_data is None:
+                    copied_data = dict(data) if isinstance(data, dict) else list(data)
+                copied_data[key] = masked_value
+        return data if copied_data is None else copied_data
+
+    def _key_masker(self, key):
+        try:
+            return self._key_masker_cache[key]
+        except KeyError:
+            pass
+        masker = None
+        for regex, key_masker in self._key_regexes:
+            if _fullmatch(regex, key):
+                masker = key_masker
+                break
+        if len(self._key_masker_cache) < _MAX_CACHED_KEYS:
+            self._key_masker_cache[key] = masker
+        return masker
+
+
+def _fullmatch(regex, string):
+    if hasattr(regex, 'fullmatch'):
+        return regex.fullmatch(string)
+    match = regex.match(string)
+    return match if match and match.end() == len(string) else None
+
+
+class _PathNode(object):
+    __slots__ = ('masker', 'children', 'wildcard')
+
+    def __init__(self):
+        self.masker = None
+        self.children = {}
+        self.wildcard = None
+
+    def child(self, key):
+        if key == WILDCARD:
+            if self.wildcard is None:
+                self.wildcard = _PathNode()
+            return self.wildcard
+        return self.children.setdefault(key, _PathNode())
@@ -0,0 +1,145 @@
+"""Retrying of requests that fail because of transient LCP errors.
+
+A :class:`RetryPolicy` decides whether a failed request is retried and how
+long to wait first. Only requests which are safe to repeat are retried: those
+with an idempotent method, and those of any method which failed before a
+connection was made. Waits grow exponentially with full jitter, so that many
+clients retrying at once do not do so in lock step, and a :class:`RetryBudget`
+stops retries from multiplying the load on the LCP during an outage.
+
+Retries are sent by :class:`Client <pylcp.api.Client>`, which signs every
+attempt afresh so that no MAC timestamp or nonce is ever reused.
+
+"""
+from builtins import object
+import random
+import threading
+import time
+
+import requests
+
+try:
+    from http.client import BAD_GATEWAY, GATEWAY_TIMEOUT, SERVICE_UNAVAILABLE
+except ImportError:
+    from httplib import BAD_GATEWAY, GATEWAY_TIMEOUT, SERVICE_UNAVAILABLE
+
+try:
+    text_type = unicode  # NOQA
+except NameError:
+    text_type = str
+
+IDEMPOTENT_METHODS = frozenset(['DELETE', 'GET', 'HEAD', 'OPTIONS', 'PUT', 'TRACE'])
+RETRY_STATUSES = frozenset([BAD_GATEWAY, SERVICE_UNAVAILABLE, GATEWAY_TIMEOUT])
+
+
+class RetryBudget(object):
+    """Limits retries to a fraction of the requests sent.
+
+    Every request deposits `ratio` tokens and every retry withdraws one, so
+    that on average no more than `ratio` retries are sent per request. The
+    budget starts with `initial` tokens, so that a client which has sent few
+    requests may still retry, and never holds more than `capacity`.
+
+    A budget is safe to share between threads and clients.
+
+    :param ratio: The number of retries allowed per request.
+    :param initial: The number of retries allowed before any requests are sent.
+    :param capacity: The maximum number of retries that can be saved up.
+    """
+
+    def __init__(self, ratio=0.2, initial=10, capacity=100):
+        self.ratio = ratio
+        self.capacity = capacity
+        self.tokens = min(initial, capacity)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self.tokens = min(self.tokens + self.ratio, self.capacity)
+
+    def withdraw(self):
+        """Returns whether a retry is allowed, and if so, charges it to the budget."""
+        with self._lock:
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class RetryPolicy(object):
+    """Decides which failed requests a :class:`Client <pylcp.api.Client>` retries, and when.
+
+    A request is retried if it has an idempotent method and either failed
+    with a connection error or timeout, or its response has one of
+    `retry_statuses`. Requests of any method are retried if they timed out
+    before connecting. Requests with streamed bodies are never retried.
+
+    The wait before the `n`th retry is chosen at random between zero and
+    `backoff_factor * 2 ** (n - 1)` seconds, and is at most `max_backoff`
+    seconds. A longer wait asked for by a `Retry-After` header is honoured
+    up to `max_backoff`.
+
+    :param max_attempts: The maximum number of times a request is sent, including the first.
+    :param backoff_factor: The upper bound, in seconds, of the wait before the first retry.
+    :param max_backoff: The maximum wait, in seconds, before any retry.
+    :param retry_statuses: The response status codes for which requests are retried.
+    :param methods: The HTTP methods of requests which are safe to retry.
+    :param budget: The :class:`RetryBudget` charged for every retry. Defaults to a new :class:`RetryBudget`.
+    :param sleep: The function called to wait between attempts.
+    """
+
+    def __init__(self, max_attempts=3, backoff_factor=0.1, max_backoff=5.0, retry_statuses=RETRY_STATUSES,
+                 methods=IDEMPOTENT_METHODS, budget=None, sleep=time.sleep):
+        self.max_attempts = max_attempts
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.retry_statuses = frozenset(retry_statuses)
+        self.methods = frozenset(method.upper() for method in methods)
+        self.budget = RetryBudget() if budget is None else budget
+        self.sleep = sleep
+
+    def can_retry(self, request):
+        """Returns whether `request` could be sent again, i.e. whether its body is not a stream."""
+        return request.body is None or isinstance(request.body, (bytes, text_type))
+
+    def retry_delay(self, request, attempt, response=None, error=None):
+        """Returns the seconds to wait before retrying `request`, or `None` if it must not be retried.
+
+        :param request: The :class:`requests.PreparedRequest` that was sent.
+        :param attempt: The number of times the request has been sent.
+        :param response: The response to the request, if one was received.
+        :param error: The :class:`requests.RequestException` raised instead of a response.
+        """
+        if attempt >= self.max_attempts:
+            return None
+        if error is not None:
+            if not self._is_retryable_error(request, error):
+                return None
+        elif response.status_code not in self.retry_statuses or request.method not in self.methods:
+            return None
+        if not self.budget.withdraw():
+            return None
+        return self.backoff(attempt, response)
+
+    def backoff(self, attempt, response=None):
+        """Returns a random wait, in seconds, before retry number `attempt`."""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff_factor * 2 ** (attempt - 1)))
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def _is_retryable_error(self, request, error):
+        if isinstance(error, requests.ConnectTimeout):
+            return True
+        return isinstance(error, (requests.ConnectionError, requests.Timeout)) and request.method in self.methods
+
+
+def _retry_after(response):
+    if response is None:
+        return None
+    try:
+        return max(0.0, float(response.headers.get('Retry-After')))
+    except (TypeError, ValueError):
+        # An HTTP date, or no header at all
+        return None
@@ -0,0 +1,212 @@
+"""Validation of JSON documents against the schemas of :mod:`pylcp.schema`.
+
+:func:`compile_schema` turns a schema into a tree of small functions once,
+so that validating a document only runs the checks it needs, without
+looking at the schema again. The schemas in this package use a subset of
+JSON Schema, which is the subset supported:
+
+- `type`, a type name or a list of them: `object`, `array`, `string`,
+  `integer`, `number`, `boolean` or `null`,
+- `enum`,
+- `minimum`, `maximum`, `minLength`, `maxLength` and `pattern`,
+- `properties`, `required` and `additionalProperties`, either a boolean or
+  a schema,
+- `items`, a schema for every item of an array.
+
+`title`, `description` and `$schema` are ignored, and any other keyword is
+rejected when compiling, rather than silently not checked.
+
+"""
+import decimal
+import numbers
+import re
+
+try:
+    isinstance("", basestring)
+
+    def _is_string(s):
+        return isinstance(s, basestring)  # NOQA
+except NameError:
+    def _is_string(s):
+        return isinstance(s, str)
+
+_ANNOTATIONS = frozenset(['title', 'description', '$schema'])
+_KEYWORDS = frozenset([
+    'type', 'enum', 'minimum', 'maximum', 'minLength', 'maxLength', 'pattern',
+    'properties', 'required', 'additionalProperties', 'items',
+])
+
+
+try:
+    _INTEGER_TYPES = frozenset([int, long])  # NOQA
+except NameError:
+    _INTEGER_TYPES = frozenset([int])
+_NUMBER_TYPES = _INTEGER_TYPES | frozenset([float, decimal.Decimal])
+
+
+# The exact types of JSON numbers are checked first, as checks against the abstract base classes are far slower
+def _is_integer(value):
+    return type(value) in _INTEGER_TYPES or (isinstance(value, numbers.Integral) and not isinstance(value, bool))
+
+
+def _is_number(value):
+    return type(value) in _NUMBER_TYPES or (isinstance(value, numbers.Number) and not isinstance(value, bool))
+
+
+_TYPES = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, (list, tuple)),
+    'string': _is_string,
+    'integer': _is_integer,
+    'number': _is_number,
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+
+
+class ValidationError(ValueError):
+    """Raised when a document does not match its schema.
+
+    :ivar path: The tuple of object keys and array indexes leading to the invalid value.
+    """
+
+    def __init__(self, message, path=()):
+        super(ValidationError, self).__init__(message)
+        self.message = message
+        self.path = path
+
+    def __str__(self):
+        if not self.path:
+            return self.message
+        return '{}: {}'.format('.'.join(str(key) for key in self.path), self.message)
+
+
+def compile_schema(schema):
+    """Returns a function which raises a :class:`ValidationError` when it is given a document not matching `schema`.
+
+    :raises ValueError: If `schema` uses keywords which are not supported.
+    """
+    unsupported = set(schema) - _KEYWORDS - _ANNOTATIONS
+    if unsupported:
+        raise ValueError('Unsupported schema keywords: {}'.format(', '.join(sorted(unsupported))))
+
+    checks = []
+    if 'type' in schema:
+        checks.append(_type_check(schema['type']))
+    if 'enum' in schema:
+        checks.append(_enum_check(schema['enum']))
+    if 'minimum' in schema or 'maximum' in schema:
+        checks.append(_range_check(schema.get('minimum'), schema.get('maximum')))
+    if 'minLength' in schema or 'maxLength' in schema or 'pattern' in schema:
+        checks.append(_string_check(schema.get('minLength'), schema.get('maxLength'), schema.get('pattern')))
+    if 'properties' in schema or 'required' in schema or 'additionalProperties' in schema:
+        checks.append(_object_check(schema.get('properties', {}), schema.get('required', ()),
+                                    schema.get('additionalProperties', True)))
+    if 'items' in schema:
+        checks.append(_array_check(schema['items']))
+
+    if len(checks) == 1:
+        return checks[0]
+    checks = tuple(checks)
+
+    def check_all(value):
+        for check in checks:
+            check(value)
+    return check_all
+
+
+def _type_check(type_names):
+    if _is_string(type_names):
+        type_names = [type_names]
+    unknown = set(type_names) - set(_TYPES)
+    if unknown:
+        raise ValueError('Unsupported schema types: {}'.format(', '.join(sorted(unknown))))
+    predicates = tuple(_TYPES[type_name] for type_name in type_names)
+    expected = ' or '.join(type_names)
+
+    def check_type(value):
+        for predicate in predicates:
+            if predicate(value):
+                return
+        raise ValidationError('{!r} is not of type {}'.format(value, expected))
+    return check_type
+
+
+def _enum_check(values):
+    values = tuple(values)
+
+    def check_enum(value):
+        if value not in values:
+            raise ValidationError('{!r} is not one of {!r}'.format(value, list(values)))
+    return check_enum
+
+
+def _range_check(minimum, maximum):
+    def check_range(value):
+        if not _is_number(value):
+            return
+        if minimum is not None and value < minimum:
+            raise ValidationError('{!r} is less than the minimum of {!r}'.format(value, minimum))
+        if maximum is not None and value > maximum:
+            raise ValidationError('{!r} is greater than the maximum of {!r}'.format(value, maximum))
+    return check_range
+
+
+def _string_check(min_length, max_length, pattern):
+    search = re.compile(pattern).search if pattern is not None else None
+
+    def check_string(value):
+        if not _is_string(value):
+            return
+        if min_length is not None and len(value) < min_length:
+            raise ValidationError('{!r} is shorter than {} characters'.format(value, min_length))
+        if max_length is not None and len(value) > max_length:
+            raise ValidationError('{!r} is longer than {} characters'.format(value, max_length))
+        if search is not None and search(value) is None:
+            raise ValidationError('{!r} does not match {!r}'.format(value, pattern))
+    return check_string
+
+
+def _object_check(properties, required, additional_properties):
+    property_checks = {name: compile_schema(property_schema) for name, property_schema in list(properties.items())}
+    required = tuple(required)
+    if additional_properties is True:
+        check_additional = None
+    elif additional_properties is False:
+        check_additional = False
+    else:
+        check_additional = compile_schema(additional_properties)
+
+    def check_object(value):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                raise ValidationError('{!r} is a required property'.format(name))
+        for name, property_value in list(value.items()):
+            check = property_checks.get(name, check_additional)
+            if check is None:
+                continue
+            if check is False:
+                raise ValidationError('Additional property {!r} is not allowed'.format(name))
+            try:
+                check(property_value)
+            except ValidationError as e:
+                e.path = (name,) + e.path
+                raise
+    return check_object
+
+
+def _array_check(items):
+    check_item = compile_schema(items)
+
+    def check_array(value):
+        if not isinstance(value, (list, tuple)):
+            return
+        for index, item in enumerate(value):
+            try:
+                check_item(item)
+            except ValidationError as e:
+                e.path = (index,) + e.path
+                raise
+    return check_array
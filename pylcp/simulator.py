@@ -0,0 +1,321 @@
+"""An in-process stand-in for the LCP, for load and integration testing.
+
+An :class:`LCPSimulatorAdapter` is a :mod:`requests` transport adapter
+which answers the requests of a :class:`Client <pylcp.api.Client>` itself,
+without any network, and which is safe to use from many threads at once::
+
+    client = pylcp.api.Client('https://lcp.simulator/v1', key_id, shared_secret)
+    simulator = LCPSimulatorAdapter(mac_keys={key_id: shared_secret}, latency=0.05, error_rate=0.01)
+    client.mount('https://lcp.simulator/', simulator)
+
+It implements the resources used by the cruds of :mod:`pylcp.crud`:
+
+==========================================  ==================================================
+``GET /lps/{id}``                           Reads a loyalty program.
+``POST /offer-sets/``                       Creates an offer set with an offer of each type.
+``GET /offer-sets/{id}``                    Reads an offer set.
+``POST /orders/``                           Creates a complete order.
+``GET /orders/``                            Searches orders, in pages of `limit` from `offset`.
+``GET``, ``PATCH /orders/{id}``             Reads or modifies an order.
+``POST .../credits/``, ``.../debits/``      Creates a posting, e.g. under ``/lps/{id}/mvs/{id}``.
+``POST .../payment-auths/``                 Authorizes a payment.
+``POST .../payment-auths/{id}/captures/``   Captures an authorized payment.
+``GET .../{id}``                            Reads any other resource created.
+==========================================  ==================================================
+
+Requests are answered with JSON resources whose `links.self.href` can be read
+back. When `mac_keys` are given, requests must be signed with one of them,
+or are answered with `401 Unauthorized`. Latency and transient
+`503 Service Unavailable` errors can be injected, and the number, statuses
+and handling times of the requests to each resource are recorded.
+
+"""
+from builtins import object
+import datetime
+import random
+import re
+import threading
+import time
+import uuid
+
+try:
+    from http.client import (BAD_REQUEST, CREATED, NOT_FOUND, OK, SERVICE_UNAVAILABLE, UNAUTHORIZED, responses)
+except ImportError:
+    from httplib import BAD_REQUEST, CREATED, NOT_FOUND, OK, SERVICE_UNAVAILABLE, UNAUTHORIZED, responses
+try:
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from urlparse import parse_qs, urlsplit
+
+from requests import adapters, models, structures
+
+from pylcp import codec, instrumentation, mac
+
+DEFAULT_PAGE_SIZE = 10
+
+
+class SimulatorError(Exception):
+    """Raised by handlers to answer a request with an error `status`."""
+
+    def __init__(self, status, message):
+        super(SimulatorError, self).__init__(message)
+        self.status = status
+
+
+class SimulatorMetrics(object):
+    """Thread-safe counts and handling times of the requests to each route of an :class:`LCPSimulatorAdapter`.
+
+    Routes are named by method and path template, e.g. `GET /lps/{id}`, or
+    are `None` for requests to no route. Handling times include injected
+    latency.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.statuses = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, status, seconds):
+        with self._lock:
+            self.requests += 1
+            key = (route, status)
+            self.statuses[key] = self.statuses.get(key, 0) + 1
+            histogram = self.histograms.get(route)
+            if histogram is None:
+                histogram = self.histograms[route] = instrumentation.Histogram()
+            histogram.record(seconds)
+
+    def as_dict(self):
+        """Returns the number of `requests`, the count of each (route, status) and the times of each route."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'statuses': dict(self.statuses),
+                'routes': {route: histogram.as_dict() for route, histogram in list(self.histograms.items())},
+            }
+
+
+class LCPSimulatorAdapter(adapters.BaseAdapter):
+    """A transport adapter answering requests as the LCP would, see :mod:`pylcp.simulator`.
+
+    :param mac_keys: A dictionary of MAC keys by identifier. Requests must be signed with one of them if given.
+    :param latency: The seconds each request takes, or a function returning them.
+    :param error_rate: The fraction of requests answered with `503 Service Unavailable`, before being handled.
+    :param loyalty_programs: A dictionary of loyalty programs by identifier. By default, every identifier is a
+        loyalty program.
+    :param seed: The seed of the random choice of requests which fail.
+    :param sleep: The function called to wait for `latency` seconds.
+    """
+
+    def __init__(self, mac_keys=None, latency=0, error_rate=0, loyalty_programs=None, seed=None, sleep=time.sleep):
+        super(LCPSimulatorAdapter, self).__init__()
+        self.verifier = mac.MACVerifier(mac_keys) if mac_keys else None
+        self.latency = latency
+        self.error_rate = error_rate
+        self.loyalty_programs = loyalty_programs
+        self.sleep = sleep
+        self.metrics = SimulatorMetrics()
+        self.resources = {}
+        self._order_urls = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._routes = [
+            ('GET', '/lps/{id}', self._read_loyalty_program),
+            ('POST', '/offer-sets/', self._create_offer_set),
+            ('GET', '/offer-sets/{id}', self._read),
+            ('POST', '/orders/', self._create_order),
+            ('GET', '/orders/', self._search_orders),
+            ('GET', '/orders/{id}', self._read),
+            ('PATCH', '/orders/{id}', self._modify),
+            ('POST', '.../credits/', self._create_posting),
+            ('POST', '.../debits/', self._create_posting),
+            ('POST', '.../payment-auths/', self._create_payment_auth),
+            ('POST', '.../payment-auths/{id}/captures/', self._capture_payment),
+            ('GET', '.../{id}', self._read),
+        ]
+        self._routes = [
+            (method, _route_pattern(template), '{} {}'.format(method, template), handler)
+            for method, template, handler in self._routes
+        ]
+
+    def send(self, request, **kwargs):
+        """Answers `request` after any `latency`, recording its route, status and handling time in `metrics`."""
+        start = time.time()
+        route = None
+        try:
+            latency = self.latency() if callable(self.latency) else self.latency
+            if latency:
+                self.sleep(latency)
+            route, handler, match = self._route(request)
+            if self.error_rate and self._random_fraction() < self.error_rate:
+                raise SimulatorError(SERVICE_UNAVAILABLE, 'Injected error')
+            self._verify(request)
+            status, body = handler(request, match)
+        except SimulatorError as e:
+            status, body = e.status, {'errors': [{'description': str(e)}]}
+        elapsed = time.time() - start
+        self.metrics.record(route, status, elapsed)
+        return self._response(request, status, body, datetime.timedelta(seconds=elapsed))
+
+    def close(self):
+        pass
+
+    def _random_fraction(self):
+        with self._lock:
+            return self._random.random()
+
+    def _verify(self, request):
+        if self.verifier is None:
+            return
+        try:
+            self.verifier.verify(request.method, request.url, request.headers.get('Authorization'),
+                                 request.headers.get('Content-Type', ''), request.body)
+        except mac.MACVerificationError as e:
+            raise SimulatorError(UNAUTHORIZED, str(e))
+
+    def _route(self, request):
+        path = urlsplit(request.url).path
+        for method, pattern, route, handler in self._routes:
+            if request.method == method:
+                match = pattern.search(path)
+                if match:
+                    return route, handler, match
+        raise SimulatorError(NOT_FOUND, 'No resource at {} {}'.format(request.method, path))
+
+    def _response(self, request, status, body, elapsed):
+        response = models.Response()
+        response.request = request
+        response.connection = self
+        response.url = request.url
+        response.status_code = status
+        response.reason = responses.get(status)
+        response.encoding = 'utf-8'
+        response.elapsed = elapsed
+        response.headers = structures.CaseInsensitiveDict({'Content-Type': 'application/json'})
+        if status == CREATED:
+            response.headers['location'] = body['links']['self']['href']
+        response._content = codec.DEFAULT_CODEC.dumps(body)
+        return response
+
+    def _payload(self, request):
+        body = request.body
+        if body is None or body == b'':
+            return {}
+        if isinstance(body, list):
+            # Streamed bodies are replaced by a list of their chunks when signed
+            body = b''.join(mac._to_bytes(chunk) for chunk in body)
+        try:
+            payload = codec.DEFAULT_CODEC.loads(body)
+        except ValueError:
+            raise SimulatorError(BAD_REQUEST, 'Request body is not JSON')
+        if not isinstance(payload, dict):
+            raise SimulatorError(BAD_REQUEST, 'Request body is not a JSON object')
+        return payload
+
+    def _store(self, url, resource):
+        with self._lock:
+            self.resources[url] = resource
+        return CREATED, resource
+
+    def _new_resource(self, request, payload, **properties):
+        url = '{}/{}'.format(request.url.split('?', 1)[0].rstrip('/'), uuid.uuid4().hex)
+        resource = dict(payload, links={'self': {'href': url}}, createdAt=_now(), **properties)
+        return url, resource
+
+    def _read(self, request, match):
+        url = request.url.split('?', 1)[0].rstrip('/')
+        with self._lock:
+            resource = self.resources.get(url)
+        if resource is None:
+            raise SimulatorError(NOT_FOUND, 'No resource at {}'.format(url))
+        return OK, resource
+
+    def _modify(self, request, match):
+        status, resource = self._read(request, match)
+        resource = dict(resource, **self._payload(request))
+        with self._lock:
+            self.resources[resource['links']['self']['href']] = resource
+        return OK, resource
+
+    def _read_loyalty_program(self, request, match):
+        lp_id = match.group('id')
+        if self.loyalty_programs is None:
+            program = {'name': 'Loyalty Program {}'.format(lp_id)}
+        elif lp_id in self.loyalty_programs:
+            program = self.loyalty_programs[lp_id]
+        else:
+            raise SimulatorError(NOT_FOUND, 'No loyalty program {}'.format(lp_id))
+        return OK, dict(program, id=lp_id, links={'self': {'href': request.url.split('?', 1)[0]}})
+
+    def _create_offer_set(self, request, match):
+        payload = self._payload(request)
+        url, offer_set = self._new_resource(request, payload)
+        offer_set['offers'] = [
+            {'type': offer_type, 'links': {'self': {'href': '{}/offers/{}'.format(url, offer_type.lower())}}}
+            for offer_type in payload.get('offerTypes', [])
+        ]
+        return self._store(url, offer_set)
+
+    def _create_order(self, request, match):
+        url, order = self._new_resource(request, self._payload(request), status='complete')
+        with self._lock:
+            self._order_urls.append(url)
+        return self._store(url, order)
+
+    def _search_orders(self, request, match):
+        url, _, query = request.url.partition('?')
+        params = parse_qs(query)
+        try:
+            offset = int(params.get('offset', ['0'])[0])
+            limit = int(params.get('limit', [str(DEFAULT_PAGE_SIZE)])[0])
+        except ValueError:
+            raise SimulatorError(BAD_REQUEST, 'offset and limit must be integers')
+        with self._lock:
+            orders = [self.resources[order_url] for order_url in self._order_urls[offset:offset + limit]]
+            total = len(self._order_urls)
+        page = {
+            'links': {'self': {'href': request.url}},
+            'offset': offset,
+            'limit': limit,
+            'totalCount': total,
+            'embedded': {'orders': orders},
+        }
+        if offset + limit < total:
+            page['links']['next'] = {'href': '{}?offset={}&limit={}'.format(url, offset + limit, limit)}
+        return OK, page
+
+    def _create_posting(self, request, match):
+        payload = self._payload(request)
+        if 'amount' not in payload or 'memberValidation' not in payload:
+            raise SimulatorError(BAD_REQUEST, 'amount and memberValidation are required')
+        url, posting = self._new_resource(request, payload, status='success')
+        return self._store(url, posting)
+
+    def _create_payment_auth(self, request, match):
+        url, auth = self._new_resource(request, self._payload(request), status='authorized')
+        return self._store(url, auth)
+
+    def _capture_payment(self, request, match):
+        auth_url = request.url.split('?', 1)[0].rstrip('/').rsplit('/', 1)[0]
+        with self._lock:
+            auth = self.resources.get(auth_url)
+            if auth is not None:
+                # Replaced rather than changed, as other threads may be reading it
+                self.resources[auth_url] = dict(auth, status='captured')
+        if auth is None:
+            raise SimulatorError(NOT_FOUND, 'No payment authorization at {}'.format(auth_url))
+        url, capture = self._new_resource(request, self._payload(request), paymentAuth=auth_url, status='captured')
+        return self._store(url, capture)
+
+
+def _route_pattern(template):
+    """Returns the regular expression matching the ends of paths for a route such as `.../payment-auths/{id}/`."""
+    pattern = re.escape(template.rstrip('/')).replace(re.escape('{id}'), '(?P<id>[^/]+)')
+    if template.startswith('...'):
+        pattern = pattern[len(re.escape('...')):]
+    return re.compile('{}/?$'.format(pattern))
+
+
+def _now():
+    return datetime.datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S.%fZ')
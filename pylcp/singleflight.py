@@ -0,0 +1,72 @@
+"""Coalescing of concurrent identical calls.
+
+When many threads ask for the same thing at once, e.g. read the same
+loyalty program just as its cached response expires, a :class:`SingleFlight`
+lets the first of them make the call while the others wait for, and share,
+its outcome. A :class:`Client <pylcp.api.Client>` created with
+`coalesce_reads=True` uses one for its `GET` requests.
+
+"""
+from builtins import object
+import threading
+
+
+class SingleFlight(object):
+    """Runs at most one call at a time for each key, sharing its outcome with concurrent callers.
+
+    `calls` counts the calls made and `shared` the callers which received
+    the outcome of another caller's call instead of making their own.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.shared = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._in_flight)}
+
+    def do(self, key, function):
+        """Returns a tuple of the result of `function` and whether it was shared.
+
+        If a call for `key` is in flight, waits for it and returns its
+        result, or raises its exception, rather than calling `function`.
+        """
+        with self._lock:
+            call = self._in_flight.get(key)
+            if call is None:
+                call = self._in_flight[key] = _Call()
+                self.calls += 1
+                leader = True
+            else:
+                self.shared += 1
+                leader = False
+
+        if not leader:
+            call.done.wait()
+            return call.outcome(), True
+
+        try:
+            call.result = function()
+        except BaseException as e:
+            # Even KeyboardInterrupt and SystemExit are shared, as the callers waiting have no result otherwise
+            call.error = e
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            call.done.set()
+        return call.outcome(), False
+
+
+class _Call(object):
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+    def outcome(self):
+        if self.error is not None:
+            raise self.error
+        return self.result
@@ -1,7 +1,21 @@
-from builtins import bytes
+from builtins import bytes, object
+import collections
+import datetime
+import threading
+
+try:
+    from http.client import responses
+except ImportError:
+    from httplib import responses
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
 
 from nose.tools import eq_
-from requests import adapters, models
+from requests import adapters, cookies, models, structures
+
+from pylcp import codec
 
 
 class MockRequestAdapter(adapters.BaseAdapter):
@@ -21,7 +35,9 @@ class MockRequestAdapter(adapters.BaseAdapter):
 
         self.last_request = request
         self.last_request_kwargs = kwargs
+        return self._echo(request)
 
+    def _echo(self, request):
         response = models.Response()
         response.request = request
         response.connection = self
@@ -32,7 +48,9 @@ class MockRequestAdapter(adapters.BaseAdapter):
             'location': request.url,
         }
         response._content = ''
-        if request.body is not None:
+        if isinstance(request.body, bytes):
+            response._content = request.body
+        elif request.body is not None:
             response._content = bytes(request.body.encode('utf-8'))
         return response
 
@@ -65,3 +83,158 @@ class MockRequestAdapter(adapters.BaseAdapter):
                 actual_value,
             )
             eq_(actual_value, expected_value, message)
+
+
+class CannedResponse(object):
+    """A response returned by a :class:`RecordingAdapter` for the requests matching a route.
+
+    The body is encoded once, when the canned response is created.
+
+    :param status_code: The status code of the response.
+    :param body: The body of the response, as a byte string, or as a JSON compatible object which is encoded.
+    :param headers: The headers of the response, in addition to a `Content-Type: application/json` header.
+    """
+
+    def __init__(self, status_code=200, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = dict({'Content-Type': 'application/json'}, **(headers or {}))
+        if body is None or isinstance(body, bytes):
+            self.content = body or b''
+        else:
+            self.content = codec.dumps_compact(body)
+        self._attributes = {
+            'status_code': status_code,
+            'reason': responses.get(status_code),
+            'encoding': 'utf-8',
+            '_content': self.content,
+            '_content_consumed': True,
+            '_next': None,
+            'raw': None,
+            'connection': None,
+            'elapsed': datetime.timedelta(0),
+        }
+
+    def response(self, request, connection):
+        """Returns a new :class:`requests.Response` to `request`."""
+        # Copies the prepared attributes rather than running Response.__init__ and then replacing most of them
+        response = models.Response.__new__(models.Response)
+        response.__dict__.update(self._attributes)
+        response.headers = structures.CaseInsensitiveDict(self.headers)
+        response.cookies = cookies.RequestsCookieJar()
+        response.history = []
+        response.url = request.url
+        response.request = request
+        response.connection = connection
+        return response
+
+
+class RecordingAdapter(MockRequestAdapter):
+    """A :class:`MockRequestAdapter` which records every request it is sent, for multi-threaded and batch tests.
+
+    The most recent `max_requests` requests are kept, with the keyword
+    arguments they were sent with, and can be inspected and asserted on.
+    Recording is safe from any number of threads.
+
+    Requests matching a route are answered with its :class:`CannedResponse`.
+    Routes match a method, or any method when `None`, and either an exact
+    path or a compiled regular expression searched in the path. Exact paths
+    are looked up in a dictionary, so they cost the same however many there
+    are. Other requests are echoed as by :class:`MockRequestAdapter`.
+
+    :param max_requests: The number of most recent requests kept.
+    :param routes: An iterable of (method, path, :class:`CannedResponse`) routes.
+    """
+
+    def __init__(self, max_requests=1000, routes=()):
+        self.max_requests = max_requests
+        self.call_count = 0
+        self._records = collections.deque(maxlen=max_requests)
+        self._exact_routes = {}
+        self._pattern_routes = []
+        self._lock = threading.Lock()
+        for method, path, canned_response in routes:
+            self.add_route(method, path, canned_response)
+
+    def add_route(self, method, path, canned_response):
+        """Answers requests with `method` and `path` with `canned_response`, see :class:`RecordingAdapter`."""
+        method = method.upper() if method else None
+        if hasattr(path, 'search'):
+            self._pattern_routes.append((method, path, canned_response))
+        else:
+            self._exact_routes[(method, path)] = canned_response
+
+    def send(self, request, **kwargs):
+        with self._lock:
+            self.call_count += 1
+            self._records.append((request, kwargs))
+
+        canned_response = self._canned_response(request)
+        if canned_response is None:
+            return self._echo(request)
+        return canned_response.response(request, self)
+
+    @property
+    def last_request(self):
+        with self._lock:
+            return self._records[-1][0] if self._records else None
+
+    @property
+    def last_request_kwargs(self):
+        with self._lock:
+            return self._records[-1][1] if self._records else None
+
+    @property
+    def requests(self):
+        """The recorded requests, oldest first."""
+        with self._lock:
+            return [request for request, _ in self._records]
+
+    def reset(self):
+        with self._lock:
+            self.call_count = 0
+            self._records.clear()
+
+    def find_requests(self, method=None, path=None, headers=None):
+        """Returns the recorded requests with `method`, `path` and `headers`, oldest first.
+
+        :param method: The HTTP method of the requests, or `None` for any.
+        :param path: The path of the requests, or a compiled regular expression searched in it, or `None` for any.
+        :param headers: A dictionary of header name/value pairs the requests must all have.
+        """
+        method = method.upper() if method else None
+        return [
+            request for request in self.requests
+            if (method is None or request.method == method) and
+            (path is None or _path_matches(path, urlsplit(request.url).path)) and
+            all(request.headers.get(name) == value for name, value in list((headers or {}).items()))
+        ]
+
+    def assert_requested(self, method=None, path=None, headers=None, count=None):
+        """Assert that recorded requests match, see :meth:`find_requests`.
+
+        :param count: The number of requests that must match, or `None` for at least one.
+        """
+        matching = len(self.find_requests(method, path, headers))
+        message = 'Expected {} requests with method={}, path={}, headers={} among the {} recorded, found {}'.format(
+            'some' if count is None else count, method, path, headers, len(self._records), matching)
+        assert matching == count if count is not None else matching > 0, message
+
+    def assert_not_requested(self, method=None, path=None, headers=None):
+        """Assert that no recorded request matches, see :meth:`find_requests`."""
+        self.assert_requested(method, path, headers, count=0)
+
+    def _canned_response(self, request):
+        path = urlsplit(request.url).path
+        canned_response = self._exact_routes.get((request.method, path)) or self._exact_routes.get((None, path))
+        if canned_response is not None:
+            return canned_response
+        for method, pattern, canned_response in self._pattern_routes:
+            if (method is None or method == request.method) and pattern.search(path):
+                return canned_response
+        return None
+
+
+def _path_matches(path, request_path):
+    if hasattr(path, 'search'):
+        return path.search(request_path) is not None
+    return path == request_path
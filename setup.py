@@ -10,6 +10,7 @@ import subprocess
 
 REQUIREMENTS = [
     'future>=0.4.13,<1.0',
+    'futures>=3.0; python_version < "3"',
     'requests>=2.2.1,<3.0',
     'simplejson>=3.6.4',
     'cffi==1.9.1',
@@ -20,6 +21,9 @@ REQUIREMENTS = [
     'pycparser==2.17',
     'pyOpenSSL==16.2.0'
 ]
+AIO_REQUIREMENTS = ['aiohttp>=3.3; python_version >= "3.5"']
+RAPIDJSON_REQUIREMENTS = ['python-rapidjson>=0.9.1; python_version >= "3.4"']
+NUMPY_REQUIREMENTS = ['numpy>=1.7; python_version >= "3.4"']
 DEV_REQUIREMENTS = [
     'coverage>=4.2',
     'flake8>=3.2.1',
@@ -30,7 +34,7 @@ DEV_REQUIREMENTS = [
     'pycodestyle>=2.2.0',
     'pyflakes>=1.3.0',
     'teamcity-messages>=1.20'
-]
+] + AIO_REQUIREMENTS + RAPIDJSON_REQUIREMENTS + NUMPY_REQUIREMENTS
 DOCS_REQUIREMENTS = ['sphinx']
 
 
@@ -75,7 +79,7 @@ setuptools.setup(name='PyLCP',
                  author_email='',
                  url='',
                  license='',
-                 packages=setuptools.find_packages(exclude=['tests']),
+                 packages=setuptools.find_packages(exclude=['tests', 'tests.*', 'benchmarks']),
                  include_package_data=True,
                  zip_safe=False,
                  install_requires=REQUIREMENTS,
@@ -85,6 +89,9 @@ setuptools.setup(name='PyLCP',
                  test_suite='nose.collector',
                  tests_require=DEV_REQUIREMENTS,
                  extras_require={
+                     'aio': AIO_REQUIREMENTS,
+                     'rapidjson': RAPIDJSON_REQUIREMENTS,
+                     'numpy': NUMPY_REQUIREMENTS,
                      'dev': DEV_REQUIREMENTS,
                      'docs': DEV_REQUIREMENTS + DOCS_REQUIREMENTS
                  },
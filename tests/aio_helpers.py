@@ -0,0 +1,56 @@
+"""Coroutine helpers for the asyncio tests.
+
+These live in their own module so that the test modules using them can be
+skipped, rather than fail to compile, on Python versions without async/await.
+"""
+import asyncio
+
+from aiohttp import web
+
+
+async def echo(request):
+    """Echoes the request back, in the spirit of :class:`pylcp.testing.MockRequestAdapter`."""
+    body = await request.read()
+    return web.Response(
+        body=body or b'{"number": 1.2}',
+        content_type='application/json',
+        headers={
+            'location': str(request.url),
+            'X-Method': request.method,
+            'X-Path': request.path_qs,
+            'X-Authorization': request.headers.get('Authorization', ''),
+            'X-Content-Type': request.headers.get('Content-Type', ''),
+        }
+    )
+
+
+async def not_found(request):
+    return web.Response(status=404, reason='Not Found')
+
+
+async def redirect_loop(request):
+    raise web.HTTPFound(request.path)
+
+
+async def returning(value):
+    return value
+
+
+async def gather(*coroutines):
+    return await asyncio.gather(*coroutines)
+
+
+def coroutine_function(function, delay=None):
+    """Returns a coroutine function returning the result of `function`, after sleeping `delay(*args)` seconds."""
+    async def call(*args, **kwargs):
+        if delay:
+            await asyncio.sleep(delay(*args))
+        return function(*args, **kwargs)
+    return call
+
+
+async def collect(async_iterable):
+    items = []
+    async for item in async_iterable:
+        items.append(item)
+    return items
@@ -11,6 +11,7 @@ import json
 from nose import tools
 import requests
 
+from pylcp import codec
 from pylcp.api import JsonResponseWrapper
 from pylcp.crud import base
 
@@ -28,6 +29,31 @@ def mock_response(status_code=OK, headers=None, body=None):
     return response_mock
 
 
+def json_payload(data):
+    """Returns an object which compares equal to the compact :class:`pylcp.codec.JsonPayload` encoding of `data`."""
+    return _JsonPayloadMatcher(data)
+
+
+class _JsonPayloadMatcher(object):
+
+    def __init__(self, data):
+        self.data = data
+
+    def __eq__(self, other):
+        return (
+            isinstance(other, codec.JsonPayload) and
+            other.data == self.data and
+            json.loads(other.decode('utf-8')) == self.data and
+            other == codec.dumps_compact(other.data)
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __repr__(self):
+        return 'json_payload({!r})'.format(self.data)
+
+
 def mock_response_with_json_response_wrapper(status_code=OK, headers=None, body=None):
     response_mock = mock_response(status_code, headers, body)
     return JsonResponseWrapper(response_mock)
@@ -0,0 +1,209 @@
+from builtins import object
+import sys
+
+try:
+    from http.client import NOT_FOUND
+except ImportError:
+    from httplib import NOT_FOUND
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from nose import tools
+from nose.plugins.skip import SkipTest
+import requests
+
+from tests.crud import base as test_base
+
+if sys.version_info < (3, 5):
+    raise SkipTest('asyncio support requires Python 3.5+')
+try:
+    import asyncio
+
+    from pylcp import aio
+    from pylcp.crud import aio as crud_aio
+    from tests import aio_helpers
+except ImportError:
+    raise SkipTest('asyncio support requires aiohttp')
+
+
+class AsyncCrudTestBase(object):
+    def setup(self):
+        self.loop = asyncio.new_event_loop()
+        self.mock_client = mock.create_autospec(aio.AsyncClient)
+
+    def teardown(self):
+        self.loop.close()
+
+    def _respond_with(self, http_method, mocked_response):
+        getattr(self.mock_client, http_method).side_effect = \
+            lambda *args, **kwargs: aio_helpers.returning(mocked_response)
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+
+class TestAsyncLCPCRUD(AsyncCrudTestBase):
+    def setup(self):
+        super(TestAsyncLCPCRUD, self).setup()
+        self.lcp_crud = crud_aio.AsyncLCPCrud(self.mock_client)
+
+    def test_create(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('post', mocked_response)
+
+        response = self._run(self.lcp_crud.create(test_base.SAMPLE_URL, {}))
+
+        self.mock_client.post.assert_called_with(test_base.SAMPLE_URL, data=test_base.json_payload({}), params=None)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_request_failures_raises_http_error(self):
+        self._respond_with('post', test_base.mock_response(status_code=NOT_FOUND))
+        with tools.assert_raises(requests.HTTPError):
+            self._run(self.lcp_crud.create(test_base.SAMPLE_URL, {}))
+
+    def test_read(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('get', mocked_response)
+
+        response = self._run(self.lcp_crud.read(test_base.SAMPLE_URL))
+
+        tools.assert_equal(1, self.mock_client.get.call_count)
+        test_base.assert_lcp_resource(mocked_response, response)
+        tools.assert_equal('some_url', response.url)
+
+    def test_update(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('put', mocked_response)
+
+        response = self._run(self.lcp_crud.update(test_base.SAMPLE_URL, {}))
+
+        tools.assert_equal(1, self.mock_client.put.call_count)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_modify(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('patch', mocked_response)
+
+        response = self._run(self.lcp_crud.modify(test_base.SAMPLE_URL, {}))
+
+        tools.assert_equal(1, self.mock_client.patch.call_count)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_delete(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('delete', mocked_response)
+
+        response = self._run(self.lcp_crud.delete(test_base.SAMPLE_URL))
+
+        tools.assert_equal(1, self.mock_client.delete.call_count)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_search(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('get', mocked_response)
+
+        response = self._run(self.lcp_crud.search(test_base.SAMPLE_URL, {'a': 'b'}))
+
+        self.mock_client.get.assert_called_with(test_base.SAMPLE_URL, data=None, params={'a': 'b'})
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_search_iter_follows_next_links(self):
+        def respond(path, data=None, params=None):
+            body = {'embedded': {'orders': [{'path': path}]}}
+            if path == test_base.SAMPLE_URL:
+                body['links'] = {'next': {'href': 'http://test.com/next'}}
+            return test_base.mock_response(headers={}, body=body)
+        self.mock_client.get.side_effect = aio_helpers.coroutine_function(respond)
+
+        items = self._run(aio_helpers.collect(self.lcp_crud.search_iter(test_base.SAMPLE_URL, prefetch=True)))
+
+        tools.assert_equal([{'path': test_base.SAMPLE_URL}, {'path': 'http://test.com/next'}], items)
+
+    def test_closing_search_iter_cancels_the_prefetched_page(self):
+        def respond(path, data=None, params=None):
+            return test_base.mock_response(headers={}, body={
+                'embedded': {'orders': [{}]}, 'links': {'next': {'href': 'http://test.com/next'}}})
+        self.mock_client.get.side_effect = aio_helpers.coroutine_function(
+            respond, delay=lambda path: 0 if path == test_base.SAMPLE_URL else 10)
+
+        search = self.lcp_crud.search_iter(test_base.SAMPLE_URL, prefetch=True)
+        tools.assert_equal({}, self._run(search.__anext__()))
+        next_page = search._next_page
+        self._run(search.aclose())
+
+        with tools.assert_raises(asyncio.CancelledError):
+            self._run(next_page)
+
+    def test_closing_create_many_cancels_the_started_operations(self):
+        self.mock_client.post.side_effect = aio_helpers.coroutine_function(
+            lambda path, data=None, params=None: test_base.mock_response(headers={}, body={}),
+            delay=lambda path: 0 if path == '0' else 10)
+
+        results = self.lcp_crud.create_many([(str(i), {}) for i in range(4)], concurrency=2)
+        tools.assert_equal(0, self._run(results.__anext__()).index)
+        started = [task for _, _, task in results._pending]
+        self._run(results.aclose())
+
+        tools.assert_equal(3, len(started))
+        for task in started:
+            with tools.assert_raises(asyncio.CancelledError):
+                self._run(task)
+
+    def test_create_many_returns_results_in_input_order(self):
+        def respond(path, data=None, params=None):
+            if path == '1':
+                return test_base.mock_response(status_code=NOT_FOUND)
+            return test_base.mock_response(headers={}, body={'path': path})
+        self.mock_client.post.side_effect = aio_helpers.coroutine_function(
+            respond, delay=lambda path: 0.01 * (3 - int(path)))
+
+        results = self._run(aio_helpers.collect(
+            self.lcp_crud.create_many([(str(i), {}) for i in range(3)], concurrency=2)))
+
+        tools.assert_equal([0, 1, 2], [result.index for result in results])
+        tools.assert_equal('0', results[0].resource['path'])
+        tools.assert_is_instance(results[1].error, requests.HTTPError)
+        tools.assert_equal('2', results[2].resource['path'])
+
+
+class TestAsyncDomainCruds(AsyncCrudTestBase):
+    def test_loyalty_program_read(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('get', mocked_response)
+
+        response = self._run(crud_aio.AsyncLoyaltyProgram(self.mock_client).read('lp123'))
+
+        self.mock_client.get.assert_called_with('/lps/lp123', data=None, params=None)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_order_create(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('post', mocked_response)
+
+        response = self._run(crud_aio.AsyncOrder(self.mock_client).create('buy', {'language': 'en'}))
+
+        self.mock_client.post.assert_called_with(
+            '/orders/', data=test_base.json_payload({'orderType': 'buy', 'data': {'language': 'en'}}), params=None)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_credit_create(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('post', mocked_response)
+
+        response = self._run(crud_aio.AsyncCredit(self.mock_client).create('/lps/123/credits', 1000, '/mvs/456'))
+
+        self.mock_client.post.assert_called_with(
+            '/lps/123/credits',
+            data=test_base.json_payload({'amount': 1000, 'memberValidation': '/mvs/456'}), params=None)
+        test_base.assert_lcp_resource(mocked_response, response)
+
+    def test_payment_capture_create(self):
+        mocked_response = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self._respond_with('post', mocked_response)
+
+        response = self._run(crud_aio.AsyncPaymentCapture(self.mock_client).create('/lps/123/payments'))
+
+        self.mock_client.post.assert_called_with('/lps/123/payments', data='{}', params=None)
+        test_base.assert_lcp_resource(mocked_response, response)
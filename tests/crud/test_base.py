@@ -1,7 +1,10 @@
 from future import standard_library
 standard_library.install_aliases()  # NOQA
 
-from builtins import object
+from builtins import object, range
+import decimal
+import threading
+import time
 
 try:
     from http.client import NO_CONTENT
@@ -69,6 +72,62 @@ class TestLCPResource(object):
         lcp_obj = crud.LCPResource()
         tools.assert_dict_equal({}, lcp_obj.json)
 
+    def test_nested_changes_to_json_do_not_change_resource(self):
+        response_mock = test_base.mock_response(headers={}, body={'links': {'self': {'href': 'some_url'}}})
+        lcp_obj = crud.LCPResource(response_mock)
+        json_copy = lcp_obj.json
+        json_copy['links']['self']['href'] = 'foo'
+        json_copy['links'].setdefault('next', {})['href'] = 'bar'
+        tools.assert_equal({'self': {'href': 'foo'}, 'next': {'href': 'bar'}}, json_copy['links'])
+        tools.assert_equal({'links': {'self': {'href': 'some_url'}}}, lcp_obj.json)
+        tools.assert_equal('some_url', lcp_obj.url)
+
+    def test_changes_to_items_do_not_change_resource(self):
+        body = {'items': [{'amount': 1}, {'amount': 2}]}
+        lcp_obj = crud.LCPResource(test_base.mock_response(headers={}, body=body))
+        items = lcp_obj['items']
+        for item in items:
+            item['amount'] = 0
+        items.pop()['extra'] = True
+        items.append({'amount': 4})
+        tools.assert_equal([{'amount': 0}, {'amount': 4}], items)
+        tools.assert_equal(body, lcp_obj.json)
+
+    def test_changes_to_copies_do_not_change_each_other(self):
+        lcp_obj = crud.LCPResource(test_base.mock_response(headers={}, body={'a': {'b': {'c': 1}}}))
+        first = lcp_obj['a']
+        second = lcp_obj['a']
+        second['b']['c'] = 2
+        tools.assert_equal({'b': {'c': 1}}, first)
+        tools.assert_equal({'b': {'c': 2}}, second)
+
+    def test_changes_through_builtin_copies_do_not_change_resource(self):
+        body = {'a': {'b': 1}, 'items': [{'amount': 1}]}
+        lcp_obj = crud.LCPResource(test_base.mock_response(headers={}, body=body))
+        dict(lcp_obj.json)['a']['b'] = 2
+        dict(**lcp_obj.json)['a']['b'] = 3
+        dict(lcp_obj.json.items())['items'][0]['amount'] = 4
+        list(lcp_obj['items'])[0]['amount'] = 5
+        (lcp_obj['items'] + [])[0]['amount'] = 6
+        tools.assert_equal(body, lcp_obj.json)
+
+    def test_json_is_parsed_once(self):
+        response_mock = mock.Mock()
+        response_mock.headers = {}
+        response_mock.json.return_value = {'a': {'b': 'c'}, 'links': {'self': {'href': 'some_url'}}}
+        lcp_obj = crud.LCPResource(response_mock)
+
+        tools.assert_equal('c', lcp_obj['a']['b'])
+        tools.assert_equal('some_url', lcp_obj.url)
+        tools.assert_equal('c', lcp_obj.json['a']['b'])
+        tools.assert_equal(1, response_mock.json.call_count)
+
+    def test_json_is_parsed_again_when_response_changes(self):
+        lcp_obj = crud.LCPResource(test_base.mock_response(headers={}, body={'a': 1}))
+        tools.assert_equal(1, lcp_obj['a'])
+        lcp_obj.response = test_base.mock_response(headers={}, body={'a': 2})
+        tools.assert_equal(2, lcp_obj['a'])
+
     def test_with_json_response_wrapper(self):
         response_mock = test_base.mock_response_with_json_response_wrapper(
             headers={}, body={'foo': 'bar', 'links': {'self': {'href': 'some_url'}}})
@@ -90,6 +149,39 @@ class TestLCPCRUD(object):
         tools.assert_equal(1, self.mock_client.post.call_count)
         test_base.assert_lcp_resource(mocked_response, response)
 
+    def test_payloads_are_encoded_once_as_compact_json(self):
+        self.mock_client.post.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        payload = {'amount': decimal.Decimal('1.10'), 'items': [{'a': 'b'}]}
+
+        self.lcp_crud.create(test_base.SAMPLE_URL, payload)
+
+        data = self.mock_client.post.call_args[1]['data']
+        tools.assert_equal(b'{"amount":1.10,"items":[{"a":"b"}]}', data)
+        tools.assert_is(payload, data.data)
+
+    def test_string_payloads_are_sent_as_they_are(self):
+        self.mock_client.put.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+
+        self.lcp_crud.update(test_base.SAMPLE_URL, '{"a": 1}')
+
+        self.mock_client.put.assert_called_with(test_base.SAMPLE_URL, data='{"a": 1}', params=None)
+
+    def test_payloads_are_encoded_for_clients_without_a_codec(self):
+        http_client = mock.Mock()
+        http_client.post.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+
+        crud.LCPCrud(http_client).create(test_base.SAMPLE_URL, {'a': 1})
+
+        tools.assert_equal(b'{"a":1}', http_client.post.call_args[1]['data'])
+
+    def test_json_encoder_is_pluggable(self):
+        self.mock_client.patch.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        lcp_crud = crud.LCPCrud(self.mock_client, json_encoder=lambda data: b'encoded')
+
+        lcp_crud.modify(test_base.SAMPLE_URL, {'a': 1})
+
+        tools.assert_equal(b'encoded', self.mock_client.patch.call_args[1]['data'])
+
     def test_request_failures_raises_http_error(self):
         mocked_response = test_base.mock_response(status_code=NOT_FOUND)
         self.mock_client.post.return_value = mocked_response
@@ -144,3 +236,146 @@ class TestLCPCRUD(object):
         response = self.lcp_crud.search(test_base.SAMPLE_URL)
         tools.assert_equal(1, self.mock_client.get.call_count)
         test_base.assert_lcp_resource(mocked_response, response)
+
+
+class TestLCPCRUDSearchIter(object):
+    def setup(self):
+        self.mock_client = mock.create_autospec(api.Client)
+        self.lcp_crud = crud.LCPCrud(self.mock_client)
+        self.mock_client.get.side_effect = self._respond_with_page
+
+    def _respond_with_page(self, path, data=None, params=None):
+        number = int(path.rsplit('=', 1)[1]) if '=' in path else 0
+        body = {'links': {'self': {'href': path}}, 'embedded': {'orders': [{'id': 2 * number}, {'id': 2 * number + 1}]}}
+        if number < 2:
+            body['links']['next'] = {'href': 'http://test.com/orders?page={}'.format(number + 1)}
+        return test_base.mock_response(headers={}, body=body)
+
+    def test_yields_items_of_every_page(self):
+        items = list(self.lcp_crud.search_iter('/orders', {'status': 'complete'}))
+
+        tools.assert_equal([{'id': i} for i in range(6)], items)
+        tools.assert_equal([
+            mock.call('/orders', data=None, params={'status': 'complete'}),
+            mock.call('http://test.com/orders?page=1', data=None, params=None),
+            mock.call('http://test.com/orders?page=2', data=None, params=None),
+        ], self.mock_client.get.call_args_list)
+
+    def test_pages_are_requested_lazily(self):
+        items = self.lcp_crud.search_iter('/orders')
+
+        tools.assert_equal([{'id': 0}, {'id': 1}, {'id': 2}], [next(items) for _ in range(3)])
+        tools.assert_equal(2, self.mock_client.get.call_count)
+
+    def test_prefetch_requests_next_page_before_items_are_consumed(self):
+        items = self.lcp_crud.search_iter('/orders', prefetch=True)
+
+        tools.assert_equal({'id': 0}, next(items))
+        for _ in range(100):
+            if self.mock_client.get.call_count == 2:
+                break
+            time.sleep(0.01)
+        tools.assert_equal(2, self.mock_client.get.call_count)
+        tools.assert_equal([{'id': i} for i in range(1, 6)], list(items))
+        tools.assert_equal(3, self.mock_client.get.call_count)
+
+    def test_items_key_chooses_array(self):
+        body = {'embedded': {'orders': [{'id': 1}], 'offers': [{'id': 2}]}}
+        self.mock_client.get.side_effect = None
+        self.mock_client.get.return_value = test_base.mock_response(headers={}, body=body)
+
+        tools.assert_equal([{'id': 2}], list(self.lcp_crud.search_iter('/search', items_key='offers')))
+        with tools.assert_raises(ValueError):
+            list(self.lcp_crud.search_iter('/search'))
+
+    def test_page_without_items(self):
+        self.mock_client.get.side_effect = None
+        self.mock_client.get.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+
+        tools.assert_equal([], list(self.lcp_crud.search_iter('/orders')))
+
+    def test_request_failures_raise_http_error(self):
+        self.mock_client.get.side_effect = None
+        self.mock_client.get.return_value = test_base.mock_response(status_code=NOT_FOUND)
+
+        with tools.assert_raises(requests.HTTPError):
+            list(self.lcp_crud.search_iter('/orders'))
+
+
+class TestLCPCRUDBatches(object):
+    def setup(self):
+        self.mock_client = mock.create_autospec(api.Client)
+        self.lcp_crud = crud.LCPCrud(self.mock_client)
+
+    def _respond_with_path(self, path, data=None, params=None):
+        return test_base.mock_response(headers={}, body={'path': path, 'data': data and data.data})
+
+    def test_create_many_returns_results_in_input_order(self):
+        def respond_slowly_to_early_items(path, data=None, params=None):
+            time.sleep(0.01 * (5 - int(path)))
+            return self._respond_with_path(path, data)
+        self.mock_client.post.side_effect = respond_slowly_to_early_items
+
+        results = list(self.lcp_crud.create_many([(str(i), {'i': i}) for i in range(5)], concurrency=5))
+
+        tools.assert_equal(list(range(5)), [result.index for result in results])
+        tools.assert_equal([str(i) for i in range(5)], [result.resource['path'] for result in results])
+        tools.assert_equal([{'i': i} for i in range(5)], [result.resource['data'] for result in results])
+        tools.assert_equal([None] * 5, [result.error for result in results])
+
+    def test_read_many_accepts_single_arguments_and_keyword_arguments(self):
+        self.mock_client.get.side_effect = self._respond_with_path
+
+        results = list(self.lcp_crud.read_many(['a', {'path': 'b'}]))
+
+        tools.assert_equal(['a', 'b'], [result.resource['path'] for result in results])
+        tools.assert_equal(['a', {'path': 'b'}], [result.item for result in results])
+
+    def test_errors_are_returned_with_their_item(self):
+        def respond(path, data=None, params=None):
+            return test_base.mock_response(status_code=NOT_FOUND if path == 'missing' else NO_CONTENT)
+        self.mock_client.delete.side_effect = respond
+
+        results = list(self.lcp_crud.delete_many(['a', 'missing', 'b']))
+
+        tools.assert_equal([None, 'missing', None],
+                           [result.item if result.error else None for result in results])
+        tools.assert_is_instance(results[1].error, requests.HTTPError)
+        tools.assert_is_none(results[1].resource)
+        tools.assert_is_not_none(results[2].resource)
+
+    def test_concurrency_is_bounded(self):
+        lock = threading.Lock()
+        in_flight = [0]
+        max_in_flight = [0]
+
+        def respond(path, data=None, params=None):
+            with lock:
+                in_flight[0] += 1
+                max_in_flight[0] = max(max_in_flight[0], in_flight[0])
+            time.sleep(0.005)
+            with lock:
+                in_flight[0] -= 1
+            return self._respond_with_path(path)
+        self.mock_client.get.side_effect = respond
+
+        results = list(self.lcp_crud.read_many((str(i) for i in range(30)), concurrency=3))
+
+        tools.assert_equal(30, len(results))
+        tools.assert_true(max_in_flight[0] <= 3)
+
+    def test_items_are_consumed_lazily(self):
+        consumed = []
+
+        def items():
+            for i in range(100):
+                consumed.append(i)
+                yield str(i)
+        self.mock_client.get.side_effect = self._respond_with_path
+
+        results = self.lcp_crud.read_many(items(), concurrency=2)
+        next(results)
+        results.close()
+
+        tools.assert_true(len(consumed) <= 5)
+        tools.assert_true(self.mock_client.get.call_count <= 5)
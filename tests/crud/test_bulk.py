@@ -0,0 +1,123 @@
+from builtins import object, range
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from nose import tools
+from nose.plugins.skip import SkipTest
+
+from pylcp import api, codec, simulator
+from pylcp.crud import postings
+from pylcp.schema import validation
+
+try:
+    import numpy
+
+    from pylcp.crud import bulk
+except ImportError:
+    raise SkipTest('bulk postings require NumPy')
+
+MV_URL = 'https://lcp.points.com/v1/lps/123/mvs/456'
+PATH = '/lps/lp1/mvs/mv1/credits'
+
+
+def _payloads(columns):
+    return [bytes(payload) for payload in columns.payloads()]
+
+
+class TestPostingColumns(object):
+    def test_payloads_match_create_payload(self):
+        rows = [
+            (1000, MV_URL, None, None),
+            (1, MV_URL + '/2', 'abc', 'combinedBaseBonus'),
+            (2 ** 40, u'https://lcp.points.com/v1/lps/123/mvs/é"\\\n', '', ''),
+            (5, MV_URL, None, 'bonus'),
+        ]
+        amounts, member_validations, pics, credit_types = [list(column) for column in zip(*rows)]
+
+        columns = bulk.PostingColumns(numpy.array(amounts, dtype=numpy.int64), member_validations,
+                                      numpy.array(pics, dtype=object), credit_types)
+
+        tools.assert_equal(4, len(columns))
+        tools.assert_equal([codec.dumps_compact(postings._create_payload(*row)) for row in rows], _payloads(columns))
+
+    def test_single_values_apply_to_every_row(self):
+        columns = bulk.PostingColumns([10, 20], numpy.array([MV_URL, MV_URL]), pic='abc', credit_type='bonus')
+
+        tools.assert_equal([codec.dumps_compact(postings._create_payload(amount, MV_URL, 'abc', 'bonus'))
+                            for amount in [10, 20]], _payloads(columns))
+        tools.assert_true(columns.has_credit_type)
+
+    def test_payloads_are_decoded_only_when_used(self):
+        columns = bulk.PostingColumns([10], [MV_URL], pic='abc')
+
+        payload = next(columns.payloads())
+
+        tools.assert_is_instance(payload, codec.JsonPayload)
+        tools.assert_equal({'amount': 10, 'memberValidation': MV_URL, 'pic': 'abc'}, payload.data)
+
+    def test_payloads_are_encoded_in_chunks(self):
+        count = 2 * bulk.CHUNK_SIZE + 1
+        columns = bulk.PostingColumns(numpy.arange(1, count + 1),
+                                      numpy.array(['{}/{}'.format(MV_URL, index) for index in range(count)]))
+
+        payloads = _payloads(columns)
+
+        tools.assert_equal(count, len(payloads))
+        tools.assert_equal(codec.dumps_compact(postings._create_payload(count, '{}/{}'.format(MV_URL, count - 1))),
+                           payloads[-1])
+
+    def test_invalid_rows_are_rejected(self):
+        for columns, message, path in [
+            (([5, 0, -1], [MV_URL] * 3), '0 is less than the minimum of 1', (1, 'amount')),
+            (([1.5], [MV_URL]), 'The column of dtype float64 is not of type integer', ('amount',)),
+            (([1, 2], numpy.array([MV_URL, None], dtype=object)), 'None is not of type string',
+             (1, 'memberValidation')),
+            (([1], numpy.array([1])), 'The column of dtype int64 is not of type string', ('memberValidation',)),
+            (([1], [MV_URL], numpy.array([5], dtype=object)), '5 is not of type string', (0, 'pic')),
+        ]:
+            yield self._assert_invalid, columns, message, path
+
+    def _assert_invalid(self, columns, message, path):
+        with tools.assert_raises(validation.ValidationError) as context:
+            bulk.PostingColumns(*columns)
+        tools.assert_equal((message, path), (context.exception.message, context.exception.path))
+
+    def test_columns_must_have_as_many_rows(self):
+        tools.assert_raises(ValueError, bulk.PostingColumns, [1, 2], [MV_URL])
+        tools.assert_raises(ValueError, bulk.PostingColumns, [[1, 2]], [MV_URL])
+
+    @mock.patch('pylcp.crud.bulk.numpy', None)
+    def test_numpy_is_required(self):
+        tools.assert_raises(ImportError, bulk.PostingColumns, [1], [MV_URL])
+
+
+class TestCreateColumns(object):
+    def setup(self):
+        self.client = api.Client('https://lcp.simulator/v1', 'KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c')
+        self.simulator = simulator.LCPSimulatorAdapter()
+        self.client.mount('https://lcp.simulator/', self.simulator)
+
+    def test_credits_are_created_for_every_row(self):
+        columns = bulk.PostingColumns(numpy.arange(1, 51), [MV_URL] * 50, pic='bonus', credit_type='base')
+
+        results = list(postings.Credit(self.client).create_columns(PATH, columns, concurrency=4))
+
+        tools.assert_equal(list(range(50)), [result.index for result in results])
+        tools.assert_equal([None] * 50, [result.error for result in results])
+        tools.assert_equal(list(range(1, 51)), [result.resource['amount'] for result in results])
+        tools.assert_equal({'bonus'}, {result.resource['pic'] for result in results})
+        tools.assert_equal(50, self.simulator.metrics.as_dict()['requests'])
+
+    def test_debits_are_created_for_every_row(self):
+        columns = bulk.PostingColumns([10, 20], [MV_URL] * 2)
+
+        results = list(postings.Debit(self.client).create_columns(PATH.replace('credits', 'debits'), columns))
+
+        tools.assert_equal([10, 20], [result.resource['amount'] for result in results])
+
+    def test_debits_do_not_have_credit_types(self):
+        columns = bulk.PostingColumns([10], [MV_URL], credit_type='base')
+
+        tools.assert_raises(ValueError, postings.Debit(self.client).create_columns, PATH, columns)
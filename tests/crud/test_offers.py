@@ -59,7 +59,8 @@ class TestOfferSetCRUD(object):
                                               recipient_details)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with('/offer-sets/', data=expected_payload, params=None)
+        self.mock_client.post.assert_called_with(
+            '/offer-sets/', data=test_base.json_payload(expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_create_offerset_without_recipient(self):
@@ -69,7 +70,8 @@ class TestOfferSetCRUD(object):
         response = self.offer_set_crud.create(self.offer_types, self.session, self.member_details)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with('/offer-sets/', data=self.expected_payload, params=None)
+        self.mock_client.post.assert_called_with(
+            '/offer-sets/', data=test_base.json_payload(self.expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_create_offer_set_with_optional_kwargs_add_top_level_params(self):
@@ -87,7 +89,8 @@ class TestOfferSetCRUD(object):
         expected_payload = copy.deepcopy(self.expected_payload)
         expected_payload.update(additional_params)
 
-        self.mock_client.post.assert_called_with('/offer-sets/', data=expected_payload, params=None)
+        self.mock_client.post.assert_called_with(
+            '/offer-sets/', data=test_base.json_payload(expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_format_payload_with_recipient(self):
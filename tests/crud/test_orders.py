@@ -30,7 +30,8 @@ class TestOrdersCRUD(object):
         response = self.orders_crud.create(self.order_type, self.data)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with('/orders/', data=self.expected_payload, params=None)
+        self.mock_client.post.assert_called_with(
+            '/orders/', data=test_base.json_payload(self.expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_create_order_with_optional_kwargs_add_top_level_params(self):
@@ -43,7 +44,7 @@ class TestOrdersCRUD(object):
         response = self.orders_crud.create(self.order_type, self.data, **self.additional_params)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with('/orders/', data=expected_payload, params=None)
+        self.mock_client.post.assert_called_with('/orders/', data=test_base.json_payload(expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_create_payload(self):
@@ -26,7 +26,7 @@ class TestPaymentAuthCRUD(object):
         response = self.payment_crud.create(self.path, test_payload)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with(self.path, data=test_payload, params=None)
+        self.mock_client.post.assert_called_with(self.path, data=test_base.json_payload(test_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
 
@@ -9,6 +9,7 @@ from nose import tools
 
 from pylcp import api
 from pylcp.crud import postings
+from pylcp.schema import validation
 from tests.crud import base as test_base
 
 
@@ -60,6 +61,12 @@ class TestPostingPayload(object):
 
         tools.assert_equal(expected_payload, payload)
 
+    def test_posting_payload_with_validate_field(self):
+        expected_payload = {"amount": AMOUNT, "memberValidation": MV_URL, 'validate': True}
+        payload = postings._create_payload(AMOUNT, MV_URL, validate=True)
+
+        tools.assert_equal(expected_payload, payload)
+
 
 class PostingTestBase(object):
     def setup(self):
@@ -76,7 +83,7 @@ class PostingTestBase(object):
         response = self.posting_crud.create(PATH, AMOUNT, MV_URL, pic=PIC)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with(PATH, data=expected_payload, params=None)
+        self.mock_client.post.assert_called_with(PATH, data=test_base.json_payload(expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_create_posting_no_pic(self):
@@ -86,7 +93,7 @@ class PostingTestBase(object):
         response = self.posting_crud.create(PATH, AMOUNT, MV_URL)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with(PATH, data=EXPECTED_PAYLOAD, params=None)
+        self.mock_client.post.assert_called_with(PATH, data=test_base.json_payload(EXPECTED_PAYLOAD), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
     def test_create_posting_with_optional_kwargs_add_top_level_params(self):
@@ -99,7 +106,7 @@ class PostingTestBase(object):
         response = self.posting_crud.create(PATH, AMOUNT, MV_URL, **ADDITIONAL_PARAMS)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with(PATH, data=expected_payload, params=None)
+        self.mock_client.post.assert_called_with(PATH, data=test_base.json_payload(expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
 
 
@@ -124,5 +131,55 @@ class TestCredit(PostingTestBase):
         response = self.posting_crud.create(PATH, AMOUNT, MV_URL, credit_type=CREDIT_TYPE)
 
         tools.assert_equal(1, self.mock_client.post.call_count)
-        self.mock_client.post.assert_called_with(PATH, data=expected_payload, params=None)
+        self.mock_client.post.assert_called_with(PATH, data=test_base.json_payload(expected_payload), params=None)
         test_base.assert_lcp_resource(mocked_response, response)
+
+
+class TestPostingValidation(object):
+    def setup(self):
+        self.mock_client = mock.create_autospec(api.Client)
+        self.mock_client.post.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+        self.mock_client.patch.return_value = test_base.mock_response(headers={}, body=test_base.SAMPLE_RESPONSE)
+
+    def test_valid_payloads_are_sent(self):
+        postings.Credit(self.mock_client, validate=True).create(PATH, AMOUNT, MV_URL, pic=PIC, credit_type=CREDIT_TYPE)
+        postings.Debit(self.mock_client, validate=True).create(PATH, AMOUNT, MV_URL, pic='')
+        postings.Debit(self.mock_client, validate=True).modify(PATH, {'status': 'success'})
+
+        tools.assert_equal(2, self.mock_client.post.call_count)
+        tools.assert_equal(1, self.mock_client.patch.call_count)
+
+    def test_invalid_payloads_are_not_sent(self):
+        credits = postings.Credit(self.mock_client, validate=True)
+        debits = postings.Debit(self.mock_client, validate=True)
+
+        tools.assert_raises(validation.ValidationError, credits.create, PATH, 0, MV_URL)
+        tools.assert_raises(validation.ValidationError, credits.create, PATH, '1000', MV_URL)
+        tools.assert_raises(validation.ValidationError, credits.create, PATH, AMOUNT, None)
+        tools.assert_raises(validation.ValidationError, debits.create, PATH, AMOUNT, MV_URL, **ADDITIONAL_PARAMS)
+        tools.assert_raises(validation.ValidationError, debits.modify, PATH, {'status': 'pending'})
+
+        tools.assert_equal(0, self.mock_client.post.call_count)
+        tools.assert_equal(0, self.mock_client.patch.call_count)
+
+    def test_validate_fields_are_sent_as_payload_fields(self):
+        postings.Credit(self.mock_client).create(PATH, AMOUNT, MV_URL, validate=True)
+
+        self.mock_client.post.assert_called_with(
+            PATH, data=test_base.json_payload(dict(EXPECTED_PAYLOAD, validate=True)), params=None)
+
+    def test_payloads_are_not_validated_by_default(self):
+        postings.Credit(self.mock_client).create(PATH, 0, MV_URL)
+        postings.Debit(self.mock_client).modify(PATH, {'status': 'pending'})
+
+        tools.assert_equal(1, self.mock_client.post.call_count)
+        tools.assert_equal(1, self.mock_client.patch.call_count)
+
+    def test_batch_results_hold_validation_errors(self):
+        credits = postings.Credit(self.mock_client, validate=True)
+
+        results = list(credits.create_many([(PATH, AMOUNT, MV_URL), (PATH, -1, MV_URL)], concurrency=2))
+
+        tools.assert_equal([None, validation.ValidationError], [type(result.error) if result.error else None
+                                                                for result in results])
+        tools.assert_equal(1, self.mock_client.post.call_count)
@@ -0,0 +1,54 @@
+"""Scripted transports shared by the client tests."""
+from pylcp import api, testing
+
+
+class ScriptedAdapter(testing.RecordingAdapter):
+    """A :class:`RecordingAdapter <pylcp.testing.RecordingAdapter>` which answers requests with scripted outcomes.
+
+    The outcomes are used in turn, one per request. Each is a
+    :class:`CannedResponse <pylcp.testing.CannedResponse>`, a status code
+    answered with an empty JSON object, or an exception which is raised.
+    """
+
+    def __init__(self, *outcomes):
+        super(ScriptedAdapter, self).__init__()
+        self.outcomes = list(outcomes)
+
+    def _canned_response(self, request):
+        with self._lock:
+            outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, testing.CannedResponse):
+            return outcome
+        return testing.CannedResponse(outcome, {})
+
+
+def scripted_client(*outcomes, **kwargs):
+    """Returns a :class:`pylcp.api.Client` for `http://lcp` whose requests are answered by a :class:`ScriptedAdapter`.
+
+    The adapter is kept as `client.adapter`.
+
+    :param outcomes: The outcomes of the requests, see :class:`ScriptedAdapter`.
+    :param kwargs: Keyword arguments passed on to the client.
+    """
+    client = api.Client('http://lcp', **kwargs)
+    client.adapter = ScriptedAdapter(*outcomes)
+    client.mount('http://', client.adapter)
+    return client
+
+
+class Clock(object):
+    """A clock for the `clock` arguments of caches and instrumentation, which reads `now`.
+
+    :param now: The time, in seconds.
+    :param tick: The seconds the clock advances by every time it is read.
+    """
+
+    def __init__(self, now=0.0, tick=0.0):
+        self.now = now
+        self.tick = tick
+
+    def __call__(self):
+        self.now += self.tick
+        return self.now
@@ -0,0 +1,73 @@
+from builtins import object
+import decimal
+
+from nose.tools import assert_raises, eq_
+
+from pylcp.schema import validation
+from pylcp.schema.postings import credit, debit
+
+ORDER_SCHEMA = {
+    'title': 'An order',
+    'type': 'object',
+    'required': ['orderType'],
+    'properties': {
+        'orderType': {'type': 'string', 'pattern': '^[A-Z]+$', 'minLength': 2, 'maxLength': 8},
+        'total': {'type': 'number', 'minimum': 0, 'maximum': 1000},
+        'note': {'type': ['string', 'null']},
+        'items': {'type': 'array', 'items': {'type': 'object', 'required': ['sku']}},
+    },
+    'additionalProperties': {'type': 'boolean'},
+}
+validate_order = validation.compile_schema(ORDER_SCHEMA)
+
+
+class TestCompileSchema(object):
+    def test_valid_documents(self):
+        for document in [
+            {'orderType': 'BUY'},
+            {'orderType': 'BUY', 'total': decimal.Decimal('10.50'), 'note': None, 'items': [{'sku': 1}]},
+            {'orderType': 'SELL', 'note': 'gift', 'giftWrap': True},
+        ]:
+            yield validate_order, document
+
+    def _assert_invalid(self, document, message, path=()):
+        with assert_raises(validation.ValidationError) as context:
+            validate_order(document)
+        eq_((message, path), (context.exception.message, context.exception.path))
+
+    def test_invalid_documents(self):
+        for document, message, path in [
+            ([], "[] is not of type object", ()),
+            ({}, "'orderType' is a required property", ()),
+            ({'orderType': 'buy'}, "'buy' does not match '^[A-Z]+$'", ('orderType',)),
+            ({'orderType': 'B'}, "'B' is shorter than 2 characters", ('orderType',)),
+            ({'orderType': 'BUYBUYBUY'}, "'BUYBUYBUY' is longer than 8 characters", ('orderType',)),
+            ({'orderType': 'BUY', 'total': -1}, "-1 is less than the minimum of 0", ('total',)),
+            ({'orderType': 'BUY', 'total': 1001}, "1001 is greater than the maximum of 1000", ('total',)),
+            ({'orderType': 'BUY', 'total': True}, "True is not of type number", ('total',)),
+            ({'orderType': 'BUY', 'note': 1}, "1 is not of type string or null", ('note',)),
+            ({'orderType': 'BUY', 'items': [{'sku': 1}, {}]}, "'sku' is a required property", ('items', 1)),
+            ({'orderType': 'BUY', 'giftWrap': 'yes'}, "'yes' is not of type boolean", ('giftWrap',)),
+        ]:
+            yield self._assert_invalid, document, message, path
+
+    def test_error_message_includes_path(self):
+        with assert_raises(validation.ValidationError) as context:
+            validate_order({'orderType': 'BUY', 'items': [{}]})
+        eq_("items.0: 'sku' is a required property", str(context.exception))
+
+    def test_unsupported_schemas_are_rejected(self):
+        assert_raises(ValueError, validation.compile_schema, {'type': 'object', 'oneOf': []})
+        assert_raises(ValueError, validation.compile_schema, {'type': 'date'})
+        assert_raises(ValueError, validation.compile_schema, {'items': {'$ref': '#/definitions/item'}})
+
+
+def test_posting_schemas():
+    validate_credit = validation.compile_schema(credit.POST_REQUEST_SCHEMA)
+    validate_credit({'amount': 1, 'memberValidation': '/lps/123/mvs/456'})
+    assert_raises(validation.ValidationError, validate_credit, {'amount': 0, 'memberValidation': '/mvs/456'})
+    assert_raises(validation.ValidationError, validate_credit, {'amount': 1.5, 'memberValidation': '/mvs/456'})
+
+    validate_patch = validation.compile_schema(debit.PATCH_REQUEST_SCHEMA)
+    validate_patch({'status': 'success'})
+    assert_raises(validation.ValidationError, validate_patch, {'status': 'failure'})
@@ -0,0 +1,165 @@
+from builtins import object
+import decimal
+import json
+import ssl
+import sys
+
+from nose.plugins.skip import SkipTest
+from nose.tools import assert_in, assert_raises, eq_
+import mock
+import requests
+
+if sys.version_info < (3, 5):
+    raise SkipTest('asyncio support requires Python 3.5+')
+try:
+    import asyncio
+
+    from aiohttp import test_utils, web
+
+    from pylcp import aio, codec
+    from tests import aio_helpers
+except ImportError:
+    raise SkipTest('asyncio support requires aiohttp')
+
+
+class TestAsyncClient(object):
+
+    def setup(self):
+        self.loop = asyncio.new_event_loop()
+        app = web.Application()
+        app.router.add_route('*', '/v1/missing', aio_helpers.not_found)
+        app.router.add_route('*', '/v1/loop', aio_helpers.redirect_loop)
+        app.router.add_route('*', '/{tail:.*}', aio_helpers.echo)
+        self.server = test_utils.TestServer(app)
+        self.loop.run_until_complete(self.server.start_server())
+        self.base_url = str(self.server.make_url('/v1'))
+        self.client = aio.AsyncClient(self.base_url)
+
+    def teardown(self):
+        self.loop.run_until_complete(self.client.close())
+        self.loop.run_until_complete(self.server.close())
+        self.loop.close()
+
+    def _run(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_request_adds_base_url_to_relative_urls(self):
+        response = self._run(self.client.get('/some/path'))
+        eq_('/v1/some/path', response.headers['X-Path'])
+        eq_(self.base_url + '/some/path', response.request.url)
+
+    def test_request_does_not_alter_absolute_urls(self):
+        url = str(self.server.make_url('/absolute'))
+        response = self._run(self.client.get(url))
+        eq_('/absolute', response.headers['X-Path'])
+
+    def test_query_params_are_sent(self):
+        response = self._run(self.client.get('/url', params={'paramName': 'param_value'}))
+        eq_('/v1/url?paramName=param_value', response.headers['X-Path'])
+
+    def test_post_issues_a_POST_request_with_json_content_type(self):
+        response = self._run(self.client.post('/url', data='{"answer": 42}'))
+        eq_('POST', response.headers['X-Method'])
+        eq_('application/json', response.headers['X-Content-Type'])
+        eq_({'answer': 42}, response.json())
+
+    def test_response_json_parses_float_as_decimal(self):
+        response = self._run(self.client.get('/url'))
+        eq_(decimal.Decimal('1.2'), response.json()['number'])
+
+    def test_response_is_a_json_response_wrapper(self):
+        response = self._run(self.client.get('/url'))
+        assert isinstance(response, aio.api.JsonResponseWrapper)
+        assert response
+        eq_(200, response.status_code)
+        eq_('OK', response.reason)
+
+    def test_error_responses_raise_for_status(self):
+        response = self._run(self.client.get('/missing'))
+        eq_(404, response.status_code)
+        with assert_raises(requests.HTTPError):
+            response.raise_for_status()
+
+    @mock.patch('pylcp.api.generate_authorization_header_value', return_value='auth_value')
+    def test_specifying_key_id_causes_Authorization_header_to_be_set(self, auth_header_mock):
+        client = aio.AsyncClient(self.base_url, 'foobar', 'secret')
+        try:
+            response = self._run(client.post('/url', data='{}'))
+        finally:
+            self._run(client.close())
+        eq_('auth_value', response.headers['X-Authorization'])
+        eq_(auth_header_mock.call_args[0][:2], ('POST', self.base_url + '/url'))
+
+    def test_request_and_response_are_logged(self):
+        with mock.patch('pylcp.api.request_logger') as request_logger_mock:
+            with mock.patch('pylcp.api.response_logger') as response_logger_mock:
+                request_logger_mock.isEnabledFor.return_value = True
+                response_logger_mock.isEnabledFor.return_value = True
+                self.client.api_logger.request_logger = request_logger_mock
+                self.client.api_logger.response_logger = response_logger_mock
+
+                self._run(self.client.post('/url', data=json.dumps({'answer': 42})))
+
+                log_format_dict = request_logger_mock.debug.call_args_list[0][0][1]
+                eq_(self.base_url + '/url', log_format_dict['url'])
+                eq_({'answer': 42}, json.loads(log_format_dict['body']))
+                log_format_dict = response_logger_mock.debug.call_args_list[0][0][1]
+                eq_({'answer': 42}, json.loads(log_format_dict['body']))
+                assert_in('Content-Type: application/json', log_format_dict['headers'])
+
+    def test_json_codec_is_used_for_responses(self):
+        json_codec = mock.Mock(spec=codec.SimpleJSONCodec, wraps=codec.SimpleJSONCodec())
+        client = aio.AsyncClient(self.base_url, json_codec=json_codec)
+        try:
+            eq_({'answer': 42}, self._run(client.post('/url', data='{"answer": 42}')).json())
+        finally:
+            self._run(client.close())
+        json_codec.loads.assert_called_with(b'{"answer": 42}')
+        assert client.api_logger.json_codec is json_codec
+
+    def test_many_requests_can_be_in_flight(self):
+        requests_in_flight = [self.client.get('/item/{}'.format(i)) for i in range(50)]
+        responses = self._run(aio_helpers.gather(*requests_in_flight))
+        eq_(['/v1/item/{}'.format(i) for i in range(50)], [r.headers['X-Path'] for r in responses])
+
+    def test_connection_errors_are_raised_as_requests_errors(self):
+        client = aio.AsyncClient('http://127.0.0.1:1')
+        try:
+            with assert_raises(requests.ConnectionError):
+                self._run(client.get('/url'))
+        finally:
+            self._run(client.close())
+
+    def test_other_client_errors_are_raised_as_requests_errors(self):
+        with assert_raises(requests.RequestException) as context:
+            self._run(self.client.get('/loop'))
+        eq_(self.base_url + '/loop', context.exception.request.url)
+
+    def test_streamed_bodies_are_sent_whole(self):
+        response = self._run(self.client.post('/url', data=(chunk for chunk in [b'{"answer"', u': 42}'])))
+        eq_({'answer': 42}, response.json())
+
+    def test_proxies_are_used(self):
+        with assert_raises(requests.ConnectionError):
+            self._run(self.client.get('/url', proxies={'http': 'http://127.0.0.1:1'}))
+
+    def test_unsupported_arguments_raise(self):
+        with assert_raises(TypeError):
+            self._run(self.client.get('/url', stream=True))
+        with assert_raises(TypeError):
+            self._run(self.client.get('/url', unknown=True))
+
+
+def test_ssl_option():
+    eq_(None, aio._ssl_option(True, None))
+    context = aio._ssl_option(False, None)
+    eq_((False, ssl.CERT_NONE), (context.check_hostname, context.verify_mode))
+    with assert_raises(IOError):
+        aio._ssl_option('/no/such/ca-bundle.pem', None)
+    with assert_raises(IOError):
+        aio._ssl_option(True, ('/no/such/cert.pem', '/no/such/key.pem'))
+
+
+def test_logger_gets_reference_to_loggable_types_when_client_instantiated():
+    client = aio.AsyncClient("http://localhost:8080/", loggable_content_types=['application/json'])
+    eq_(client.api_logger.loggable_content_types, ['application/json'])
@@ -1,18 +1,22 @@
 from builtins import object
 import collections
 import decimal
+import io
 try:
     from http.client import OK
 except ImportError:
     from httplib import OK
 import json
 import logging
+import threading
+import time
 
-from nose.tools import assert_in, assert_is_none, assert_raises, eq_
+from nose.tools import assert_in, assert_is_none, assert_not_in, assert_raises, eq_
 import mock
 import requests
 
-from pylcp import api, testing
+from pylcp import api, codec, mac, redaction, testing
+from pylcp.crud import base as crud
 
 
 class APILoggerTestBase(object):
@@ -84,6 +88,39 @@ class TestJsonPrettifying(APILoggerTestBase):
         mock_response.headers = {'Content-Type': 'text/plain'}
         eq_(mock_response.text, self.api_logger.prettify_alleged_json(mock_response))
 
+    def test_response_json_is_masked(self):
+        mock_response = mock.Mock()
+        mock_response.text = '{"billingInfo": {"cardNumber": "4111111111111111"}, "password": "secret"}'
+        mock_response.headers = {'Content-Type': 'application/json'}
+        eq_({'billingInfo': {'cardNumber': 'XXXXXXXXXXXX1111'}, 'password': 'XXX'},
+            json.loads(self.api_logger.prettify_alleged_json(mock_response)))
+
+    def test_bodies_are_not_logged_when_a_masker_raises(self):
+        body = '{"billingInfo": {"cardNumber": "123", "securityCode": "999"}, "password": "secret"}'
+        mock_response = mock.Mock()
+        mock_response.text = body
+        mock_response.headers = {'Content-Type': 'application/json'}
+        request = requests.Request('POST', 'https://lcp.points.com/v1/orders', data=body,
+                                   headers={'Content-Type': 'application/json'}).prepare()
+
+        for logged in [self.api_logger.prettify_alleged_json(mock_response),
+                       self.api_logger.get_masked_and_formatted_request_body(request)]:
+            eq_(api.UNLOGGABLE_BODY, logged)
+
+    def test_streamed_request_bodies_are_logged_from_their_chunks(self):
+        request = requests.Request('POST', 'https://lcp.points.com/v1/orders', headers={
+            'Content-Type': 'application/json'}, data=(chunk for chunk in [b'{"password"', u': "secret"}'])).prepare()
+        request.body = mac.replayable_body(request.body)
+        logged = self.api_logger.get_masked_and_formatted_request_body(request)
+        eq_({'password': 'XXX'}, json.loads(logged))
+
+    def test_payloads_are_logged_as_sent_after_their_data_changes(self):
+        data = {'amount': 10}
+        request = requests.Request('POST', 'https://lcp.points.com/v1/credits', headers={
+            'Content-Type': 'application/json'}, data=codec.encode_payload(data)).prepare()
+        data['amount'] = 20
+        eq_({'amount': 10}, json.loads(self.api_logger.get_masked_and_formatted_request_body(request)))
+
     def test_content_not_logged_when_type_not_in_loggable_types(self):
         mock_response = mock.Mock()
         mock_response.text = 'blah'
@@ -92,6 +129,58 @@ class TestJsonPrettifying(APILoggerTestBase):
             self.api_logger.prettify_alleged_json(mock_response))
 
 
+class TestJsonResponseWrapper(object):
+
+    def _wrapper(self, content):
+        response = requests.Response()
+        response._content = content
+        response.status_code = OK
+        return api.JsonResponseWrapper(response)
+
+    def test_json_parses_numbers_as_decimal(self):
+        eq_({'amount': decimal.Decimal('20.11')}, self._wrapper(b'{"amount": 20.11}').json())
+
+    def test_json_is_parsed_once(self):
+        wrapper = self._wrapper(b'{"answer": 42}')
+        assert wrapper.json() is wrapper.json()
+        eq_(1, wrapper.json_parse_count)
+
+    def test_json_errors_are_raised_without_parsing_again(self):
+        wrapper = self._wrapper(b'This is not JSON')
+        for _ in range(2):
+            with assert_raises(ValueError):
+                wrapper.json()
+        eq_(1, wrapper.json_parse_count)
+
+    def test_concurrent_callers_share_one_parse(self):
+        class SlowCodec(codec.SimpleJSONCodec):
+            def loads(self, s):
+                time.sleep(0.05)
+                return super(SlowCodec, self).loads(s)
+        response = requests.Response()
+        response._content = b'{"answer": 42}'
+        wrapper = api.JsonResponseWrapper(response, SlowCodec())
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(wrapper.json())) for _ in range(8)]
+
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        eq_([{'answer': 42}] * 8, results)
+        eq_(1, wrapper.json_parse_count)
+
+    def test_prettify_alleged_json_shares_the_parsed_body(self):
+        wrapper = self._wrapper(b'{"amount": 20.11, "password": "secret"}')
+        wrapper.headers['Content-Type'] = 'application/json'
+        api_logger = api.APILogger(mock.MagicMock(), mock.MagicMock())
+
+        eq_('{\n  "amount": 20.11,\n  "password": "XXX"\n}', api_logger.prettify_alleged_json(wrapper))
+        eq_({'amount': decimal.Decimal('20.11'), 'password': 'secret'}, wrapper.json())
+        eq_(1, wrapper.json_parse_count)
+
+
 class TestCreditCardDataMasking(object):
 
     def test_none_is_not_masked(self):
@@ -244,6 +333,28 @@ class TestSensitiveDataMasking(APILoggerTestBase):
         eq_(data['billingInfo']['cardNumber'], "4111111111111111")
         eq_(data['billingInfo']['securityCode'], "123")
 
+    def test_mask_sensitive_data_shares_unmasked_data(self):
+        data = {
+            'billingInfo': {'cardNumber': '4111111111111111', 'address': {'state': 'ON'}},
+            'orderItems': [{'amount': 1000}],
+        }
+        with mock.patch('copy.deepcopy') as deepcopy_mock:
+            masked_data = self.api_logger.mask_sensitive_data(data)
+
+        eq_([], deepcopy_mock.call_args_list)
+        assert masked_data is not data
+        assert masked_data['billingInfo'] is not data['billingInfo']
+        assert masked_data['billingInfo']['address'] is data['billingInfo']['address']
+        assert masked_data['orderItems'] is data['orderItems']
+
+    def test_data_without_sensitive_fields_is_returned_as_is(self):
+        data = {'billingInfo': {'cardType': 'VISA'}, 'language': 'Python'}
+        assert self.api_logger.mask_sensitive_data(data) is data
+
+    def test_non_dict_data_is_returned_as_is(self):
+        data = [{'password': 'secret'}]
+        assert self.api_logger.mask_sensitive_data(data) is data
+
 
 class TestMaskingAndFormattingOfRequestBody(APILoggerTestBase):
     def setup(self):
@@ -288,6 +399,146 @@ class TestMaskingAndFormattingOfRequestBody(APILoggerTestBase):
             self.api_logger.get_masked_and_formatted_request_body(self.request))
 
 
+class TestBackgroundAPILogger(object):
+
+    def setup(self):
+        self.request_logger = mock.MagicMock()
+        self.response_logger = mock.MagicMock()
+        self.request = requests.Request(
+            'POST', 'http://baseurl/url', headers={'Content-Type': 'application/json'},
+            data=json.dumps({'password': 'secret'})).prepare()
+
+    def _api_logger(self, **kwargs):
+        return api.BackgroundAPILogger(self.request_logger, self.response_logger, **kwargs)
+
+    def _block_writes(self):
+        """Makes the worker block on the first message until the returned event is set."""
+        writing = threading.Event()
+        release = threading.Event()
+
+        def wait(*args):
+            writing.set()
+            release.wait(5)
+        self.request_logger.debug.side_effect = wait
+        return writing, release
+
+    def test_request_is_formatted_and_masked_in_the_background(self):
+        api_logger = self._api_logger()
+        api_logger.log_request(self.request)
+        api_logger.flush()
+
+        log_format_dict = self.request_logger.debug.call_args[0][1]
+        eq_('http://baseurl/url', log_format_dict['url'])
+        eq_({'password': 'XXX'}, json.loads(log_format_dict['body']))
+        assert api_logger._worker is not threading.current_thread()
+
+    def test_request_is_captured_when_logged(self):
+        api_logger = self._api_logger()
+        writing, release = self._block_writes()
+        api_logger.log_request(self.request)
+        writing.wait(5)
+        api_logger.log_request(self.request)
+        self.request.headers['Authorization'] = 'changed'
+        release.set()
+        api_logger.flush()
+
+        assert_not_in('Authorization', self.request_logger.debug.call_args[0][1]['headers'])
+
+    def test_response_is_logged_in_the_background(self):
+        api_logger = self._api_logger()
+        response = mock.Mock(status_code=OK, reason='OK', text='{"a": 1}', headers={'Content-Type': 'text/plain'})
+        api_logger.log_response(response)
+        api_logger.flush()
+
+        eq_(OK, self.response_logger.debug.call_args[0][1]['status_code'])
+
+    def test_nothing_is_queued_if_not_debug_level(self):
+        self.request_logger.isEnabledFor.return_value = False
+        api_logger = self._api_logger()
+        api_logger.log_request(self.request)
+        eq_(0, api_logger.queue.qsize())
+        assert_is_none(api_logger._worker)
+
+    def test_newest_message_is_dropped_when_queue_is_full(self):
+        api_logger = self._api_logger(queue_size=1)
+        writing, release = self._block_writes()
+        api_logger.log_request(self.request)
+        writing.wait(5)
+        self.request.method = 'PUT'
+        api_logger.log_request(self.request)
+        self.request.method = 'PATCH'
+        api_logger.log_request(self.request)
+        release.set()
+        api_logger.flush()
+
+        eq_(1, api_logger.dropped)
+        eq_(['POST', 'PUT'], [c[0][1]['method'] for c in self.request_logger.debug.call_args_list])
+
+    def test_oldest_message_is_dropped_when_queue_is_full(self):
+        api_logger = self._api_logger(queue_size=1, drop_policy=api.BackgroundAPILogger.DROP_OLDEST)
+        writing, release = self._block_writes()
+        api_logger.log_request(self.request)
+        writing.wait(5)
+        self.request.method = 'PUT'
+        api_logger.log_request(self.request)
+        self.request.method = 'PATCH'
+        api_logger.log_request(self.request)
+        release.set()
+        api_logger.flush()
+
+        eq_(1, api_logger.dropped)
+        eq_(['POST', 'PATCH'], [c[0][1]['method'] for c in self.request_logger.debug.call_args_list])
+
+    def test_new_message_is_counted_when_it_cannot_replace_the_oldest(self):
+        api_logger = self._api_logger(queue_size=1, drop_policy=api.BackgroundAPILogger.DROP_OLDEST)
+        writing, release = self._block_writes()
+        api_logger.log_request(self.request)
+        writing.wait(5)
+        api_logger.log_request(self.request)
+        # Another thread fills the queue again between the oldest message being dropped and the new one being queued
+        with mock.patch.object(api_logger.queue, 'put_nowait', side_effect=api.queue.Full):
+            api_logger.log_request(self.request)
+        release.set()
+        api_logger.flush()
+
+        eq_(2, api_logger.dropped)
+        eq_(1, self.request_logger.debug.call_count)
+
+    def test_streamed_responses_are_logged_by_the_caller(self):
+        api_logger = self._api_logger()
+        response = requests.Response()
+        response.status_code, response.reason, response.raw = OK, 'OK', io.BytesIO(b'{"a": 1}')
+        response.headers['Content-Type'] = 'application/json'
+        api_logger.log_response(response)
+
+        eq_({'a': 1}, json.loads(self.response_logger.debug.call_args[0][1]['body']))
+        assert_is_none(api_logger._worker)
+        eq_([b'{"a": 1}'], list(response.iter_content(100)))
+
+    def test_errors_while_logging_do_not_stop_the_worker(self):
+        api_logger = self._api_logger()
+        self.request_logger.debug.side_effect = [ValueError('boom'), None]
+        api_logger.log_request(self.request)
+        api_logger.log_request(self.request)
+        api_logger.flush()
+
+        eq_(2, self.request_logger.debug.call_count)
+
+    def test_unknown_drop_policy_raises(self):
+        with assert_raises(ValueError):
+            self._api_logger(drop_policy='drop_everything')
+
+    def test_client_uses_given_api_logger(self):
+        api_logger = self._api_logger()
+        client = api.Client('http://baseurl', api_logger=api_logger)
+        client.mount('http://', testing.MockRequestAdapter())
+        client.post('/url', data='{}')
+        api_logger.flush()
+
+        eq_(1, self.request_logger.debug.call_count)
+        eq_(1, self.response_logger.debug.call_count)
+
+
 class TestApiClient(object):
 
     def setup(self):
@@ -344,6 +595,47 @@ class TestApiClient(object):
         response = self.client.get('/', data='{"number": 1.2}')
         eq_(response.json()['number'], decimal.Decimal('1.2'))
 
+    def test_response_body_is_parsed_once_when_logged_and_read(self):
+        with mock.patch.object(self.client.api_logger, 'response_logger') as response_logger_mock:
+            response_logger_mock.isEnabledFor.return_value = True
+            resource = crud.LCPCrud(self.client).create('/url', '{"number": 1.2}')
+
+        eq_(decimal.Decimal('1.2'), resource['number'])
+        eq_(decimal.Decimal('1.2'), resource.json['number'])
+        assert_in('"number": 1.2', response_logger_mock.debug.call_args[0][1]['body'])
+        eq_(1, resource.response.json_parse_count)
+
+    def test_crud_payload_is_encoded_once_for_signing_logging_and_sending(self):
+        client, adapter = self._get_client_and_adapter(
+            base_url='http://BASEURL', key_id='KEY_ID', shared_secret='3b11b03d1a9f4a0ca04fdede4ae30a1c')
+        payload = {'amount': decimal.Decimal('10.50'), 'password': 'secret'}
+        with mock.patch('pylcp.mac.generate_ext', wraps=mac.generate_ext) as ext_mock, \
+                mock.patch('pylcp.api.json') as json_mock, \
+                mock.patch.object(client.api_logger, 'request_logger') as request_logger_mock:
+            request_logger_mock.isEnabledFor.return_value = True
+            json_mock.loads.side_effect = AssertionError('payload decoded')
+            crud.LCPCrud(client).create('/url', payload)
+
+        body = adapter.last_request.body
+        eq_(b'{"amount":10.50,"password":"secret"}', body)
+        assert ext_mock.call_args[0][1] is body
+        assert body.data is payload
+        assert_in('"password": "XXX"', request_logger_mock.debug.call_args[0][1]['body'])
+
+    def test_json_codec_is_used_for_responses_payloads_and_logging(self):
+        json_codec = mock.Mock(spec=codec.SimpleJSONCodec, wraps=codec.SimpleJSONCodec())
+        client, adapter = self._get_client_and_adapter(base_url='http://BASEURL', json_codec=json_codec)
+        with mock.patch.object(client.api_logger, 'request_logger') as request_logger_mock:
+            request_logger_mock.isEnabledFor.return_value = True
+            resource = crud.LCPCrud(client).create('/url', {'amount': decimal.Decimal('1.10')})
+
+        eq_(decimal.Decimal('1.10'), resource['amount'])
+        json_codec.dumps.assert_called_once_with({'amount': decimal.Decimal('1.10')})
+        # The logged payload, then the response
+        eq_([mock.call(b'{"amount":1.10}')] * 2, json_codec.loads.call_args_list)
+        json_codec.pretty_dumps.assert_any_call({'amount': decimal.Decimal('1.10')})
+        assert client.api_logger.json_codec is json_codec
+
     def test_request_does_not_alter_absolute_urls(self):
         for absolute_url in ['http://www.points.com/', 'https://www.points.com/']:
             yield self._assert_calls_requests_with_url, absolute_url, absolute_url
@@ -512,6 +804,18 @@ class TestApiClient(object):
         self.assert_loggers_called(log_data)
 
 
+def test_logger_uses_redaction_rules_given_to_client():
+    rules = redaction.RedactionRules(key_patterns={'(?i).*email': redaction.mask_all})
+    client = api.Client("http://localhost:8080/", redaction_rules=rules)
+    eq_({'memberEmail': 'XXX', 'password': 'secret'},
+        client.api_logger.mask_sensitive_data({'memberEmail': 'frank@example.com', 'password': 'secret'}))
+
+
+def test_logger_uses_default_redaction_rules():
+    client = api.Client("http://localhost:8080/")
+    assert client.api_logger.redaction_rules is api.DEFAULT_REDACTION_RULES
+
+
 def test_logger_gets_reference_to_loggable_types_when_client_instantiated():
     client = api.Client(
         "http://localhost:8080/",
@@ -519,3 +823,40 @@ def test_logger_gets_reference_to_loggable_types_when_client_instantiated():
         "3b11b03d1a9f4a0ca04fdede4ae30a1c",
         ['application/json'])
     eq_(client.api_logger.loggable_content_types, ['application/json'])
+
+
+class TestMACAuth(object):
+
+    def _signed_request(self, auth):
+        request = requests.Request('POST', 'http://localhost/url', headers={'Content-Type': 'application/json'},
+                                   data='{}').prepare()
+        return auth(request)
+
+    def test_authorization_header_is_signed_with_shared_secret(self):
+        request = self._signed_request(api.MACAuth('KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c'))
+        assert_in('MAC id="KEY_ID"', request.headers['Authorization'])
+
+    @mock.patch('pylcp.api.MACSigner')
+    def test_signer_is_reused_across_requests(self, signer_mock):
+        signer_mock.return_value.mac_key = 'SECRET'
+        auth = api.MACAuth('KEY_ID', 'SECRET')
+        with mock.patch('pylcp.api.generate_authorization_header_value') as header_mock:
+            self._signed_request(auth)
+            self._signed_request(auth)
+        eq_(signer_mock.call_args_list, [mock.call('SECRET')])
+        eq_([signer_mock.return_value] * 2, [c[0][3] for c in header_mock.call_args_list])
+
+    def test_generator_bodies_are_hashed_and_kept_for_sending(self):
+        request = requests.Request('POST', 'http://localhost/url', headers={'Content-Type': 'application/json'},
+                                   data=(chunk for chunk in [b'{"amount"', b': 1000}'])).prepare()
+        request = api.MACAuth('KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c')(request)
+        eq_([b'{"amount"', b': 1000}'], request.body)
+        ext = mac.generate_ext('application/json', b'{"amount": 1000}')
+        assert_in('ext="{}"'.format(ext), request.headers['Authorization'])
+
+    def test_signer_follows_changes_to_shared_secret(self):
+        auth = api.MACAuth('KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c')
+        first_signer = auth.signer
+        auth.shared_secret = 'a85751701d4d4127a17edb34a15317a0'
+        eq_('a85751701d4d4127a17edb34a15317a0', auth.signer.mac_key)
+        assert first_signer is not auth.signer
@@ -0,0 +1,158 @@
+from builtins import object
+
+from nose.tools import eq_
+from requests import auth, models
+
+from pylcp import api, cache
+from pylcp.crud import loyalty_program
+from pylcp.testing import CannedResponse
+from tests import helpers
+
+
+class TestClientResponseCache(object):
+    def setup(self):
+        self.clock = helpers.Clock(1000.0)
+        self.cache = cache.ResponseCache(clock=self.clock)
+
+    def _client(self, *outcomes):
+        return helpers.scripted_client(*outcomes, key_id='KEY_ID', shared_secret='3b11b03d1a9f4a0ca04fdede4ae30a1c',
+                                       response_cache=self.cache)
+
+    def test_fresh_responses_are_served_without_a_request(self):
+        client = self._client(CannedResponse(200, b'{"name": "LP"}', {'Cache-Control': 'max-age=60'}))
+
+        lps = loyalty_program.LoyaltyProgram(client)
+        eq_('LP', lps.read('lp1')['name'])
+        eq_('LP', lps.read('lp1')['name'])
+
+        eq_(1, len(client.adapter.requests))
+        eq_({'hits': 1, 'misses': 1, 'revalidations': 0, 'evictions': 0, 'entries': 1,
+             'bytes': self.cache.size}, self.cache.stats())
+
+    def test_cached_responses_can_be_iterated_and_closed(self):
+        client = self._client(CannedResponse(200, b'{"name": "LP"}', {'Cache-Control': 'max-age=60'}))
+        client.get('/lps/lp1')
+        response = client.get('/lps/lp1')
+
+        eq_([b'{"name": "LP"}'], list(response.iter_content(100)))
+        eq_([b'{"name": "LP"}'], list(response.iter_lines()))
+        response.close()
+        eq_(1, len(client.adapter.requests))
+
+    def test_stale_responses_are_revalidated(self):
+        client = self._client(
+            CannedResponse(200, b'{"name": "LP"}', {'Cache-Control': 'max-age=60', 'ETag': '"v1"'}),
+            CannedResponse(304, b'', {'Cache-Control': 'max-age=120', 'ETag': '"v1"'}),
+        )
+        client.get('/lps/lp1')
+        self.clock.now += 61
+
+        response = client.get('/lps/lp1')
+
+        eq_(200, response.status_code)
+        eq_({'name': 'LP'}, response.json())
+        eq_('"v1"', client.adapter.requests[1].headers['If-None-Match'])
+        assert 'Authorization' in client.adapter.requests[1].headers
+        self.clock.now += 119
+        client.get('/lps/lp1')
+        eq_(2, len(client.adapter.requests))
+        eq_(1, self.cache.stats()['revalidations'])
+
+    def test_changed_responses_replace_cached_responses(self):
+        client = self._client(
+            CannedResponse(200, b'{"version": 1}', {'Last-Modified': 'Mon, 01 Feb 2016 00:00:00 GMT'}),
+            CannedResponse(200, b'{"version": 2}', {'Last-Modified': 'Tue, 02 Feb 2016 00:00:00 GMT'}),
+            CannedResponse(304),
+        )
+        client.get('/lps/lp1')
+
+        eq_({'version': 2}, client.get('/lps/lp1').json())
+        eq_({'version': 2}, client.get('/lps/lp1').json())
+        eq_('Tue, 02 Feb 2016 00:00:00 GMT', client.adapter.requests[2].headers['If-Modified-Since'])
+
+    def test_uncacheable_responses_are_not_cached(self):
+        client = self._client(
+            CannedResponse(200, b'{}', {'Cache-Control': 'no-store', 'ETag': '"v1"'}),
+            CannedResponse(200, b'{}'),
+            CannedResponse(404, b'{}', {'Cache-Control': 'max-age=60'}),
+        )
+        for _ in range(3):
+            client.get('/lps/lp1')
+        eq_(0, len(self.cache))
+        assert 'If-None-Match' not in client.adapter.requests[1].headers
+
+    def test_other_methods_are_not_cached(self):
+        client = self._client(CannedResponse(201, b'{}', {'Cache-Control': 'max-age=60'}), CannedResponse(200, b'{}'))
+        client.post('/lps', data='{}')
+        eq_(0, len(self.cache))
+        eq_(0, self.cache.stats()['misses'])
+
+    def test_responses_are_cached_per_credentials(self):
+        client = self._client(CannedResponse(200, b'{}', {'Cache-Control': 'max-age=60'}), CannedResponse(200, b'{}'))
+        client.get('/lps/lp1')
+        client.key_id = 'OTHER_KEY_ID'
+        client.get('/lps/lp1')
+        eq_(2, len(client.adapter.requests))
+
+    def test_responses_are_cached_per_request_credentials(self):
+        client = self._client(*[CannedResponse(200, b'{}', {'Cache-Control': 'max-age=60'})] * 2)
+        for _ in range(2):
+            client.get('/lps/lp1')
+            client.get('/lps/lp1', auth=api.MACAuth('OTHER_KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c'))
+        eq_(2, len(client.adapter.requests))
+        eq_(2, len(self.cache))
+
+    def test_requests_with_other_credentials_are_not_cached(self):
+        client = self._client(*[CannedResponse(200, b'{}', {'Cache-Control': 'max-age=60'})] * 2)
+        for _ in range(2):
+            client.get('/lps/lp1', auth=auth.HTTPBasicAuth('user', 'password'))
+        eq_(2, len(client.adapter.requests))
+        eq_(0, len(self.cache))
+
+    def test_responses_are_cached_per_request_headers(self):
+        client = self._client(
+            *[CannedResponse(200, b'{}', {'Cache-Control': 'max-age=60', 'Vary': 'Accept-Language'})] * 2)
+        for _ in range(2):
+            client.get('/lps/lp1', headers={'Accept-Language': 'en'})
+            client.get('/lps/lp1', headers={'Accept-Language': 'fr'})
+        eq_(['en', 'fr'], [request.headers['Accept-Language'] for request in client.adapter.requests])
+
+    def test_responses_varying_with_anything_are_not_cached(self):
+        client = self._client(*[CannedResponse(200, b'{}', {'Cache-Control': 'max-age=60', 'Vary': '*'})] * 2)
+        client.get('/lps/lp1')
+        client.get('/lps/lp1')
+        eq_(2, len(client.adapter.requests))
+
+
+class TestResponseCacheEviction(object):
+    def _response(self, body):
+        response = models.Response()
+        response.status_code = 200
+        response.headers = {'Cache-Control': 'max-age=60'}
+        response._content = body
+        return response
+
+    def test_least_recently_used_entries_are_evicted(self):
+        response_cache = cache.ResponseCache(max_entries=2)
+        response_cache.store('a', self._response(b'a'))
+        response_cache.store('b', self._response(b'b'))
+        response_cache.get('a')
+        response_cache.store('c', self._response(b'c'))
+
+        eq_(None, response_cache.get('b'))
+        eq_(b'a', response_cache.get('a').content)
+        eq_(1, response_cache.stats()['evictions'])
+
+    def test_total_size_is_capped(self):
+        entry_size = cache.CacheEntry(self._response(b'x' * 100), 0).size
+        response_cache = cache.ResponseCache(max_bytes=2 * entry_size + 10)
+        for key in 'abc':
+            response_cache.store(key, self._response(b'x' * 100))
+        response_cache.store('too large', self._response(b'x' * 1000))
+
+        eq_(['b', 'c'], [key for key in 'abc' if response_cache.get(key)])
+        eq_(2 * entry_size, response_cache.stats()['bytes'])
+
+    def test_cache_control_parsing(self):
+        eq_({'max-age': '60', 'no-cache': None, 'private': None},
+            cache._cache_control({'Cache-Control': 'private, max-age="60" ,No-Cache'}))
@@ -0,0 +1,166 @@
+from builtins import object, range
+import io
+import os
+import shutil
+import tempfile
+import threading
+
+from nose.tools import assert_raises, eq_
+
+from pylcp import api, cassette, simulator
+from pylcp.crud import orders
+
+BASE_URL = 'https://lcp.simulator/v1'
+KEY_ID = 'KEY_ID'
+MAC_KEY = '3b11b03d1a9f4a0ca04fdede4ae30a1c'
+
+
+def test_normalize_path():
+    for url, expected in [
+        ('https://lcp.points.com/v1/orders/', '/v1/orders'),
+        ('https://lcp.points.com/v1//orders', '/v1/orders'),
+        ('https://lcp.points.com/', '/'),
+        ('https://lcp.points.com/v1/orders/?offset=10&limit=5&q=', '/v1/orders?limit=5&offset=10&q='),
+    ]:
+        yield eq_, expected, cassette.normalize_path(url)
+
+
+def test_body_hash():
+    eq_(cassette.body_hash(None), cassette.body_hash(b''))
+    eq_(cassette.body_hash(b'{"a": 1}'), cassette.body_hash(u'{"a": 1}'))
+    eq_(cassette.body_hash(b'{"a": 1}'), cassette.body_hash([b'{"a"', u': 1}']))
+    assert cassette.body_hash(b'{"a": 1}') != cassette.body_hash(b'{"a": 2}')
+
+
+class TestCassette(object):
+    def setup(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'lcp.cassette')
+        self.replayers = []
+
+    def teardown(self):
+        for replayer in self.replayers:
+            replayer.close()
+        shutil.rmtree(self.directory)
+
+    def _client(self):
+        return api.Client(BASE_URL, KEY_ID, MAC_KEY)
+
+    def _record(self, function):
+        client = self._client()
+        recorder = cassette.CassetteRecorder(self.path, simulator.LCPSimulatorAdapter(mac_keys={KEY_ID: MAC_KEY}))
+        client.mount('https://', recorder)
+        try:
+            return function(client)
+        finally:
+            recorder.close()
+
+    def _replayer(self, **kwargs):
+        client = self._client()
+        replayer = cassette.CassetteReplayer(self.path, **kwargs)
+        client.mount('https://', replayer)
+        self.replayers.append(replayer)
+        return client, replayer
+
+    def test_recorded_interactions_are_replayed(self):
+        def scenario(client):
+            order = orders.Order(client).create('BUY', {'amount': 10})
+            return [order.json, client.get(order.url).json(), client.get('/lps/missing').status_code]
+        recorded = self._record(scenario)
+
+        client, replayer = self._replayer()
+        eq_(3, len(replayer))
+        eq_(recorded, scenario(client))
+
+    def test_authorization_headers_are_not_recorded_or_matched(self):
+        self._record(lambda client: client.get('/lps/lp1'))
+
+        with io.open(self.path, 'rb') as cassette_file:
+            contents = cassette_file.read()
+        assert b'Authorization' not in contents and MAC_KEY.encode('ascii') not in contents
+
+        client, _ = self._replayer()
+        client.key_id, client.shared_secret = 'OTHER', 'other'
+        eq_('lp1', client.get(BASE_URL + '/lps/lp1/').json()['id'])
+
+    def test_interactions_are_replayed_in_order_then_the_last_repeated(self):
+        def scenario(client):
+            order = orders.Order(client).create('BUY', {})
+            before = client.get(order.url).json()['status']
+            client.patch(order.url, json={'status': 'cancelled'})
+            return order.url, before, client.get(order.url).json()['status']
+        order_url, before, after = self._record(scenario)
+
+        client, replayer = self._replayer()
+        orders.Order(client).create('BUY', {})
+        eq_([before, after, after], [client.get(order_url).json()['status'] for _ in range(3)])
+        replayer.rewind()
+        eq_(before, client.get(order_url).json()['status'])
+
+    def test_requests_are_matched_by_body(self):
+        self._record(lambda client: client.post('/orders/', json={'orderType': 'BUY', 'data': {}}))
+
+        client, _ = self._replayer()
+        with assert_raises(cassette.CassetteError):
+            client.post('/orders/', json={'orderType': 'SELL', 'data': {}})
+        with assert_raises(cassette.CassetteError):
+            client.get('/orders/')
+
+        client, _ = self._replayer(match_body=False)
+        eq_('BUY', client.post('/orders/', json={'orderType': 'SELL', 'data': {}}).json()['orderType'])
+
+    def test_recording_appends_and_incomplete_interactions_are_ignored(self):
+        self._record(lambda client: client.get('/lps/lp1'))
+        self._record(lambda client: client.get('/lps/lp2'))
+        with io.open(self.path, 'ab') as cassette_file:
+            cassette_file.write(b'GET\t/v1/lps/lp3\t')
+
+        client, replayer = self._replayer()
+        eq_(2, len(replayer))
+        eq_(['lp1', 'lp2'], [client.get('/lps/' + lp).json()['id'] for lp in ['lp1', 'lp2']])
+
+    def test_recording_drops_an_incomplete_interaction_before_appending(self):
+        self._record(lambda client: client.get('/lps/lp1'))
+        with io.open(self.path, 'ab') as cassette_file:
+            cassette_file.write(b'GET\t/v1/lps/lp3\t')
+        self._record(lambda client: client.get('/lps/lp2'))
+
+        client, replayer = self._replayer()
+        eq_(2, len(replayer))
+        eq_(['lp1', 'lp2'], [client.get('/lps/' + lp).json()['id'] for lp in ['lp1', 'lp2']])
+
+    def test_recording_restarts_a_cassette_interrupted_in_its_version_line(self):
+        with io.open(self.path, 'wb') as cassette_file:
+            cassette_file.write(cassette.VERSION_LINE[:5])
+        self._record(lambda client: client.get('/lps/lp1'))
+
+        client, replayer = self._replayer()
+        eq_(1, len(replayer))
+
+    def test_complete_lines_length(self):
+        for contents, expected in [(b'', 0), (b'abc', 0), (b'abc\n', 4), (b'a\nbcdefg', 2), (b'a\nbc\ndefg', 5)]:
+            with io.open(self.path, 'wb') as cassette_file:
+                cassette_file.write(contents)
+            eq_(expected, cassette._complete_lines_length(self.path, chunk_size=2))
+
+    def test_other_files_are_not_cassettes(self):
+        with io.open(self.path, 'wb') as cassette_file:
+            cassette_file.write(b'{"interactions": []}\n')
+
+        with assert_raises(cassette.CassetteError):
+            self._replayer()
+
+    def test_replay_from_many_threads(self):
+        self._record(lambda client: [client.get('/lps/lp{}'.format(index)) for index in range(10)])
+        client, _ = self._replayer()
+        results = []
+
+        def replay():
+            results.extend(client.get('/lps/lp{}'.format(index)).json()['id'] for index in range(10))
+        threads = [threading.Thread(target=replay) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        eq_(sorted(['lp{}'.format(index) for index in range(10)] * 8), sorted(results))
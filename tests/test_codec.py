@@ -0,0 +1,78 @@
+import collections
+import decimal
+import pickle
+
+import mock
+from nose.tools import assert_raises, eq_
+
+from pylcp import codec
+
+
+def test_dumps_compact_has_no_whitespace_and_keeps_decimals_exact():
+    eq_(b'{"amount":20.10,"items":[1,2]}', codec.dumps_compact({'amount': decimal.Decimal('20.10'), 'items': [1, 2]}))
+
+
+def test_dumps_compact_encodes_utf_8():
+    eq_(u'{"name":"\u00e9t\u00e9"}'.encode('utf-8'), codec.dumps_compact({'name': u'\u00e9t\u00e9'}))
+
+
+def test_encode_payload_keeps_data():
+    data = {'amount': 1000}
+    payload = codec.encode_payload(data)
+    assert isinstance(payload, bytes)
+    eq_(b'{"amount":1000}', payload)
+    assert payload.data is data
+
+
+def test_encode_payload_uses_encoder():
+    eq_(b'encoded', codec.encode_payload({}, encoder=lambda data: b'encoded'))
+
+
+def test_payloads_can_be_pickled():
+    payload = pickle.loads(pickle.dumps(codec.encode_payload({'amount': 1000})))
+    eq_(b'{"amount":1000}', payload)
+    eq_({'amount': 1000}, payload.data)
+
+
+def _check_codec_keeps_decimals_exact(json_codec):
+    data = json_codec.loads(b'{"amount": 20.10, "points": 1000, "name": "\\u00e9t\\u00e9"}')
+    eq_({'amount': decimal.Decimal('20.10'), 'points': 1000, 'name': u'\u00e9t\u00e9'}, data)
+    assert isinstance(data['points'], int)
+    eq_(data, json_codec.loads(json_codec.dumps(data)))
+    eq_(data, json_codec.loads(json_codec.dumps(data).decode('utf-8')))
+
+
+def _check_codec_dumps_compact_utf_8(json_codec):
+    eq_(u'{"a":[1,2.50],"b":"\u00e9"}'.encode('utf-8'),
+        json_codec.dumps(collections.OrderedDict([('a', [1, decimal.Decimal('2.50')]), ('b', u'\u00e9')])))
+
+
+def _check_codec_pretty_dumps_like_simplejson(json_codec):
+    data = {'b': [], 'a': [{'y': None, 'x': decimal.Decimal('1.10')}], 'c': {'d': True}}
+    eq_(codec.SimpleJSONCodec().pretty_dumps(data), json_codec.pretty_dumps(data))
+
+
+def _check_codec_raises_value_error_for_invalid_json(json_codec):
+    with assert_raises(ValueError):
+        json_codec.loads(b'not json')
+
+
+def test_available_codecs():
+    for json_codec in codec.available_codecs():
+        yield _check_codec_keeps_decimals_exact, json_codec
+        yield _check_codec_dumps_compact_utf_8, json_codec
+        yield _check_codec_pretty_dumps_like_simplejson, json_codec
+        yield _check_codec_raises_value_error_for_invalid_json, json_codec
+
+
+def test_default_codec_is_simplejson():
+    assert isinstance(codec.DEFAULT_CODEC, codec.SimpleJSONCodec)
+    assert codec.DEFAULT_CODEC in codec.available_codecs()
+
+
+@mock.patch('pylcp.codec.rapidjson', None)
+def test_rapidjson_codec_requires_rapidjson():
+    with assert_raises(ImportError):
+        codec.RapidJSONCodec()
+    eq_([codec.DEFAULT_CODEC], codec.available_codecs())
+    eq_(codec.DEFAULT_CODEC, codec.fastest_codec())
@@ -0,0 +1,121 @@
+from builtins import object
+import socket
+import threading
+
+from nose.tools import assert_raises, eq_
+import requests
+
+from pylcp import api, instrumentation
+from pylcp.crud import base as crud
+from tests import helpers, test_pool
+
+
+def test_path_template_collapses_identifiers():
+    cases = [
+        ('https://lcp.points.com/v1/lps/6b1c9b4f-1d2c-4a5b-8e9f-0a1b2c3d4e5f/mvs?q=1', '/v1/lps/{id}/mvs'),
+        ('http://lcp/v1/orders/12345', '/v1/orders/{id}'),
+        ('http://lcp/v1/orders/a1b2c3d4e5f6a7b8c9d0/', '/v1/orders/{id}/'),
+        ('http://lcp/v1/offer-sets/', '/v1/offer-sets/'),
+    ]
+    for url, expected in cases:
+        yield eq_, expected, instrumentation.path_template(url)
+
+
+class TestHistogram(object):
+    def test_quantiles_are_bucket_upper_bounds(self):
+        histogram = instrumentation.Histogram(buckets=(0.01, 0.1, 1.0))
+        for seconds in [0.005] * 98 + [0.05, 0.5]:
+            histogram.record(seconds)
+
+        eq_(0.01, histogram.quantile(0.5))
+        eq_(0.1, histogram.quantile(0.99))
+        eq_(0.5, histogram.quantile(1))
+        eq_(100, histogram.as_dict()['count'])
+        eq_(0.005, histogram.as_dict()['min'])
+
+    def test_empty_histogram_has_no_quantiles(self):
+        eq_(None, instrumentation.Histogram().quantile(0.5))
+
+
+class TestStatsdSink(object):
+    def test_measurements_are_sent_as_tagged_timers(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        listener.bind(('127.0.0.1', 0))
+        listener.settimeout(5)
+        sink = instrumentation.StatsdSink(port=listener.getsockname()[1])
+
+        sink.record(instrumentation.Measurement('ttfb', 0.0125, 'GET', '/v1/lps/{id}', 200))
+
+        eq_(b'pylcp.request.ttfb:12.500|ms|#method:GET,path:/v1/lps/{id},status:200', listener.recv(1024))
+        sink.close()
+        listener.close()
+
+
+class TestClientInstrumentation(object):
+    def setup(self):
+        self.server = test_pool._Server(('127.0.0.1', 0), test_pool._Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.host = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+        self.measurements = []
+        self.instrumentation = instrumentation.Instrumentation(
+            instrumentation.CallbackSink(self.measurements.append), clock=helpers.Clock(tick=0.001))
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _phases(self):
+        return sorted(measurement.phase for measurement in self.measurements)
+
+    def test_phases_of_requests_are_recorded(self):
+        client = api.Client(self.host, 'KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c',
+                            instrumentation=self.instrumentation)
+
+        crud.LCPCrud(client).read('/v1/lps/12345')
+
+        eq_(['connect', 'decode', 'download', 'log', 'sign', 'ttfb'], self._phases())
+        eq_({('GET', '/v1/lps/{id}', 200)},
+            set((measurement.method, measurement.path, measurement.status) for measurement in self.measurements))
+        measurements = {measurement.phase: measurement.seconds for measurement in self.measurements}
+        eq_(0.001, round(measurements['sign'], 6))
+        # The response body is decoded while it is logged
+        eq_(round(0.002 + measurements['decode'] + 0.001, 6), round(measurements['log'], 6))
+
+    def test_failed_requests_are_recorded_with_error_status(self):
+        client = api.Client('http://127.0.0.1:1', instrumentation=self.instrumentation)
+
+        with assert_raises(requests.ConnectionError):
+            client.get('/v1/lps')
+
+        eq_(['connect', 'log'], self._phases())
+        eq_({'error'}, set(measurement.status for measurement in self.measurements))
+
+    def test_histogram_sink_aggregates_by_tags(self):
+        sink = instrumentation.HistogramSink()
+        client = api.Client(self.host, instrumentation=instrumentation.Instrumentation(sink))
+
+        for lp_id in ['1', '2', '3']:
+            client.get('/v1/lps/' + lp_id).json()
+
+        snapshot = sink.snapshot()
+        eq_(3, snapshot[('ttfb', 'GET', '/v1/lps/{id}', 200)]['count'])
+        eq_(3, snapshot[('decode', 'GET', '/v1/lps/{id}', 200)]['count'])
+
+    def test_requests_are_not_measured_by_default(self):
+        client = api.Client(self.host, 'KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c')
+        response = client.get('/v1/lps/1')
+        eq_(None, instrumentation.active_timer())
+        assert not hasattr(response.request, '_sign_seconds')
+
+    def test_active_timer_is_per_thread(self):
+        timer = self.instrumentation.timer(requests.Request('GET', 'http://lcp/').prepare())
+        seen = []
+        with timer.active():
+            thread = threading.Thread(target=lambda: seen.append(instrumentation.active_timer()))
+            thread.start()
+            thread.join()
+            eq_(timer, instrumentation.active_timer())
+        eq_([None], seen)
+        eq_(None, instrumentation.active_timer())
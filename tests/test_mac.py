@@ -2,10 +2,13 @@
 
 from builtins import str
 from builtins import object
+import base64
 import hashlib
+import hmac
+import io
 
-from mock import patch, call
-from nose.tools import assert_is_not_none, eq_
+from mock import ANY, patch, call
+from nose.tools import assert_is_not_none, assert_raises, eq_
 
 from pylcp import mac
 
@@ -45,7 +48,8 @@ class TestGenerateExt(object):
         body = "dave was here"
         ext = mac.generate_ext(content_type, body)
         eq_(ext, mock_sha1.return_value.hexdigest.return_value)
-        eq_(mock_sha1.call_args_list, [call((content_type + body).encode('utf-8'))])
+        eq_(mock_sha1.call_args_list, [call(content_type.encode('utf-8'))])
+        eq_(mock_sha1.return_value.update.call_args_list, [call(body.encode('utf-8'))])
 
     @patch('pylcp.mac.hashlib.sha1')
     def test_unicode_content_type_and_body_returns_sha1_of_both(self, mock_sha1):
@@ -53,7 +57,35 @@ class TestGenerateExt(object):
         body = u"\u6234\u592b\u5728\u8fd9\u91cc"
         ext = mac.generate_ext(content_type, body)
         eq_(ext, mock_sha1.return_value.hexdigest.return_value)
-        eq_(mock_sha1.call_args_list, [call((content_type + body).encode('utf-8'))])
+        eq_(mock_sha1.call_args_list, [call(content_type.encode('utf-8'))])
+        eq_(mock_sha1.return_value.update.call_args_list, [call(body.encode('utf-8'))])
+
+    def test_streamed_bodies_hash_like_strings(self):
+        content_type = 'application/json'
+        body = b'{"amount": 1000}' * 10000
+        expected = mac.generate_ext(content_type, body)
+        eq_(hashlib.sha1(content_type.encode('utf-8') + body).hexdigest(), expected)
+        eq_(expected, mac.generate_ext(content_type, memoryview(body)))
+        eq_(expected, mac.generate_ext(content_type, bytearray(body)))
+        eq_(expected, mac.generate_ext(content_type, io.BytesIO(body)))
+        eq_(expected, mac.generate_ext(content_type, [body[:5], u'', body[5:].decode('utf-8')]))
+        eq_(expected, mac.generate_ext(content_type, (body[i:i + 7] for i in range(0, len(body), 7))))
+
+    def test_seekable_files_are_rewound(self):
+        body = io.BytesIO(b'skipped{"amount": 1000}')
+        body.seek(7)
+        eq_(mac.generate_ext('application/json', '{"amount": 1000}'), mac.generate_ext('application/json', body))
+        eq_(7, body.tell())
+
+    def test_empty_streams_are_zero_length_ext(self):
+        eq_('', mac.generate_ext('application/json', io.BytesIO()))
+        eq_('', mac.generate_ext('application/json', iter([b'', b''])))
+
+    def test_replayable_body_reads_only_one_shot_bodies(self):
+        body_file = io.BytesIO(b'body')
+        for body in (None, b'body', u'body', [b'bo', b'dy'], body_file):
+            assert mac.replayable_body(body) is body
+        eq_([b'bo', b'dy'], mac.replayable_body(iter([b'bo', u'dy'])))
 
 
 class TestBuildNormalizedRequestString(object):
@@ -90,14 +122,79 @@ class TestGenerateNonce(object):
 
 
 class TestGenerateSignature(object):
+    def test_returns_signature(self):
+        key = base64.b64decode('testkey1=')
+        expected = base64.b64encode(hmac.new(key, b'test_nrs', hashlib.sha1).digest()).decode('ascii')
+        eq_(mac.generate_signature('testkey1', 'test_nrs'), expected)
+
+    def test_accepts_signer_in_place_of_key(self):
+        signer = mac.MACSigner('testkey1')
+        eq_(mac.generate_signature(signer, 'test_nrs'), mac.generate_signature('testkey1', 'test_nrs'))
+
     @patch('pylcp.mac.base64.b64decode')
-    @patch('pylcp.mac.base64.b64encode')
-    @patch('pylcp.mac.hmac.new')
-    def test_returns_signature(self, hmac_new_mock, b64encode_mock, b64decode_mock):
-        b64decode_mock.return_value = 'test_key'
-        eq_(mac.generate_signature('test_key', 'test_nrs'), b64encode_mock.return_value)
-        eq_(b64encode_mock.call_args_list, [call(hmac_new_mock.return_value.digest.return_value)])
-        eq_(hmac_new_mock.call_args, call('test_key', 'test_nrs', hashlib.sha1))
+    def test_url_safe_key_characters_are_replaced(self, b64decode_mock):
+        b64decode_mock.return_value = b'key'
+        mac.generate_signature('a-b_c', 'test_nrs')
+        eq_(b64decode_mock.call_args_list, [call('a+b/c=')])
+
+
+class TestMACSigner(object):
+    @patch('pylcp.mac.base64.b64decode')
+    def test_key_is_decoded_once(self, b64decode_mock):
+        b64decode_mock.return_value = b'key'
+        signer = mac.MACSigner('testkey1')
+        signer.sign('first')
+        signer.sign('second')
+        eq_(b64decode_mock.call_args_list, [call('testkey1=')])
+
+    def test_signatures_are_independent(self):
+        signer = mac.MACSigner('testkey1')
+        first = signer.sign('test_nrs')
+        signer.sign('other_nrs')
+        eq_(first, signer.sign('test_nrs'))
+
+    def test_unicode_and_byte_strings_sign_identically(self):
+        signer = mac.MACSigner('testkey1')
+        eq_(signer.sign(u'test_nrs'), signer.sign(b'test_nrs'))
+
+    def test_authorization_header_value_is_verifiable(self):
+        signer = mac.MACSigner('testkey1')
+        header = signer.authorization_header_value(
+            'POST', 'https://lcp.points.com/v1/orders/', 'KEY_ID', 'application/json', '{}')
+        match = mac.AuthHeaderValue.auth_header_re.match(header)
+        normalized_request_string = mac.build_normalized_request_string(
+            match.group('ts'), match.group('nonce'), 'POST', 'lcp.points.com', '443', '/v1/orders/',
+            mac.generate_ext('application/json', '{}'))
+        eq_('KEY_ID', match.group('mac_key_identifier'))
+        eq_(mac.generate_signature('testkey1', normalized_request_string), match.group('mac'))
+
+    def test_signatures_match_hmac(self):
+        for mac_key in ('testkey1', base64.b64encode(b'k' * 100).decode('ascii')):
+            key = base64.b64decode(mac_key + '=')
+            expected = base64.b64encode(hmac.new(key, b'test_nrs', hashlib.sha1).digest()).decode('ascii')
+            eq_(expected, mac.MACSigner(mac_key).sign('test_nrs'))
+
+    def test_authorization_header_values_are_verifiable(self):
+        requests = [
+            ('POST', 'https://lcp.points.com/v1/lps/1/credits', 'application/json', '{"amount": 1}'),
+            ('GET', 'http://localhost:8080/v1/orders/?q=/x', '', None),
+            ('PUT', 'https://lcp.points.com/v1/lps/1;v=2?x', 'application/json', u'{"name": "\u00e9"}'),
+        ]
+        verifier = mac.MACVerifier({'KEY_ID': 'testkey1'})
+        header_values = mac.MACSigner('testkey1').authorization_header_values(iter(requests), 'KEY_ID')
+        eq_(3, len(header_values))
+        for (method, url, content_type, body), header_value in zip(requests, header_values):
+            verifier.verify(method, url, header_value, content_type, body)
+
+    @patch('pylcp.mac.os.urandom', return_value=b'0123456789abcdef')
+    def test_authorization_header_values_draw_nonces_at_once(self, urandom_mock):
+        header_values = mac.generate_authorization_header_values(
+            [('GET', 'https://lcp.points.com/v1/', '', None)] * 2, 'KEY_ID', 'testkey1')
+        eq_([call(16)], urandom_mock.call_args_list)
+        eq_(['MDEyMzQ1Njc=', 'ODlhYmNkZWY='], [mac.AuthHeaderValue.parse(value).nonce for value in header_values])
+
+    def test_authorization_header_values_of_no_requests(self):
+        eq_([], mac.MACSigner('testkey1').authorization_header_values([], 'KEY_ID'))
 
 
 class TestGenerateAuthorizationHeaderValue(object):
@@ -108,6 +205,7 @@ class TestGenerateAuthorizationHeaderValue(object):
         self.mock_build_normalized_request_string = patch(
             'pylcp.mac.build_normalized_request_string').start()
         self.mock_generate_signature = patch('pylcp.mac.generate_signature').start()
+        self.mock_b64decode = patch('pylcp.mac.base64.b64decode', return_value=b'key').start()
         self.mock_time.return_value = 42
         self.mock_generate_nonce.return_value = 'NONCE'
         self.mock_generate_ext.return_value = 'EXT'
@@ -132,7 +230,15 @@ class TestGenerateAuthorizationHeaderValue(object):
         eq_(self.mock_generate_ext.call_args_list, [
             call('CONTENT_TYPE', 'BODY')])
         eq_(self.mock_generate_signature.call_args_list, [
-            call('SECRET', self.mock_build_normalized_request_string.return_value)])
+            call(ANY, self.mock_build_normalized_request_string.return_value)])
+        eq_('SECRET', self.mock_generate_signature.call_args[0][0].mac_key)
+
+    def test_reuses_signer_passed_as_key(self):
+        signer = mac.MACSigner('testkey1')
+        mac.generate_authorization_header_value(
+            'METHOD', 'http://HOST:8008/PATH', 'KEY_ID', signer, 'CONTENT_TYPE', 'BODY')
+        eq_(self.mock_generate_signature.call_args_list, [
+            call(signer, self.mock_build_normalized_request_string.return_value)])
 
     def test_defaults_to_http_port_for_http_scheme(self):
         mac.generate_authorization_header_value(
@@ -177,3 +283,106 @@ class TestAuthHeaderValue(object):
     def test_string_representation_include_all_parameters_as_per_rfc(self):
         actual = '%s' % mac.AuthHeaderValue('FAKE_ID', '42', 'FAKE_NONCE', 'FAKE_EXT', 'FAKE_MAC')
         eq_(self._create_ahv_str(), actual)
+
+    def test_parse_returns_parameters(self):
+        header = mac.AuthHeaderValue.parse(self._create_ahv_str(ext=''))
+        eq_(('FAKE_ID', '42', 'FAKE_NONCE', '', 'FAKE_MAC'),
+            (header.mac_key_identifier, header.ts, header.nonce, header.ext, header.mac))
+
+    def test_parse_returns_none_for_other_authorizations(self):
+        eq_(None, mac.AuthHeaderValue.parse('Basic dXNlcjpwYXNz'))
+        eq_(None, mac.AuthHeaderValue.parse(None))
+
+
+class TestMACVerifier(object):
+    URL = 'https://lcp.points.com/v1/callbacks?x=1'
+
+    def setup(self):
+        self.verifier = mac.MACVerifier({'key_id': 'testkey1'})
+
+    def _sign(self, method='POST', url=URL, content_type='application/json', body='{"a": 1}'):
+        return mac.generate_authorization_header_value(method, url, 'key_id', 'testkey1', content_type, body)
+
+    def test_valid_request_is_verified(self):
+        header = self.verifier.verify('POST', self.URL, self._sign(), 'application/json', '{"a": 1}')
+        eq_('key_id', header.mac_key_identifier)
+
+    def test_request_without_body_is_verified(self):
+        authorization = self._sign('GET', content_type='', body=None)
+        self.verifier.verify('GET', self.URL, authorization, '', None)
+
+    def _assert_rejected(self, message, *args):
+        try:
+            self.verifier.verify(*args)
+        except mac.MACVerificationError as e:
+            assert message in str(e), str(e)
+        else:
+            raise AssertionError('MACVerificationError not raised')
+
+    def test_tampered_requests_are_rejected(self):
+        authorization = self._sign()
+        self._assert_rejected('ext', 'POST', self.URL, authorization, 'application/json', '{"a": 2}')
+        self._assert_rejected('MAC does not match', 'PUT', self.URL, authorization, 'application/json', '{"a": 1}')
+        self._assert_rejected(
+            'MAC does not match', 'POST', self.URL.replace('callbacks', 'other'), authorization,
+            'application/json', '{"a": 1}')
+
+    def test_unknown_key_and_malformed_headers_are_rejected(self):
+        authorization = mac.generate_authorization_header_value('GET', self.URL, 'other', 'testkey1', '', None)
+        self._assert_rejected('Unknown MAC key identifier', 'GET', self.URL, authorization, '', None)
+        self._assert_rejected('not a MAC authorization', 'GET', self.URL, 'Bearer token', '', None)
+
+    def test_stale_timestamps_are_rejected(self):
+        with patch('time.time', return_value=1000):
+            authorization = self._sign()
+        with patch('time.time', return_value=1031):
+            self._assert_rejected('skew', 'POST', self.URL, authorization, 'application/json', '{"a": 1}')
+        with patch('time.time', return_value=969):
+            self._assert_rejected('skew', 'POST', self.URL, authorization, 'application/json', '{"a": 1}')
+
+    def test_replayed_nonces_are_rejected(self):
+        authorization = self._sign()
+        self.verifier.verify('POST', self.URL, authorization, 'application/json', '{"a": 1}')
+        self._assert_rejected('Nonce', 'POST', self.URL, authorization, 'application/json', '{"a": 1}')
+
+    def test_nonces_of_forged_requests_are_not_recorded(self):
+        authorization = self._sign()
+        self._assert_rejected('ext', 'POST', self.URL, authorization, 'application/json', '{}')
+        eq_(0, len(self.verifier.nonce_cache))
+
+    def test_nonce_cache_is_pluggable(self):
+        nonce_cache = mac.InMemoryNonceCache()
+        with patch.object(nonce_cache, 'add', return_value=False) as add_mock:
+            verifier = mac.MACVerifier({'key_id': mac.MACSigner('testkey1')}, max_skew=10, nonce_cache=nonce_cache)
+            authorization = self._sign()
+            with assert_raises(mac.MACVerificationError):
+                verifier.verify('POST', self.URL, authorization, 'application/json', '{"a": 1}')
+        nonce = mac.AuthHeaderValue.parse(authorization).nonce
+        add_mock.assert_called_once_with(('key_id', nonce), 20)
+
+
+class TestInMemoryNonceCache(object):
+    def test_keys_can_be_added_once_until_they_expire(self):
+        cache = mac.InMemoryNonceCache()
+        with patch('time.time', return_value=100):
+            eq_(True, cache.add('a', 10))
+            eq_(False, cache.add('a', 10))
+        with patch('time.time', return_value=110):
+            eq_(True, cache.add('a', 10))
+
+    def test_expired_keys_are_evicted(self):
+        cache = mac.InMemoryNonceCache()
+        with patch('time.time', return_value=100):
+            cache.add('a', 10)
+            cache.add('b', 20)
+        with patch('time.time', return_value=115):
+            cache.add('c', 10)
+        eq_(2, len(cache))
+
+    def test_oldest_keys_are_evicted_when_full(self):
+        cache = mac.InMemoryNonceCache(max_size=2)
+        for key in 'abc':
+            cache.add(key, 60)
+        eq_(2, len(cache))
+        eq_(True, cache.add('a', 60))
+        eq_(False, cache.add('c', 60))
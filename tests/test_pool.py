@@ -0,0 +1,96 @@
+from builtins import object, range
+try:
+    from http import server
+except ImportError:
+    import BaseHTTPServer as server
+try:
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from SocketServer import ThreadingMixIn
+import threading
+
+from nose.tools import eq_
+import requests
+
+from pylcp import api, pool
+
+
+class _Handler(server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        if self.close_connection:
+            self.send_header('Connection', 'close')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class _Server(ThreadingMixIn, server.HTTPServer):
+    daemon_threads = True
+
+
+class TestClientConnectionPool(object):
+    def setup(self):
+        self.server = _Server(('127.0.0.1', 0), _Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.host = 'http://127.0.0.1:{}'.format(self.server.server_address[1])
+
+    def teardown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connections_are_reused(self):
+        client = api.Client(self.host)
+        for _ in range(3):
+            client.get('/url')
+        eq_({self.host: {'requests': 3, 'hits': 2, 'new_connections': 1, 'discards': 0}}, client.pool_stats())
+
+    def test_connections_are_not_kept_alive_when_disabled(self):
+        client = api.Client(self.host, keep_alive=False)
+        for _ in range(3):
+            response = client.get('/url')
+        eq_('close', response.request.headers['Connection'])
+        eq_(3, client.pool_stats()[self.host]['new_connections'])
+
+    def test_connections_beyond_pool_maxsize_are_discarded(self):
+        adapter = pool.PooledHTTPAdapter(pool_maxsize=1)
+        session = requests.Session()
+        session.mount('http://', adapter)
+        # Streamed responses hold their connection until the body is read
+        responses = [session.get(self.host, stream=True) for _ in range(2)]
+        for response in responses:
+            response.content
+
+        stats = adapter.stats()[self.host]
+        eq_(2, stats['new_connections'])
+        eq_(1, stats['discards'])
+
+    def test_pool_options_are_passed_to_adapter(self):
+        client = api.Client(self.host, pool_connections=2, pool_maxsize=20, pool_block=True)
+        adapter = client.get_adapter(self.host)
+        assert isinstance(adapter, pool.PooledHTTPAdapter)
+        eq_((2, 20, True), (adapter._pool_connections, adapter._pool_maxsize, adapter._pool_block))
+
+
+def test_pool_stats_hits_are_requests_on_reused_connections():
+    stats = pool.PoolStats()
+    stats._record_request(new_connection=True)
+    stats._record_request(new_connection=False)
+    stats._record_discard()
+    eq_(1, stats.hits)
+    eq_({'requests': 2, 'hits': 1, 'new_connections': 1, 'discards': 1}, stats.as_dict())
+
+
+def test_adapter_can_be_used_with_a_plain_session():
+    session = requests.Session()
+    session.mount('http://', pool.PooledHTTPAdapter(pool_maxsize=4))
+    eq_({}, session.get_adapter('http://example.com').stats())
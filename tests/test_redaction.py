@@ -0,0 +1,94 @@
+from builtins import object
+import re
+
+from nose.tools import eq_
+
+from pylcp import redaction
+
+
+def mask_last_four(value):
+    return 'X' * 4 + value[-4:]
+
+
+class TestRedactionRules(object):
+    def setup(self):
+        self.rules = redaction.RedactionRules(
+            paths={
+                'billingInfo.cardNumber': mask_last_four,
+                'orders.*.billingInfo.securityCode': redaction.mask_all,
+                'user.password': redaction.mask_all,
+            },
+            key_patterns={
+                '(?i).*token': redaction.mask_all,
+                re.compile('email|phone'): redaction.mask_all,
+            }
+        )
+
+    def test_masks_fields_at_paths(self):
+        data = {
+            'billingInfo': {'cardNumber': '41111111', 'cardType': 'VISA'},
+            'user': {'password': 'secret', 'name': 'Frank'},
+        }
+        eq_({
+            'billingInfo': {'cardNumber': 'XXXX1111', 'cardType': 'VISA'},
+            'user': {'password': 'XXX', 'name': 'Frank'},
+        }, self.rules.redact(data))
+
+    def test_wildcards_match_array_items_and_object_keys(self):
+        data = {'orders': [
+            {'billingInfo': {'securityCode': '123'}},
+            {'billingInfo': {'securityCode': '456'}},
+        ]}
+        eq_({'orders': [
+            {'billingInfo': {'securityCode': 'XXX'}},
+            {'billingInfo': {'securityCode': 'XXX'}},
+        ]}, self.rules.redact(data))
+        eq_({'orders': {'a': {'billingInfo': {'securityCode': 'XXX'}}}},
+            self.rules.redact({'orders': {'a': {'billingInfo': {'securityCode': '789'}}}}))
+
+    def test_key_patterns_match_whole_keys_at_any_depth(self):
+        data = {'a': [{'b': {'accessToken': 't', 'email': 'e', 'emails': ['e'], 'tokenType': 'bearer'}}]}
+        eq_({'a': [{'b': {'accessToken': 'XXX', 'email': 'XXX', 'emails': ['e'], 'tokenType': 'bearer'}}]},
+            self.rules.redact(data))
+
+    def test_paths_not_present_are_ignored(self):
+        data = {'billingInfo': 'not an object', 'user': None, 'orders': 'none'}
+        eq_(data, self.rules.redact(data))
+
+    def test_only_containers_on_masked_paths_are_copied(self):
+        data = {
+            'billingInfo': {'cardNumber': '41111111', 'address': {'state': 'ON'}},
+            'orders': [{'billingInfo': {}}, {'billingInfo': {'securityCode': '123'}}],
+            'items': [{'amount': 1}],
+        }
+        masked = self.rules.redact(data)
+        eq_('41111111', data['billingInfo']['cardNumber'])
+        eq_('123', data['orders'][1]['billingInfo']['securityCode'])
+        assert masked['billingInfo']['address'] is data['billingInfo']['address']
+        assert masked['orders'] is not data['orders']
+        assert masked['orders'][0] is data['orders'][0]
+        assert masked['items'] is data['items']
+
+    def test_data_without_matches_is_returned_as_is(self):
+        data = {'billingInfo': {'cardType': 'VISA'}, 'items': [{'amount': 1}]}
+        assert self.rules.redact(data) is data
+
+    def test_scalars_are_returned_as_is(self):
+        eq_('text', self.rules.redact('text'))
+        eq_(None, self.rules.redact(None))
+
+    def test_rules_without_key_patterns_only_visit_matching_paths(self):
+        rules = redaction.RedactionRules(paths={'password': redaction.mask_all})
+
+        class ExplodingList(list):
+            def __getitem__(self, index):
+                raise AssertionError('unexpected visit')
+
+        data = {'password': 'secret', 'items': ExplodingList([{'password': 'nested'}])}
+        masked = rules.redact(data)
+        eq_('XXX', masked['password'])
+        assert masked['items'] is data['items']
+
+    def test_empty_rules_mask_nothing(self):
+        data = {'password': 'secret'}
+        assert redaction.RedactionRules().redact(data) is data
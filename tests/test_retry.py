@@ -0,0 +1,126 @@
+from builtins import object
+
+import mock
+from nose.tools import assert_raises, eq_
+import requests
+from requests import models
+
+from pylcp import api, instrumentation, retry
+from tests import helpers
+
+
+class TestClientRetries(object):
+    def setup(self):
+        self.sleep = mock.Mock()
+        self.policy = retry.RetryPolicy(max_attempts=3, sleep=self.sleep)
+
+    def _client(self, *outcomes, **kwargs):
+        return helpers.scripted_client(*outcomes, retry_policy=self.policy, **kwargs)
+
+    def test_transient_errors_are_retried(self):
+        client = self._client(503, 502, 200)
+        eq_(200, client.get('/url').status_code)
+        eq_(3, len(client.adapter.requests))
+        eq_(2, self.sleep.call_count)
+
+    def test_connection_errors_are_retried(self):
+        client = self._client(requests.ConnectionError('reset'), 200)
+        eq_(200, client.put('/url', data='{}').status_code)
+        eq_(2, len(client.adapter.requests))
+
+    def test_last_response_is_returned_when_attempts_are_exhausted(self):
+        client = self._client(503, 503, 503, 200)
+        eq_(503, client.get('/url').status_code)
+        eq_(3, len(client.adapter.requests))
+
+    def test_last_error_is_raised_when_attempts_are_exhausted(self):
+        client = self._client(*[requests.ReadTimeout('slow')] * 3)
+        with assert_raises(requests.ReadTimeout):
+            client.get('/url')
+        eq_(3, len(client.adapter.requests))
+
+    def test_non_idempotent_requests_are_not_retried(self):
+        client = self._client(503, 200)
+        eq_(503, client.post('/url', data='{}').status_code)
+        client = self._client(requests.ReadTimeout('slow'), 200)
+        with assert_raises(requests.ReadTimeout):
+            client.post('/url', data='{}')
+
+    def test_non_idempotent_requests_are_retried_when_not_connected(self):
+        client = self._client(requests.ConnectTimeout('unreachable'), 201)
+        eq_(201, client.post('/url', data='{}').status_code)
+
+    def test_other_statuses_are_not_retried(self):
+        client = self._client(500, 200)
+        eq_(500, client.get('/url').status_code)
+        eq_(1, len(client.adapter.requests))
+
+    def test_requests_are_not_retried_without_a_policy(self):
+        client = self._client(503, 200)
+        client.retry_policy = None
+        eq_(503, client.get('/url').status_code)
+
+    @mock.patch('pylcp.mac.generate_nonce', side_effect=[b'nonce1', b'nonce2'])
+    def test_each_attempt_is_signed_again(self, nonce_mock):
+        client = self._client(503, 200, key_id='key_id', shared_secret='c2VjcmV0')
+        response = client.get('/url')
+        authorizations = [request.headers['Authorization'] for request in client.adapter.requests]
+        assert 'nonce="nonce1"' in authorizations[0]
+        assert 'nonce="nonce2"' in authorizations[1]
+        eq_(authorizations[1], response.request.headers['Authorization'])
+
+    @mock.patch('pylcp.mac.generate_nonce', return_value=b'nonce')
+    def test_retries_are_signed_by_the_auth_of_the_request(self, nonce_mock):
+        for client in [self._client(503, 503, 200, key_id='key_id', shared_secret='c2VjcmV0'),
+                       self._client(503, 503, 200, key_id='key_id', shared_secret='c2VjcmV0',
+                                    instrumentation=instrumentation.Instrumentation(mock.Mock()))]:
+            client.get('/url', auth=api.MACAuth('other_key_id', 'b3RoZXI='))
+            eq_(3, len(client.adapter.requests))
+            for request in client.adapter.requests:
+                assert 'id="other_key_id"' in request.headers['Authorization']
+
+    def test_retries_stop_when_budget_is_spent(self):
+        self.policy.budget = retry.RetryBudget(ratio=0, initial=1)
+        client = self._client(503, 503, 200)
+        eq_(503, client.get('/url').status_code)
+        eq_(2, len(client.adapter.requests))
+
+
+class TestRetryPolicy(object):
+    def setup(self):
+        self.policy = retry.RetryPolicy(max_attempts=5, backoff_factor=1, max_backoff=3)
+        self.request = requests.Request('GET', 'http://lcp/url').prepare()
+
+    @mock.patch('pylcp.retry.random.uniform', side_effect=lambda low, high: high)
+    def test_backoff_grows_exponentially_up_to_max(self, uniform_mock):
+        eq_([1, 2, 3, 3], [self.policy.backoff(attempt) for attempt in range(1, 5)])
+        eq_(mock.call(0, 1), uniform_mock.call_args_list[0])
+
+    @mock.patch('pylcp.retry.random.uniform', return_value=0)
+    def test_backoff_honours_retry_after(self, uniform_mock):
+        response = models.Response()
+        response.headers = {'Retry-After': '2'}
+        eq_(2, self.policy.backoff(1, response))
+        response.headers = {'Retry-After': '60'}
+        eq_(3, self.policy.backoff(1, response))
+
+    def test_streamed_bodies_cannot_be_retried(self):
+        eq_(True, self.policy.can_retry(self.request))
+        self.request.body = iter([b'chunk'])
+        eq_(False, self.policy.can_retry(self.request))
+
+    def test_retry_delay_is_none_on_last_attempt(self):
+        response = models.Response()
+        response.status_code = 503
+        response.headers = {}
+        assert self.policy.retry_delay(self.request, 4, response=response) is not None
+        eq_(None, self.policy.retry_delay(self.request, 5, response=response))
+
+
+def test_budget_allows_a_ratio_of_retries():
+    budget = retry.RetryBudget(ratio=0.5, initial=0, capacity=1)
+    eq_(False, budget.withdraw())
+    for _ in range(10):
+        budget.deposit()
+    eq_(True, budget.withdraw())
+    eq_(False, budget.withdraw())
@@ -0,0 +1,90 @@
+from builtins import object, range
+
+try:
+    from http.client import CREATED, NOT_FOUND, OK, SERVICE_UNAVAILABLE, UNAUTHORIZED
+except ImportError:
+    from httplib import CREATED, NOT_FOUND, OK, SERVICE_UNAVAILABLE, UNAUTHORIZED
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+from nose.tools import assert_raises, eq_
+import requests
+
+from pylcp import api, simulator
+from pylcp.crud import base as crud
+from pylcp.crud import loyalty_program, offers, orders, payment, postings
+
+BASE_URL = 'https://lcp.simulator/v1'
+KEY_ID = 'KEY_ID'
+MAC_KEY = '3b11b03d1a9f4a0ca04fdede4ae30a1c'
+
+
+class TestLCPSimulatorAdapter(object):
+    def _client(self, key_id=KEY_ID, mac_key=MAC_KEY, **kwargs):
+        client = api.Client(BASE_URL, key_id, mac_key)
+        self.simulator = simulator.LCPSimulatorAdapter(mac_keys={KEY_ID: MAC_KEY}, **kwargs)
+        client.mount('https://lcp.simulator/', self.simulator)
+        return client
+
+    def test_cruds_round_trip(self):
+        client = self._client()
+
+        eq_('lp1', loyalty_program.LoyaltyProgram(client).read('lp1')['id'])
+        offer_set = offers.OfferSet(client).create(['BUY', 'GIFT'], {'channel': 'storefront'}, {'memberId': '1'})
+        eq_(['BUY', 'GIFT'], [offer['type'] for offer in offer_set['offers']])
+        order = orders.Order(client).create('BUY', {'offer': offer_set['offers'][0]['links']['self']['href']})
+        eq_(order.json, crud.LCPCrud(client).read(order.url).json)
+        credit = postings.Credit(client).create('/lps/lp1/mvs/mv1/credits', 1000, BASE_URL + '/lps/lp1/mvs/mv1')
+        eq_((1000, 'success'), (credit['amount'], credit['status']))
+        auth = payment.PaymentAuth(client).create(order.url + '/payment-auths/', {'amount': '10.00'})
+        capture = payment.PaymentCapture(client).create(auth.url + '/captures/')
+        eq_(auth.url, capture['paymentAuth'])
+        eq_('captured', crud.LCPCrud(client).read(auth.url)['status'])
+
+    def test_orders_are_searched_in_pages(self):
+        client = self._client()
+        order_crud = orders.Order(client)
+        created = [order_crud.create('BUY', {'index': index}).url for index in range(25)]
+
+        found = list(order_crud.search_iter('/orders/', {'limit': 10}))
+
+        eq_(created, [order['links']['self']['href'] for order in found])
+        eq_(3, self.simulator.metrics.as_dict()['statuses'][('GET /orders/', OK)])
+
+    def test_unsigned_and_wrongly_signed_requests_are_unauthorized(self):
+        for client in [self._client(key_id=None), self._client(mac_key='0' * 32)]:
+            with assert_raises(requests.HTTPError) as context:
+                loyalty_program.LoyaltyProgram(client).read('lp1')
+            eq_(UNAUTHORIZED, context.exception.response.status_code)
+
+    def test_unknown_resources_are_not_found(self):
+        client = self._client(loyalty_programs={'lp1': {'name': 'Points'}})
+        eq_('Points', client.get('/lps/lp1').json()['name'])
+        eq_(NOT_FOUND, client.get('/lps/lp2').status_code)
+        eq_(NOT_FOUND, client.get('/orders/missing').status_code)
+        eq_(NOT_FOUND, client.delete('/orders/').status_code)
+
+    def test_latency_and_errors_are_injected(self):
+        sleep = mock.Mock()
+        client = self._client(latency=0.25, error_rate=0.5, seed=1, sleep=sleep)
+
+        statuses = [client.get('/lps/lp1').status_code for _ in range(100)]
+
+        eq_({OK, SERVICE_UNAVAILABLE}, set(statuses))
+        assert 30 < statuses.count(SERVICE_UNAVAILABLE) < 70
+        eq_([mock.call(0.25)] * 100, sleep.call_args_list)
+
+    def test_metrics_are_recorded_for_concurrent_requests(self):
+        client = self._client()
+        credits = postings.Credit(client)
+        items = [('/lps/lp1/mvs/mv1/credits', 100, BASE_URL + '/lps/lp1/mvs/mv1')] * 200
+
+        results = list(credits.create_many(items, concurrency=8))
+
+        eq_([None] * 200, [result.error for result in results])
+        metrics = self.simulator.metrics.as_dict()
+        eq_(200, metrics['requests'])
+        eq_({('POST .../credits/', CREATED): 200}, metrics['statuses'])
+        eq_(200, metrics['routes']['POST .../credits/']['count'])
+        eq_(200, len(self.simulator.resources))
@@ -0,0 +1,164 @@
+from builtins import object, range
+import threading
+import time
+
+from nose.tools import assert_raises, eq_
+from requests import adapters, models
+
+from pylcp import api, singleflight
+from pylcp.crud import loyalty_program
+
+
+def _run_concurrently(function, count):
+    results = [None] * count
+
+    def run(index):
+        results[index] = function()
+    threads = [threading.Thread(target=run, args=(index,)) for index in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class GatedAdapter(adapters.BaseAdapter):
+    """Holds every request until `release` is set, then returns a JSON response echoing its URL."""
+
+    def __init__(self):
+        super(GatedAdapter, self).__init__()
+        self.release = threading.Event()
+        self.requests = []
+
+    def send(self, request, **kwargs):
+        self.requests.append(request)
+        self.release.wait(5)
+        response = models.Response()
+        response.request = request
+        response.url = request.url
+        response.status_code = 200
+        response.headers = {'Content-Type': 'application/json'}
+        response._content = '{{"url": "{}"}}'.format(request.url).encode('utf-8')
+        return response
+
+    def close(self):
+        pass
+
+
+class TestSingleFlight(object):
+    def test_concurrent_calls_share_one_call(self):
+        group = singleflight.SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def function():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        def release_when_shared():
+            started.wait(5)
+            while group.stats()['shared'] < 3:
+                time.sleep(0.001)
+            release.set()
+        watcher = threading.Thread(target=release_when_shared)
+        watcher.start()
+        results = _run_concurrently(lambda: group.do('key', function), 4)
+        watcher.join()
+
+        eq_(1, len(calls))
+        eq_([('result', False)] + [('result', True)] * 3, sorted(results, key=lambda result: result[1]))
+        eq_({'calls': 1, 'shared': 3, 'in_flight': 0}, group.stats())
+
+    def test_errors_are_raised_and_not_remembered(self):
+        group = singleflight.SingleFlight()
+
+        def fail():
+            raise ValueError('failed')
+        with assert_raises(ValueError):
+            group.do('key', fail)
+        eq_(('ok', False), group.do('key', lambda: 'ok'))
+
+    def test_interruptions_of_the_call_are_shared(self):
+        group = singleflight.SingleFlight()
+        errors = []
+
+        def interrupted():
+            while group.stats()['shared'] < 1:
+                time.sleep(0.001)
+            raise KeyboardInterrupt()
+
+        def call():
+            try:
+                group.do('key', interrupted)
+            except KeyboardInterrupt as e:
+                errors.append(e)
+        _run_concurrently(call, 2)
+
+        eq_(2, len(errors))
+
+
+class TestClientCoalescedReads(object):
+    def test_concurrent_reads_of_same_url_share_one_request(self):
+        client = api.Client('http://lcp', 'KEY_ID', '3b11b03d1a9f4a0ca04fdede4ae30a1c', coalesce_reads=True)
+        client.adapter = GatedAdapter()
+        client.mount('http://', client.adapter)
+        lps = loyalty_program.LoyaltyProgram(client)
+        watcher = threading.Thread(target=self._release_when_shared, args=(client, 4))
+        watcher.start()
+        resources = _run_concurrently(lambda: lps.read('lp1'), 5)
+        watcher.join()
+
+        eq_(1, len(client.adapter.requests))
+        eq_(['http://lcp/lps/lp1'] * 5, [resource['url'] for resource in resources])
+        eq_(5, len(set(id(resource.response) for resource in resources)))
+        resources[0].response.json()['url'] = 'changed'
+        eq_('http://lcp/lps/lp1', resources[1].response.json()['url'])
+
+    def _release_when_shared(self, client, count):
+        while client.single_flight.stats()['shared'] < count:
+            time.sleep(0.001)
+        client.adapter.release.set()
+
+    def test_shared_responses_can_be_iterated_and_closed(self):
+        client = api.Client('http://lcp', coalesce_reads=True)
+        client.adapter = GatedAdapter()
+        client.mount('http://', client.adapter)
+        watcher = threading.Thread(target=self._release_when_shared, args=(client, 2))
+        watcher.start()
+        responses = _run_concurrently(lambda: client.get('/lps/lp1'), 3)
+        watcher.join()
+
+        for response in responses:
+            eq_([b'{"url": "http://lcp/lps/lp1"}'], list(response.iter_content(100)))
+            response.close()
+
+    def test_reads_with_other_settings_are_not_coalesced(self):
+        client = api.Client('http://lcp', coalesce_reads=True)
+        client.adapter = GatedAdapter()
+        client.mount('http://', client.adapter)
+        threads = [threading.Thread(target=client.get, args=('/lps/lp1',), kwargs={'timeout': timeout})
+                   for timeout in [1, 2]]
+        for thread in threads:
+            thread.start()
+            while len(client.adapter.requests) < threads.index(thread) + 1 and thread.is_alive():
+                time.sleep(0.001)
+        client.adapter.release.set()
+        for thread in threads:
+            thread.join()
+
+        eq_(2, len(client.adapter.requests))
+
+    def test_other_requests_are_not_coalesced(self):
+        client = api.Client('http://lcp', coalesce_reads=True)
+        client.adapter = GatedAdapter()
+        client.adapter.release.set()
+        client.mount('http://', client.adapter)
+
+        _run_concurrently(lambda: client.post('/lps', data='{}'), 2)
+        client.get('/lps/lp1')
+        client.get('/lps/lp2')
+
+        eq_(4, len(client.adapter.requests))
@@ -0,0 +1,84 @@
+from builtins import object, range
+import re
+import threading
+
+from nose.tools import assert_raises, eq_
+
+from pylcp import api
+from pylcp.testing import CannedResponse, RecordingAdapter
+
+BASE_URL = 'https://lcp.points.com/v1'
+
+
+class TestRecordingAdapter(object):
+    def setup(self):
+        self.adapter = RecordingAdapter(max_requests=5, routes=[
+            ('GET', '/v1/lps/lp1', CannedResponse(200, {'id': 'lp1'}, {'ETag': '"1"'})),
+            (None, re.compile(r'/credits/?$'), CannedResponse(201, b'{"status": "success"}')),
+        ])
+        self.client = api.Client(BASE_URL, 'my-key-id', '3b11b03d1a9f4a0ca04fdede4ae30a1c')
+        self.client.mount('https://', self.adapter)
+
+    def test_routes_return_canned_responses(self):
+        response = self.client.get('/lps/lp1')
+        eq_((200, {'id': 'lp1'}, '"1"'), (response.status_code, response.json(), response.headers['ETag']))
+        eq_(BASE_URL + '/lps/lp1', response.url)
+
+        response = self.client.post('/lps/lp1/mvs/mv1/credits', json={'amount': 100})
+        eq_((201, 'Created', {'status': 'success'}), (response.status_code, response.reason, response.json()))
+
+    def test_canned_responses_are_not_shared(self):
+        self.client.get('/lps/lp1').headers['ETag'] = 'changed'
+        eq_('"1"', self.client.get('/lps/lp1').headers['ETag'])
+
+    def test_unrouted_requests_are_echoed(self):
+        response = self.client.post('/lps/lp1', json={'name': 'Points'})
+        eq_({'name': 'Points'}, response.json())
+        eq_(BASE_URL + '/lps/lp1', response.headers['location'])
+
+    def test_only_the_most_recent_requests_are_kept(self):
+        for index in range(8):
+            self.client.get('/lps/lp{}'.format(index))
+
+        eq_(8, self.adapter.call_count)
+        eq_(['/v1/lps/lp{}'.format(index) for index in range(3, 8)],
+            [request.path_url for request in self.adapter.requests])
+        self.adapter.assert_request_properties(method='GET', url=BASE_URL + '/lps/lp7')
+
+        self.adapter.reset()
+        eq_((0, [], None), (self.adapter.call_count, self.adapter.requests, self.adapter.last_request))
+
+    def test_requests_are_found_by_method_path_and_headers(self):
+        self.client.get('/lps/lp1')
+        self.client.post('/lps/lp1/mvs/mv1/credits', json={'amount': 100}, headers={'PTS-LCP-Mode': 'sandbox'})
+        self.client.post('/lps/lp2/mvs/mv2/credits/', json={'amount': 200})
+
+        eq_(2, len(self.adapter.find_requests(method='post')))
+        eq_(1, len(self.adapter.find_requests(path='/v1/lps/lp1')))
+        eq_(2, len(self.adapter.find_requests(path=re.compile('/credits'))))
+        eq_(['/v1/lps/lp1/mvs/mv1/credits'],
+            [request.path_url for request in self.adapter.find_requests(headers={'PTS-LCP-Mode': 'sandbox'})])
+
+        self.adapter.assert_requested('POST', re.compile('/credits'), count=2)
+        self.adapter.assert_requested(path='/v1/lps/lp1')
+        self.adapter.assert_not_requested('DELETE')
+        with assert_raises(AssertionError):
+            self.adapter.assert_requested('GET', count=2)
+        with assert_raises(AssertionError):
+            self.adapter.assert_not_requested(path='/v1/lps/lp1')
+
+    def test_requests_from_many_threads_are_all_counted(self):
+        adapter = RecordingAdapter(max_requests=10000)
+        self.client.mount('https://', adapter)
+
+        def send():
+            for _ in range(100):
+                self.client.get('/lps/lp1')
+        threads = [threading.Thread(target=send) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        eq_(800, adapter.call_count)
+        adapter.assert_requested('GET', '/v1/lps/lp1', count=800)